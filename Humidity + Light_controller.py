@@ -7,6 +7,13 @@ garden_controller.py (Enhanced)
 
 import paho.mqtt.client as mqtt
 import json
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "smart_garden"))
+from messaging.codec import decode_payloads
+from controllers.rule_engine import RuleEngine
+from controllers.command_plane import CommandPlane
+from config import CONTROL_RULES
 
 # MQTT Configuration
 BROKER = "localhost"
@@ -14,9 +21,11 @@ PORT = 1883
 SENSOR_TOPIC = "garden/data"
 CONTROL_TOPIC = "garden/control"
 
-# Control thresholds
-WATERING_THRESHOLD = 30    # Humidity threshold (%)
-LIGHTING_THRESHOLD = 500   # Light intensity threshold (lux)
+# Control rules: only the humidity and light rules from config.CONTROL_RULES
+rules = RuleEngine(rule for rule in CONTROL_RULES if rule["field"] in ("humidity", "light"))
+
+# Drops repeated commands and merges conflicting ones per actuator
+commands = CommandPlane()
 
 def on_connect(client, userdata, flags, rc):
     print("✅ Connected to MQTT Broker!" if rc == 0 else f"❌ Connection failed with code {rc}")
@@ -26,33 +35,27 @@ def on_connect(client, userdata, flags, rc):
 def on_message(client, userdata, msg):
     """Process sensor data and print detailed status"""
     try:
-        data = json.loads(msg.payload.decode())
-        humidity = data.get("humidity")
-        light = data.get("light")
+        readings = decode_payloads(msg.payload)
+    except Exception as e:
+        print(f"❌ Data processing error: {e}")
+        return
+    for data in readings:
+        process_reading(client, data)
+
+def process_reading(client, data):
+    """Check one reading against the thresholds"""
+    try:
         timestamp = data.get("timestamp", "N/A")
 
         # Print raw data (optional)
         print(f"\n📊 Raw Sensor Data: {data}")
 
-        # Humidity check
-        if humidity is not None:
-            if humidity < WATERING_THRESHOLD:
-                print(f"🚨 Low humidity! Current: {humidity}% (Threshold: {WATERING_THRESHOLD}%)")
-                command = {"action": "water", "duration": 5}
-                client.publish(CONTROL_TOPIC, json.dumps(command))
-                print(f"💧 Sent watering command: {command}")
-            else:
-                print(f"💧 Humidity OK: {humidity}% ≥ {WATERING_THRESHOLD}%")
-
-        # Light check
-        if light is not None:
-            if light < LIGHTING_THRESHOLD:
-                print(f"🌑 Low light! Current: {light}lux (Threshold: {LIGHTING_THRESHOLD}lux)")
-                command = {"action": "light_on", "duration": 10}
-                client.publish(CONTROL_TOPIC, json.dumps(command))
-                print(f"💡 Sent light-on command: {command}")
-            else:
-                print(f"💡 Light OK: {light}lux ≥ {LIGHTING_THRESHOLD}lux")
+        fired = rules.evaluate(data)
+        for rule, command in fired:
+            print(rule.describe(data[rule.field]))
+        for rule, command in commands.decide(fired, data.get("zone")):
+            client.publish(CONTROL_TOPIC, json.dumps(command))
+            print(f"📤 Sent {rule.name} command: {command}")
 
         print(f"⏰ Data timestamp: {timestamp}")
 
@@ -65,7 +68,12 @@ def main():
     client.on_message = on_message
     client.connect(BROKER, PORT, 60)
     print("🌱 Smart Garden Controller started...")
-    client.loop_forever()
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📈 Command stats: {commands.stats()}")
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,35 @@
-from flask import Flask, render_template
+from flask import Flask, Response, jsonify, render_template, request, g
 import paho.mqtt.client as mqtt
-import json
+import os
+import sys
+import time
+SMART_GARDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "smart_garden")
+sys.path.insert(0, SMART_GARDEN_DIR)
 from datetime import datetime
+from messaging.codec import decode_payloads
+from messaging.topics import zone_from_topic
+from config import DB_BACKEND, DB_PARTITION
+from storage import DEFAULT_ZONE, default_path, open_store
+from web.api import SensorApi, columnar, parse_fields, parse_time
+from web.live_updates import Broadcaster, changed_fields
+from web.snapshots import SnapshotStore
+from monitoring import CONTENT_TYPE, REGISTRY, EventLog, counter, histogram
 
 app = Flask(__name__)
 
+log = EventLog("web")
+messages_in = counter("web_messages_total", "MQTT sensor messages received by the dashboard")
+ingest_seconds = histogram("web_ingest_seconds", "Time to apply one MQTT message to the snapshots")
+request_seconds = histogram("web_request_seconds", "Time to answer an HTTP request", ("endpoint",))
+
 # ========== MQTT Configuration ==========
 BROKER = "localhost"
 PORT = 1883
 TOPIC = "garden/sensors"  # Must match your publisher
+ZONE_TOPIC = "garden/+/sensors"  # Per-zone publishers, see config.SENSOR_TOPIC_TEMPLATE
 
 # ========== Sensor Data Storage ==========
-sensor_data = {
+INITIAL_DATA = {
     "timestamp": "Waiting for data...",
     "humidity": 0,
     "drought_alert": False,
@@ -22,41 +40,62 @@ sensor_data = {
     "last_update": "Never updated"
 }
 
+# The MQTT thread swaps in immutable per-zone snapshots, requests read them without locking
+snapshots = SnapshotStore(history=60, initial=INITIAL_DATA)
+
+# Changed fields are pushed to every open dashboard of a zone over /stream
+live_updates = {}
+
+
+def zone_updates(zone):
+    """Broadcaster of a zone, created on first use"""
+    return live_updates.get(zone) or live_updates.setdefault(zone, Broadcaster())
+
+# REST API reads the store main_simulator.py writes (its path is relative to smart_garden/)
+sensor_api = SensorApi(open_store(os.path.join(SMART_GARDEN_DIR, default_path(DB_BACKEND)),
+                                  DB_BACKEND, DB_PARTITION))
+
 
 # ========== MQTT Callbacks ==========
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
-        print("✅ Successfully connected to MQTT broker!")
-        client.subscribe(TOPIC)
+        log.info("✅ Successfully connected to MQTT broker")
+        client.subscribe([(TOPIC, 0), (ZONE_TOPIC, 0)])
     else:
-        print(f"❌ Connection failed with code: {rc}")
+        log.error("❌ Connection failed", rc=rc)
 
 
 def on_message(client, userdata, msg):
-    global sensor_data
+    messages_in.inc()
+    start = time.perf_counter()
     try:
-        data = json.loads(msg.payload.decode())
-
-        # Convert timestamp to local time
-        utc_time = datetime.fromisoformat(data["timestamp"])
-        local_time = utc_time.astimezone().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Update all sensor data
-        sensor_data.update({
-            "timestamp": local_time,
-            "humidity": data["humidity"],
-            "drought_alert": data["drought_alert"],
-            "light": data["light"],
-            "ph": data["ph"],
-            "rain": data["rain"],
-            "co2": data["co2"],
-            "last_update": datetime.now().strftime("%H:%M:%S")
-        })
-
-        print(f"Data received: {sensor_data}")
+        # A batch carries readings in publish order, later ones replace earlier ones
+        for data in decode_payloads(msg.payload):
+            zone = data.get("zone") or zone_from_topic(msg.topic) or DEFAULT_ZONE
+
+            # Convert timestamp to local time
+            local_time = data["timestamp"].astimezone().strftime("%Y-%m-%d %H:%M:%S")
+
+            # Update all sensor data
+            new_values = {
+                "timestamp": local_time,
+                "humidity": data["humidity"],
+                "drought_alert": data["drought_alert"],
+                "light": data["light"],
+                "ph": data["ph"],
+                "rain": data["rain"],
+                "co2": data["co2"],
+                "last_update": datetime.now().strftime("%H:%M:%S")
+            }
+            changes = changed_fields(snapshots.latest(zone), new_values)
+            snapshot = snapshots.update(zone, new_values)
+            zone_updates(zone).publish(changes)
+
+            log.info("Data received", key=zone, zone=zone, **snapshot)
 
     except Exception as e:
-        print(f"❌ Data processing error: {e}")
+        log.error("❌ Data processing error", key=type(e).__name__, error=e)
+    ingest_seconds.observe(time.perf_counter() - start)
 
 
 # ========== MQTT Client Setup ==========
@@ -68,13 +107,95 @@ try:
     mqtt_client.connect(BROKER, PORT, 60)
     mqtt_client.loop_start()
 except Exception as e:
-    print(f"⚠️ MQTT connection error: {e}")
+    log.warning("⚠️ MQTT connection error", error=e)
 
 
 # ========== Flask Routes ==========
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    request_seconds.labels(request.endpoint or 'unmatched').observe(time.perf_counter() - g.request_start)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format: counters and histograms of this process"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 @app.route('/')
 def index():
-    return render_template('index.html', data=sensor_data)
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    return render_template('index.html', data=snapshots.latest(zone), zone=zone)
+
+
+@app.route('/stream')
+def stream():
+    """Server-Sent Events: full snapshot first, then changed fields only"""
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    return Response(zone_updates(zone).stream(lambda: dict(snapshots.latest(zone))),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def conditional_json(etag, build):
+    """Answer 304 if the client already has this version, otherwise build the JSON body"""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every request
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/latest')
+def api_latest():
+    """Most recent stored reading, ?fields=humidity,ph&zone=<zone>"""
+    try:
+        record, etag = sensor_api.latest(parse_fields(request.args.get('fields')),
+                                         request.args.get('zone'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if record is None:
+        return jsonify(error='No readings stored yet'), 404
+    return conditional_json(etag, lambda: record)
+
+
+@app.route('/api/recent')
+def api_recent():
+    """Last live snapshots of a zone from memory, one array per field, for sparklines"""
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    recent = snapshots.recent(zone)
+    return jsonify(zone=zone, length=len(recent), columns=columnar(recent, list(recent[0]) if recent else []))
+
+
+@app.route('/api/history')
+def api_history():
+    """Stored readings as one array per field, ?from=&to=&fields=&step=&points=&zone=
+
+    from/to take epoch milliseconds or ISO-8601, step is auto, raw, 1m or 1h.
+    """
+    args = request.args
+    try:
+        query = {
+            'start': parse_time(args.get('from')),
+            'end': parse_time(args.get('to')),
+            'fields': parse_fields(args.get('fields')),
+            'step': args.get('step', 'auto'),
+            'max_points': args.get('points', type=int),
+            'zone': args.get('zone'),
+        }
+        etag = sensor_api.history_etag(**query)
+        return conditional_json(etag, lambda: sensor_api.history(**query))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
 
 
 if __name__ == '__main__':
@@ -1,8 +1,13 @@
 import paho.mqtt.client as mqtt
-import json
+import logging
 import time
-from datetime import datetime
 from paho.mqtt.client import CallbackAPIVersion
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "smart_garden"))
+from messaging.codec import decode_payloads
+from controllers.actuator_scheduler import ActuatorScheduler
+from monitoring import EventLog, counter
 
 # MQTT broker configuration
 BROKER = "localhost"
@@ -22,6 +27,9 @@ LIGHT_THRESHOLD = 500    # Light intensity in lux below which LED lights are tur
 WATERING_DURATION = 2    # Changed to 2 seconds to match update frequency
 LIGHTING_DURATION = 2    # Changed to 2 seconds to match update frequency
 
+messages_in = counter("automation_messages_total", "Sensor messages received")
+actuations = counter("automation_actuations_total", "Actuator switch events", ("actuator", "state"))
+
 class GardenController:
     def __init__(self):
         """Initialize the MQTT client and set up callbacks"""
@@ -29,11 +37,15 @@ class GardenController:
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         
-        # Control state variables
-        self.water_pump_on = False
-        self.led_light_on = False
+        # Actuator OFF events are scheduled instead of slept through
+        self.scheduler = ActuatorScheduler(self.deactivate, on_start=self.switch_on)
+        self.actuator_names = {
+            WATER_PUMP_TOPIC: "Water pump",
+            LED_LIGHT_TOPIC: "LED light",
+        }
         self.last_update = 0
         self.update_interval = 2  # Process updates every 2 seconds
+        self.logger = EventLog("automation")
         
         # Connect to broker and start network loop
         self.client.connect(BROKER, PORT, 60)
@@ -49,61 +61,64 @@ class GardenController:
 
     def on_message(self, client, userdata, msg):
         """Callback for when a message is received from the broker"""
+        messages_in.inc()
         try:
             current_time = time.time()
             # Ensure updates are processed only at the specified interval
             if current_time - self.last_update >= self.update_interval:
                 self.last_update = current_time
-                data = json.loads(msg.payload.decode())
-                self.log(f"Received sensor data: {data}")
+                data = decode_payloads(msg.payload)[-1]  # Latest reading of a batch
+                self.log("Received sensor data", key="sensor_data", **data)
                 
                 # Control logic based on sensor readings
-                if data.get("humidity") < DROUGHT_THRESHOLD and not self.water_pump_on:
+                if data.get("humidity") < DROUGHT_THRESHOLD:
                     self.activate_water_pump()
-                if data.get("light") < LIGHT_THRESHOLD and not self.led_light_on:
+                if data.get("light") < LIGHT_THRESHOLD:
                     self.activate_led_light()
         except Exception as e:
             self.log(f"Error processing message: {str(e)}", "ERROR")
 
+    @property
+    def water_pump_on(self):
+        return self.scheduler.is_active(WATER_PUMP_TOPIC)
+
+    @property
+    def led_light_on(self):
+        return self.scheduler.is_active(LED_LIGHT_TOPIC)
+
     def activate_water_pump(self):
         """Turn on water pump for the specified duration"""
-        self.water_pump_on = True
-        self.client.publish(WATER_PUMP_TOPIC, "ON")
-        self.log("Water pump activated")
-        
-        # Non-blocking wait (keeps MQTT loop running)
-        end_time = time.time() + WATERING_DURATION
-        while time.time() < end_time:
-            time.sleep(0.1)  # Short sleep to avoid blocking
-            
-        self.client.publish(WATER_PUMP_TOPIC, "OFF")
-        self.water_pump_on = False
-        self.log("Water pump deactivated")
+        self.activate(WATER_PUMP_TOPIC, WATERING_DURATION)
 
     def activate_led_light(self):
         """Turn on LED lights for the specified duration"""
-        self.led_light_on = True
-        self.client.publish(LED_LIGHT_TOPIC, "ON")
-        self.log("LED light activated")
-        
-        # Non-blocking wait
-        end_time = time.time() + LIGHTING_DURATION
-        while time.time() < end_time:
-            time.sleep(0.1)
-            
-        self.client.publish(LED_LIGHT_TOPIC, "OFF")
-        self.led_light_on = False
-        self.log("LED light deactivated")
-
-    def log(self, message, level="INFO"):
-        """Create structured log entries with timestamps"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = {
-            "timestamp": timestamp,
-            "level": level,
-            "message": message
-        }
-        print(json.dumps(log_entry, indent=2))
+        self.activate(LED_LIGHT_TOPIC, LIGHTING_DURATION)
+
+    def activate(self, topic, duration):
+        """Switch an actuator on, or extend its running window
+
+        Returns immediately; the scheduler publishes OFF when the window ends.
+        """
+        started = self.scheduler.activate(topic, duration)
+        if started:
+            self.log(f"{self.actuator_names[topic]} activated")
+        elif started is False:
+            self.log(f"{self.actuator_names[topic]} already on, running window extended")
+
+    def switch_on(self, topic):
+        """Scheduler callback: switch an actuator on"""
+        self.client.publish(topic, "ON")
+        actuations.labels(self.actuator_names[topic], "on").inc()
+
+    def deactivate(self, topic):
+        """Scheduler callback: switch an actuator off"""
+        self.client.publish(topic, "OFF")
+        actuations.labels(self.actuator_names[topic], "off").inc()
+        self.log(f"{self.actuator_names[topic]} deactivated")
+
+    def log(self, message, level="INFO", key=None, **fields):
+        """One structured line per event, repeats of a message are rate limited"""
+        self.logger.log(logging.getLevelName(level), message, key, **fields)
 
 if __name__ == "__main__":
     # Create and run the controller
@@ -112,4 +127,5 @@ if __name__ == "__main__":
         while True:
             time.sleep(0.1)  # Small sleep to reduce CPU usage
     except KeyboardInterrupt:
+        controller.scheduler.stop()
         print("Controller stopped")
\ No newline at end of file
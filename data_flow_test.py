@@ -3,6 +3,10 @@
 Subscribe to garden/data topic and print incoming messages for testing data flow.
 """
 import paho.mqtt.client as mqtt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "smart_garden"))
+from messaging.codec import decode_payloads
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
@@ -13,7 +17,8 @@ def on_connect(client, userdata, flags, rc):
 
 
 def on_message(client, userdata, msg):
-    print(f"Received on {msg.topic}: {msg.payload.decode()}")
+    for data in decode_payloads(msg.payload):
+        print(f"Received on {msg.topic}: {data}")
 
 client = mqtt.Client()
 client.on_connect = on_connect
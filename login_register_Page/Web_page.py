@@ -1,29 +1,38 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, Response, jsonify, render_template, request, redirect, url_for, session, flash, g
+from markupsafe import Markup
 import paho.mqtt.client as mqtt
-import json
+import os
+import sys
+import time
+SMART_GARDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "smart_garden")
+sys.path.insert(0, SMART_GARDEN_DIR)
 from datetime import datetime
 from functools import wraps
-import os
-from werkzeug.security import generate_password_hash, check_password_hash
+from messaging.codec import decode_payloads
+from messaging.topics import zone_from_topic
+from config import DB_BACKEND, DB_PARTITION
+from storage import DEFAULT_ZONE, default_path, open_store
+from web.api import SensorApi, columnar, make_etag, parse_fields, parse_time
+from web.live_updates import Broadcaster, changed_fields
+from web.snapshots import SnapshotStore
+from web.render_cache import RenderCache, USER_HEADER_SLOT
+from web.users import UserStore, UserStoreBusy
+from monitoring import CONTENT_TYPE, REGISTRY, EventLog, counter, histogram
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # 请更改为一个安全的密钥
 
-# 用户数据文件
-USERS_FILE = 'users.json'
-
-# 确保用户数据文件存在
-if not os.path.exists(USERS_FILE):
-    with open(USERS_FILE, 'w') as f:
-        json.dump({}, f)
+log = EventLog("web")
+messages_in = counter("web_messages_total", "MQTT sensor messages received by the dashboard")
+ingest_seconds = histogram("web_ingest_seconds", "Time to apply one MQTT message to the snapshots")
+request_seconds = histogram("web_request_seconds", "Time to answer an HTTP request", ("endpoint",))
 
-def load_users():
-    with open(USERS_FILE, 'r') as f:
-        return json.load(f)
+# 用户数据文件
+USERS_FILE = 'users.json'   # Legacy store, imported into USERS_DB on first start
+USERS_DB = 'users.db'
+HASH_WORKERS = 4            # Password hashes computed in parallel, see web/users.py
 
-def save_users(users):
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f)
+users = UserStore(USERS_DB, USERS_FILE, HASH_WORKERS)
 
 # ========== 用户认证 ==========
 def login_required(f):
@@ -38,9 +47,10 @@ def login_required(f):
 BROKER = "localhost"
 PORT = 1883
 TOPIC = "garden/sensors"  # Must match your publisher
+ZONE_TOPIC = "garden/+/sensors"  # Per-zone publishers, see config.SENSOR_TOPIC_TEMPLATE
 
 # ========== Sensor Data Storage ==========
-sensor_data = {
+INITIAL_DATA = {
     "timestamp": "Waiting for data...",
     "humidity": 0,
     "drought_alert": False,
@@ -51,41 +61,67 @@ sensor_data = {
     "last_update": "Never updated"
 }
 
+# The MQTT thread swaps in immutable per-zone snapshots, requests read them without locking
+snapshots = SnapshotStore(history=60, initial=INITIAL_DATA)
+
+# Changed fields are pushed to every open dashboard of a zone over /stream
+live_updates = {}
+
+
+def zone_updates(zone):
+    """Broadcaster of a zone, created on first use"""
+    return live_updates.get(zone) or live_updates.setdefault(zone, Broadcaster())
+
+# The dashboard is rendered once per zone and snapshot version and shared by every session
+page_cache = RenderCache()
+# Snapshot versions restart at 0 with the process, this keeps old ETags from matching new pages
+BOOT_ID = os.urandom(8).hex()
+
+# REST API reads the store main_simulator.py writes (its path is relative to smart_garden/)
+sensor_api = SensorApi(open_store(os.path.join(SMART_GARDEN_DIR, default_path(DB_BACKEND)),
+                                  DB_BACKEND, DB_PARTITION))
+
 
 # ========== MQTT Callbacks ==========
 def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
-        print("✅ Successfully connected to MQTT broker!")
-        client.subscribe(TOPIC)
+        log.info("✅ Successfully connected to MQTT broker")
+        client.subscribe([(TOPIC, 0), (ZONE_TOPIC, 0)])
     else:
-        print(f"❌ Connection failed with code: {rc}")
+        log.error("❌ Connection failed", rc=rc)
 
 
 def on_message(client, userdata, msg):
-    global sensor_data
+    messages_in.inc()
+    start = time.perf_counter()
     try:
-        data = json.loads(msg.payload.decode())
-
-        # Convert timestamp to local time
-        utc_time = datetime.fromisoformat(data["timestamp"])
-        local_time = utc_time.astimezone().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Update all sensor data
-        sensor_data.update({
-            "timestamp": local_time,
-            "humidity": data["humidity"],
-            "drought_alert": data["drought_alert"],
-            "light": data["light"],
-            "ph": data["ph"],
-            "rain": data["rain"],
-            "co2": data["co2"],
-            "last_update": datetime.now().strftime("%H:%M:%S")
-        })
-
-        print(f"Data received: {sensor_data}")
+        # A batch carries readings in publish order, later ones replace earlier ones
+        for data in decode_payloads(msg.payload):
+            zone = data.get("zone") or zone_from_topic(msg.topic) or DEFAULT_ZONE
+
+            # Convert timestamp to local time
+            local_time = data["timestamp"].astimezone().strftime("%Y-%m-%d %H:%M:%S")
+
+            # Update all sensor data
+            new_values = {
+                "timestamp": local_time,
+                "humidity": data["humidity"],
+                "drought_alert": data["drought_alert"],
+                "light": data["light"],
+                "ph": data["ph"],
+                "rain": data["rain"],
+                "co2": data["co2"],
+                "last_update": datetime.now().strftime("%H:%M:%S")
+            }
+            changes = changed_fields(snapshots.latest(zone), new_values)
+            snapshot = snapshots.update(zone, new_values)
+            zone_updates(zone).publish(changes)
+
+            log.info("Data received", key=zone, zone=zone, **snapshot)
 
     except Exception as e:
-        print(f"❌ Data processing error: {e}")
+        log.error("❌ Data processing error", key=type(e).__name__, error=e)
+    ingest_seconds.observe(time.perf_counter() - start)
 
 
 # ========== MQTT Client Setup ==========
@@ -97,10 +133,30 @@ try:
     mqtt_client.connect(BROKER, PORT, 60)
     mqtt_client.loop_start()
 except Exception as e:
-    print(f"⚠️ MQTT connection error: {e}")
+    log.warning("⚠️ MQTT connection error", error=e)
 
 
 # ========== Flask Routes ==========
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    request_seconds.labels(request.endpoint or 'unmatched').observe(time.perf_counter() - g.request_start)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format: counters and histograms of this process
+
+    Not behind login_required so a scraper can read it, it holds no sensor values.
+    """
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -108,10 +164,8 @@ def register():
         password = request.form['password']
         confirm_password = request.form['confirm_password']
 
-        users = load_users()
-        
         # 验证用户名是否已存在
-        if username in users:
+        if users.exists(username):
             return render_template('register.html', error='Username already exists')
 
         # 验证密码
@@ -119,8 +173,12 @@ def register():
             return render_template('register.html', error='Passwords do not match')
 
         # 创建新用户
-        users[username] = generate_password_hash(password)
-        save_users(users)
+        try:
+            created = users.create(username, password)
+        except UserStoreBusy:
+            return render_template('register.html', error='Server busy, please try again'), 503
+        if not created:
+            return render_template('register.html', error='Username already exists')
 
         flash('Registration successful! Please login')
         return redirect(url_for('login'))
@@ -134,8 +192,11 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        users = load_users()
-        if username in users and check_password_hash(users[username], password):
+        try:
+            valid = users.verify(username, password)
+        except UserStoreBusy:
+            return render_template('login.html', error='Server busy, please try again'), 503
+        if valid:
             session['logged_in'] = True
             session['username'] = username
             return redirect(url_for('index'))
@@ -152,7 +213,93 @@ def logout():
 @app.route('/')
 @login_required
 def index():
-    return render_template('index.html', data=sensor_data)
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    data = snapshots.latest(zone)
+    username = session.get('username')
+    etag = make_etag('index', BOOT_ID, zone, data['version'], username)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        page = page_cache.page(zone, data['version'], lambda: render_template(
+            'index.html', data=data, zone=zone, user_header=Markup(USER_HEADER_SLOT)))
+        # Only the header differs between users
+        header = render_template('user_header.html', username=username)
+        body, encoding = page_cache.respond(zone, page, header, request.headers.get('Accept-Encoding', ''))
+        response = Response(body, mimetype='text/html')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding, Cookie'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@app.route('/stream')
+@login_required
+def stream():
+    """Server-Sent Events: full snapshot first, then changed fields only"""
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    return Response(zone_updates(zone).stream(lambda: dict(snapshots.latest(zone))),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def conditional_json(etag, build):
+    """Answer 304 if the client already has this version, otherwise build the JSON body"""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every request
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/latest')
+@login_required
+def api_latest():
+    """Most recent stored reading, ?fields=humidity,ph&zone=<zone>"""
+    try:
+        record, etag = sensor_api.latest(parse_fields(request.args.get('fields')),
+                                         request.args.get('zone'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if record is None:
+        return jsonify(error='No readings stored yet'), 404
+    return conditional_json(etag, lambda: record)
+
+
+@app.route('/api/recent')
+@login_required
+def api_recent():
+    """Last live snapshots of a zone from memory, one array per field, for sparklines"""
+    zone = request.args.get('zone', DEFAULT_ZONE)
+    recent = snapshots.recent(zone)
+    return jsonify(zone=zone, length=len(recent), columns=columnar(recent, list(recent[0]) if recent else []))
+
+
+@app.route('/api/history')
+@login_required
+def api_history():
+    """Stored readings as one array per field, ?from=&to=&fields=&step=&points=&zone=
+
+    from/to take epoch milliseconds or ISO-8601, step is auto, raw, 1m or 1h.
+    """
+    args = request.args
+    try:
+        query = {
+            'start': parse_time(args.get('from')),
+            'end': parse_time(args.get('to')),
+            'fields': parse_fields(args.get('fields')),
+            'step': args.get('step', 'auto'),
+            'max_points': args.get('points', type=int),
+            'zone': args.get('zone'),
+        }
+        etag = sensor_api.history_etag(**query)
+        return conditional_json(etag, lambda: sensor_api.history(**query))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
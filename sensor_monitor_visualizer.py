@@ -1,140 +1,104 @@
+import argparse
 import paho.mqtt.client as mqtt
-import json
+import os
+import sys
+SMART_GARDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "smart_garden")
+sys.path.insert(0, SMART_GARDEN_DIR)
 import matplotlib.pyplot as plt
 import numpy as np
-from datetime import datetime
-from matplotlib.dates import DateFormatter
-import matplotlib.animation as animation
-from matplotlib.patches import Patch
+
+from matplotlib.dates import date2num
+from config import DB_PATH
+from messaging.codec import decode_payloads
+from visualization import RingBuffer, MonitorRenderer, HistoryReplay, open_history
+from visualization.replay import parse_timestamp
 
 # MQTT settings
 BROKER = "localhost"
 PORT = 1883
 TOPIC = "garden/data"
 
-# Data storage
-max_data_points = 30
-timestamps = []
-humidity_data = []
-light_data = []
-alert_status = []
-
-# Initialize figure
-plt.figure(figsize=(12, 8))
-plt.style.use('ggplot')
+# Data storage: a 24h window at one reading per second
+window_seconds = 24 * 60 * 60
+max_data_points = window_seconds
+buffer = RingBuffer(max_data_points, {
+    "ts": np.float64,
+    "humidity": np.float32,
+    "light": np.float32,
+    "drought_alert": bool,
+    "daytime": bool,
+})
 
 
 # MQTT callback
 def on_message(client, userdata, msg):
     try:
-        data = json.loads(msg.payload.decode())
-
-        # Store data (keep only last max_data_points)
-        timestamps.append(datetime.fromisoformat(data["timestamp"]))
-        humidity_data.append(data["humidity"])
-        light_data.append(data["light"])
-        alert_status.append(data["drought_alert"])
-
-        if len(timestamps) > max_data_points:
-            timestamps.pop(0)
-            humidity_data.pop(0)
-            light_data.pop(0)
-            alert_status.pop(0)
+        for data in decode_payloads(msg.payload):
+            # Oldest samples are overwritten once the window is full
+            timestamp = data["timestamp"]
+            buffer.append(
+                ts=date2num(timestamp),
+                humidity=data["humidity"],
+                light=data["light"],
+                drought_alert=data["drought_alert"],
+                daytime=6 <= timestamp.hour < 18,
+            )
 
     except Exception as e:
         print(f"Error processing message: {e}")
 
 
-# Animation update function
-def update_plot(frame):
-    plt.clf()
-
-    if not timestamps:
+def replay(args):
+    """Render stored history instead of live data, re-decimated on zoom"""
+    source = open_history(args.replay, args.zone)
+    bounds = source.bounds()
+    if bounds is None:
+        print(f"No readings in {args.replay}")
         return
+    start = parse_timestamp(args.start) if args.start else bounds[0]
+    end = parse_timestamp(args.end) if args.end else bounds[1] + 1
+    history = HistoryReplay(source, start, end)
+    renderer = MonitorRenderer(history, (end - start) / 1000, follow=False)
+    history.attach(renderer)
+    print(f"Replaying {history.rows} readings from {args.replay}")
+    try:
+        plt.show()
+    except KeyboardInterrupt:
+        print("Stopping visualization...")
 
-    # Convert to numpy arrays for easier manipulation
-    ts = np.array(timestamps)
-    hum = np.array(humidity_data)
-    light = np.array(light_data)
-    alerts = np.array(alert_status)
-
-    # --- Plot 1: Humidity with drought alerts ---
-    plt.subplot(2, 1, 1)
-
-    # Plot humidity data
-    line, = plt.plot(ts, hum, 'b-', linewidth=2, label='Humidity')
-
-    # Add drought threshold line
-    plt.axhline(y=30, color='r', linestyle='--', label='Drought Threshold')
-
-    # Highlight drought periods
-    alert_indices = np.where(alerts)[0]
-    for i in alert_indices:
-        if i < len(ts) - 1:
-            plt.axvspan(ts[i], ts[i + 1], color='red', alpha=0.3)
-
-    plt.title('Garden Humidity Monitoring (Drought Alert when <30%)')
-    plt.ylabel('Humidity (%)')
-    plt.ylim(0, 100)
-    plt.grid(True, alpha=0.3)
-
-    # Add custom legend
-    legend_elements = [
-        Patch(facecolor='red', alpha=0.3, label='Drought Alert'),
-        Patch(facecolor='none', edgecolor='r', linestyle='--', label='Threshold')
-    ]
-    plt.legend(handles=legend_elements, loc='upper right')
-
-    # --- Plot 2: Light Levels with Day/Night indication ---
-    plt.subplot(2, 1, 2)
-
-    # Plot light data
-    plt.plot(ts, light, color='orange', linewidth=2, label='Light Level')
-
-    # Add day/night background
-    for i in range(len(ts) - 1):
-        hour = ts[i].hour
-        if 6 <= hour < 18:  # Daytime
-            plt.axvspan(ts[i], ts[i + 1], color='yellow', alpha=0.1)
-        else:  # Nighttime
-            plt.axvspan(ts[i], ts[i + 1], color='blue', alpha=0.1)
-
-    plt.title('Light Level Monitoring (Day/Night Cycle)')
-    plt.ylabel('Light (lux)')
-    plt.ylim(-50, 1100)  # Slightly below 0 to see markers clearly
-    plt.grid(True, alpha=0.3)
-
-    # Add custom legend
-    legend_elements = [
-        Patch(facecolor='yellow', alpha=0.1, label='Daytime (6:00-18:00)'),
-        Patch(facecolor='blue', alpha=0.1, label='Nighttime')
-    ]
-    plt.legend(handles=legend_elements, loc='upper right')
-
-    # Format x-axis
-    date_form = DateFormatter("%H:%M:%S")
-    for i in [1, 2]:
-        plt.subplot(2, 1, i)
-        plt.gca().xaxis.set_major_formatter(date_form)
-        plt.gca().tick_params(axis='x', rotation=45)
-
-    plt.tight_layout()
 
+def live():
+    # Artists are created once, each refresh only updates their data
+    renderer = MonitorRenderer(buffer, window_seconds)
 
-# Set up MQTT client
-client = mqtt.Client()
-client.on_message = on_message
-client.connect(BROKER, PORT, 60)
-client.subscribe(TOPIC)
-client.loop_start()
+    # Set up MQTT client
+    client = mqtt.Client()
+    client.on_message = on_message
+    client.connect(BROKER, PORT, 60)
+    client.subscribe(TOPIC)
+    client.loop_start()
 
-# Set up animation
-ani = animation.FuncAnimation(plt.gcf(), update_plot, interval=1000)
+    # Refresh once a second
+    renderer.start(interval=1000)
 
-try:
-    plt.show()
-except KeyboardInterrupt:
-    print("Stopping visualization...")
-finally:
-    client.loop_stop()
-    client.disconnect()
\ No newline at end of file
+    try:
+        plt.show()
+    except KeyboardInterrupt:
+        print("Stopping visualization...")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live garden sensor monitor, or replay of stored readings")
+    parser.add_argument("--replay", nargs="?", const=os.path.join(SMART_GARDEN_DIR, DB_PATH), metavar="FILE",
+                        help="SQLite database (default: the simulator's) or CSV export to replay")
+    parser.add_argument("--from", dest="start", help="replay start, epoch ms or ISO-8601 (default: oldest reading)")
+    parser.add_argument("--to", dest="end", help="replay end, epoch ms or ISO-8601 (default: newest reading)")
+    parser.add_argument("--zone", help="only replay readings of this zone")
+    args = parser.parse_args()
+    if args.replay:
+        replay(args)
+    else:
+        live()
\ No newline at end of file
@@ -2,13 +2,20 @@
 Simulate two virtual sensors for an intelligent garden:
  1. Humidity sensor: random humidity value + drought alert if below threshold.
  2. Light sensor: simulate day-night cycle based on system clock.
-Publishes JSON payload to MQTT topic "garden/data" every 2 seconds.
+Publishes the payload (JSON or binary, see messaging/codec.py) to MQTT topic "garden/data" every 2 seconds.
 """
 import paho.mqtt.client as mqtt
-import json
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "smart_garden"))
 import random
 import time
 from datetime import datetime, timezone
+from messaging.codec import encode_payload, topic_format
+from monitoring import EventLog, counter
+
+log = EventLog("sensor_simulator")
+messages_published = counter("simulator_messages_total", "Sensor messages published")
 
 # MQTT broker settings
 BROKER = "localhost"
@@ -55,6 +62,7 @@ def main():
     client.on_connect = on_connect
     client.connect(BROKER, PORT, 60)
     client.loop_start()
+    payload_format = topic_format(TOPIC)
 
     try:
         while True:
@@ -68,9 +76,9 @@ def main():
                 "drought_alert": drought_alert,
                 "light": light
             }
-            msg = json.dumps(payload)
-            client.publish(TOPIC, msg, qos=1)
-            print(f"Published: {msg}")
+            client.publish(TOPIC, encode_payload(payload, payload_format), qos=1)
+            messages_published.inc()
+            log.info("Published", **payload)
             time.sleep(2)
 
     except KeyboardInterrupt:
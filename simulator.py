@@ -5,13 +5,21 @@ Simulate three virtual sensors for an intelligent garden:
  3. PHsensor: random PH value
  4. Rain sensor: random rain detection (10% probability)
  5. CO₂ sensor: simulate concentration fluctuations
-Publishes JSON payload to MQTT topic "garden/sensors" every 2 seconds.
+Publishes the payload (JSON or binary, see messaging/codec.py) to MQTT topic "garden/sensors" every 2 seconds.
 """
 import paho.mqtt.client as mqtt
-import json
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "smart_garden"))
 import random
 import time
 from datetime import datetime, timezone
+from messaging.codec import topic_format
+from messaging.batching import BatchPublisher
+from config import BATCH_MAX_READINGS, BATCH_MAX_LATENCY
+from monitoring import EventLog
+
+log = EventLog("simulator")
 
 # MQTT broker settings
 BROKER = "localhost"
@@ -88,6 +96,9 @@ def main():
     client.connect(BROKER, PORT, 60)
     client.loop_start()
 
+    publisher = BatchPublisher(client, ENV_TOPIC, topic_format(ENV_TOPIC),
+                               BATCH_MAX_READINGS, BATCH_MAX_LATENCY)
+
     try:
         current_ph = 6.5
         current_co2 = 400.0  
@@ -112,14 +123,15 @@ def main():
               "rain": rain,          
               "co2": current_co2   
 }
-            client.publish(ENV_TOPIC, json.dumps(payload), qos=1)
+            publisher.publish(payload)
             
-            print(f"Published combined data: {payload}")
+            log.info("Published combined data", **payload)
             time.sleep(2)
 
     except KeyboardInterrupt:
         print("Stopping sensor simulator...")
     finally:
+        publisher.close()
         client.loop_stop()
         client.disconnect()
 
@@ -0,0 +1,94 @@
+"""Anomaly detector throughput benchmark
+
+Run from the smart_garden directory:
+    python -m benchmarks.anomaly_bench --readings 200000 --zones 10
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from controllers.anomaly_detector import AnomalyDetector
+from sensors.batch_engine import SensorBatch
+
+FIELDS = ("humidity", "light", "ph", "co2")
+
+
+def simulator_readings(count, zones, seed=0):
+    """Readings every 2s per zone, drawn the way main_simulator.py draws them
+
+    Humidity is redrawn on every reading (HumiditySensor.read()), pH and
+    CO2 random-walk, light follows the day/night cycle.
+    """
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    batch = SensorBatch(zones, seed)
+    readings = []
+    for tick in range((count + zones - 1) // zones):
+        timestamp = start + timedelta(seconds=2 * tick)
+        humidity, _ = batch.read_humidity(walk=False)
+        columns = {
+            "humidity": humidity,
+            "light": batch.read_light(timestamp.hour),
+            "ph": batch.read_ph(),
+            "co2": batch.read_co2(),
+        }
+        for zone in range(zones):
+            reading = {field: float(columns[field][zone]) for field in FIELDS}
+            reading.update(zone=f"zone_{zone}", timestamp=timestamp)
+            readings.append(reading)
+    return readings[:count]
+
+
+def make_readings(count, zones, rng, anomaly_rate=0.001):
+    """Simulator readings with spikes, stuck runs and bad values mixed in"""
+    readings = simulator_readings(count, zones, rng.randrange(2 ** 32))
+    frozen = {}
+    stuck = [0] * zones
+    for i, reading in enumerate(readings):
+        zone = i % zones
+        if stuck[zone]:
+            stuck[zone] -= 1
+            reading.update(frozen[zone])
+        elif rng.random() < anomaly_rate:
+            stuck[zone] = 40
+            frozen[zone] = {field: reading[field] for field in FIELDS}
+        roll = rng.random()
+        if roll < anomaly_rate:
+            reading["co2"] += 3000
+        elif roll < 2 * anomaly_rate:
+            reading["ph"] = -1.0
+    return readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=200000)
+    parser.add_argument("--zones", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--target", type=float, default=50000, help="readings/sec required to pass")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    readings = make_readings(args.readings, args.zones, rng)
+    detector = AnomalyDetector()
+
+    kinds = Counter()
+    start = time.perf_counter()
+    for reading in readings:
+        for flag in detector.check(reading):
+            if not flag["ongoing"]:
+                kinds[flag["kind"]] += 1
+    elapsed = time.perf_counter() - start
+
+    rate = args.readings / elapsed
+    print(f"Readings: {args.readings}  Zones: {args.zones}")
+    print(f"Flags: {dict(kinds)}")
+    print(f"Elapsed: {elapsed:.3f}s")
+    print(f"Readings/sec: {rate:,.0f} (target {args.target:,.0f})")
+    if rate < args.target:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""End-to-end pipeline benchmark: simulated beds -> MQTT -> controller, database and dashboard
+
+Run from the smart_garden directory:
+    python -m benchmarks.pipeline_bench --beds 20 --rate 5 --duration 10
+    python -m benchmarks.pipeline_bench --transport tcp --output results.json
+    python -m benchmarks.pipeline_bench --baseline results.json
+
+Beds are simulated with SensorBatch, and every reading goes through
+main_simulator.publish_reading(), the simulator's own publish and
+database step, into BatchPublisher and the batched writer. A
+SensorController consumes the readings, and so does the real dashboard
+app (Web_Page/Web_page.py): its on_message() ingests every message while
+--web-readers threads request /api/latest and / through Flask's test
+client. Without Flask installed the web tier is skipped and reported as
+such, the rest of the pipeline still runs.
+
+--transport memory (default) runs every client in this process without
+sockets, tcp uses paho against a LocalBroker on a free port, or against
+--broker HOST:PORT. Latency is measured from the payload timestamp to the
+controller's decision (every reading) and to its published commands.
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from config import SENSOR_TOPIC, CONTROL_RULES
+from controllers.sensor_controller import SensorController
+from main_simulator import publish_reading
+from messaging import (BatchPublisher, LocalBroker, MemoryBroker, create_client,
+                       topic_format, TRANSPORT_MEMORY, TRANSPORT_TCP)
+from sensors.batch_engine import SensorBatch
+import storage
+from storage import BACKENDS, open_store
+from storage.ingest_writer import SensorDataWriter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import flask
+except ImportError:
+    flask = None
+
+DASHBOARD_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Web_Page", "Web_page.py")
+
+
+def percentiles(values, points=(50, 99)):
+    """Nearest-rank percentiles in milliseconds, plus the maximum"""
+    if not values:
+        return dict({f"p{p}": None for p in points}, max=None)
+    ordered = sorted(values)
+    result = {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+              for p in points}
+    result["max"] = round(ordered[-1] * 1000, 3)
+    return result
+
+
+def process_usage():
+    """CPU seconds used and peak RSS of this process"""
+    usage = {"cpu_seconds": time.process_time(), "max_rss_mb": None}
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        usage["max_rss_mb"] = round(max_rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+    return usage
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+class BenchController(SensorController):
+    """SensorController that records how old each reading is when handled"""
+    def __init__(self, *args, **kwargs):
+        self.connected = threading.Event()
+        self.processed = 0
+        self.latencies = []
+        self.command_latencies = []
+        self.reading_time = 0.0
+        super().__init__(*args, **kwargs)
+
+    def on_connect(self, client, userdata, flags, rc):
+        super().on_connect(client, userdata, flags, rc)
+        self.connected.set()
+
+    def process_reading(self, data):
+        self.reading_time = data["timestamp"].timestamp()
+        super().process_reading(data)
+        self.latencies.append(time.time() - self.reading_time)
+        self.processed += 1
+
+    def publish_control(self, command):
+        super().publish_control(command)
+        self.command_latencies.append(time.time() - self.reading_time)
+
+
+def load_dashboard(store):
+    """Import the real dashboard app serving `store`, None without Flask"""
+    if flask is None:
+        return None
+    spec = importlib.util.spec_from_file_location("dashboard_app", DASHBOARD_APP)
+    app = importlib.util.module_from_spec(spec)
+    # Flask finds the templates through the module's entry in sys.modules
+    sys.modules[spec.name] = app
+    # The app opens its store at import, hand it the bench's instead of the real database
+    open_default = storage.open_store
+    storage.open_store = lambda *args, **kwargs: store
+    try:
+        spec.loader.exec_module(app)
+    finally:
+        storage.open_store = open_default
+    # The app's own client targets the configured broker, the bench feeds its on_message instead
+    app.mqtt_client.loop_stop()
+    app.mqtt_client.disconnect()
+    return app
+
+
+class DashboardSink:
+    """Subscribes to the bench broker and hands every message to the app's on_message()"""
+    def __init__(self, app, transport, broker, port, topic):
+        self.app = app
+        self.messages = 0
+        self.connected = threading.Event()
+        self.topic = topic
+        self.client = create_client(transport)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.connect(broker, port, 60)
+        self.client.loop_start()
+
+    def on_connect(self, client, userdata, flags, rc):
+        client.subscribe(self.topic)
+        self.connected.set()
+
+    def on_message(self, client, userdata, msg):
+        self.app.on_message(client, userdata, msg)
+        self.messages += 1
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def web_reader(app, zones, stop, latencies, errors):
+    """Alternate GET /api/latest and GET / through the app until stopped"""
+    client = app.app.test_client()
+    i = 0
+    while not stop.is_set():
+        zone = zones[i % len(zones)]
+        start = time.perf_counter()
+        response = client.get(f"/api/latest?zone={zone}" if i % 2 else f"/?zone={zone}")
+        latencies.append(time.perf_counter() - start)
+        # 404 is /api/latest before the writer's first flush
+        if response.status_code not in (200, 304, 404):
+            errors.append(response.status_code)
+        i += 1
+        time.sleep(0.001)
+
+
+def drive(args, publisher, writer, stop_at):
+    """Publish one reading per bed every 1/rate seconds until stop_at"""
+    engine = SensorBatch(args.beds, args.seed)
+    zones = [f"bed{i}" for i in range(args.beds)]
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    next_tick = time.perf_counter()
+    published = behind = 0
+    while time.perf_counter() < stop_at:
+        engine.step()
+        timestamp = datetime.now(timezone.utc).isoformat()
+        for i, zone in enumerate(zones):
+            publish_reading(publisher, writer, dict(engine.payload(i), timestamp=timestamp, zone=zone), zone)
+        published += args.beds
+        if interval:
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                behind += 1
+    publisher.close()
+    return published, behind
+
+
+def run(args):
+    if args.transport == TRANSPORT_MEMORY:
+        MemoryBroker.reset()
+    broker = None
+    if args.broker:
+        host, port = args.broker.rsplit(":", 1)
+        port = int(port)
+    elif args.transport == TRANSPORT_TCP:
+        broker = LocalBroker(port=0).start()
+        host, port = broker.host, broker.port
+    else:
+        host, port = "localhost", 1883
+
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    db_path = os.path.join(workdir, "bench.db" if args.backend == "sqlite" else "segments")
+    writer = SensorDataWriter(db_path, args.db_flush_rows, 5.0, "day", args.backend)
+    store = open_store(db_path, args.backend, "day")
+    app = load_dashboard(store)
+
+    controller = BenchController(host, port, rules=CONTROL_RULES, transport=args.transport)
+    dashboard = DashboardSink(app, args.transport, host, port, SENSOR_TOPIC) if app else None
+    client = create_client(args.transport)
+    client.connect(host, port, 60)
+    client.loop_start()
+    if not (controller.connected.wait(10) and (dashboard is None or dashboard.connected.wait(10))):
+        raise RuntimeError(f"Could not connect to the MQTT broker at {host}:{port}")
+    time.sleep(0.2)  # let the SUBSCRIBEs land before the first publish
+    publisher = BatchPublisher(client, SENSOR_TOPIC, args.format or topic_format(SENSOR_TOPIC),
+                               args.batch, args.batch_latency)
+
+    stop = threading.Event()
+    read_latencies, read_errors = [], []
+    readers = [threading.Thread(target=web_reader, daemon=True,
+                                args=(app, [f"bed{i}" for i in range(args.beds)],
+                                      stop, read_latencies, read_errors))
+               for _ in range(args.web_readers if app else 0)]
+    for reader in readers:
+        reader.start()
+
+    usage_before = process_usage()
+    start = time.perf_counter()
+    published, behind = drive(args, publisher, writer, start + args.duration)
+    # Drain: wait until the controller has seen every reading or gives up
+    deadline = time.perf_counter() + args.drain_timeout
+    while controller.processed < published and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    usage_after = process_usage()
+
+    stop.set()
+    for reader in readers:
+        reader.join()
+    client.loop_stop()
+    client.disconnect()
+    if dashboard is not None:
+        dashboard.close()
+    controller.client.loop_stop()
+    controller.client.disconnect()
+    writer.close()
+    store.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    if broker is not None:
+        broker.stop()
+
+    cpu = usage_after["cpu_seconds"] - usage_before["cpu_seconds"]
+    return {
+        "readings_published": published,
+        "messages_published": publisher.messages_sent,
+        "readings_processed": controller.processed,
+        "readings_lost": published - controller.processed,
+        "ticks_behind": behind,
+        "elapsed_s": round(elapsed, 3),
+        "readings_per_sec": round(controller.processed / elapsed, 1),
+        "messages_per_sec": round(publisher.messages_sent / elapsed, 1),
+        "decision_latency_ms": percentiles(controller.latencies),
+        "command_latency_ms": percentiles(controller.command_latencies),
+        "commands": controller.commands.stats(),
+        "database": writer.stats(),
+        "dashboard": {
+            "messages": dashboard.messages,
+            "requests": len(read_latencies),
+            "request_errors": len(read_errors),
+            "request_latency_ms": percentiles(read_latencies),
+        } if dashboard else "skipped, Flask is not installed",
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(cpu / elapsed * 100, 1),
+        "max_rss_mb": usage_after["max_rss_mb"],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages against a previous run's results"""
+    regressions = []
+    old, new = baseline["results"]["readings_per_sec"], results["readings_per_sec"]
+    if old and new < old * (1 - tolerance):
+        regressions.append(f"readings/sec {new:,.1f} vs baseline {old:,.1f}")
+    old, new = baseline["results"]["decision_latency_ms"]["p99"], results["decision_latency_ms"]["p99"]
+    if old and new is not None and new > old * (1 + tolerance):
+        regressions.append(f"p99 decision latency {new}ms vs baseline {old}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--beds", type=int, default=10, help="simulated garden beds (zones)")
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="readings/sec per bed, 0 publishes as fast as possible")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of publishing")
+    parser.add_argument("--transport", choices=(TRANSPORT_MEMORY, TRANSPORT_TCP), default=TRANSPORT_MEMORY)
+    parser.add_argument("--broker", help="HOST:PORT of a running broker instead of a local one")
+    parser.add_argument("--format", choices=("json", "binary"), help="payload format, default per config")
+    parser.add_argument("--batch", type=int, default=1, help="readings per MQTT message")
+    parser.add_argument("--batch-latency", type=float, default=0.05)
+    parser.add_argument("--db-flush-rows", type=int, default=100)
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite", help="sensor storage backend")
+    parser.add_argument("--web-readers", type=int, default=2, help="threads requesting dashboard pages")
+    parser.add_argument("--drain-timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, 0.2 = 20%%")
+    parser.add_argument("--verbose", action="store_true", help="keep the controllers' log lines")
+    args = parser.parse_args()
+    if args.transport == TRANSPORT_MEMORY and args.broker:
+        parser.error("--broker needs --transport tcp")
+
+    started = datetime.now(timezone.utc).isoformat()
+    # Keep the report readable, anomaly warnings would interleave with it
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+    results = run(args)
+
+    report = {
+        "benchmark": "pipeline",
+        "started": started,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "results": results,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
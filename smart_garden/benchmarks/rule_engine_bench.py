@@ -0,0 +1,73 @@
+"""Rule engine throughput benchmark
+
+Run from the smart_garden directory:
+    python -m benchmarks.rule_engine_bench --rules 1000 --readings 20000
+"""
+import argparse
+import random
+import time
+from controllers.rule_engine import RuleEngine
+
+FIELD_RANGES = {
+    "humidity": (0, 100),
+    "light": (0, 1000),
+    "ph": (4.0, 9.0),
+    "co2": (350, 2000),
+}
+
+
+def make_rules(count, rng):
+    """Generate threshold rules spread over the sensor fields"""
+    fields = list(FIELD_RANGES)
+    rules = []
+    for i in range(count):
+        field = fields[i % len(fields)]
+        low, high = FIELD_RANGES[field]
+        rules.append({
+            "name": f"rule_{i}",
+            "field": field,
+            "op": rng.choice(["<", ">"]),
+            "threshold": rng.uniform(low, high),
+            "hysteresis": (high - low) * 0.02,
+            "cooldown": 30,
+            "command": {"action": f"action_{i}"},
+        })
+    return rules
+
+
+def make_readings(count, zones, rng):
+    """Generate readings from several zones"""
+    return [
+        dict({field: rng.uniform(low, high) for field, (low, high) in FIELD_RANGES.items()},
+             zone=f"zone_{i % zones}", rain=rng.random() < 0.1)
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--zones", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    engine = RuleEngine(make_rules(args.rules, rng))
+    readings = make_readings(args.readings, args.zones, rng)
+
+    fired = 0
+    start = time.perf_counter()
+    for i, reading in enumerate(readings):
+        fired += len(engine.evaluate(reading, now=i * 2.0))
+    elapsed = time.perf_counter() - start
+
+    print(f"Rules: {args.rules}  Readings: {args.readings}  Zones: {args.zones}")
+    print(f"Rules evaluated: {engine.evaluated}  Commands fired: {fired}")
+    print(f"Elapsed: {elapsed:.3f}s")
+    print(f"Readings/sec: {args.readings / elapsed:,.0f}")
+    print(f"Rules evaluated/sec: {engine.evaluated / elapsed:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Live update fan-out benchmark and concurrent-client capacity sweep
+
+Run from the smart_garden directory:
+    python -m benchmarks.sse_fanout_bench --clients 50,100,200,400,800 --p99-target 100
+    python -m benchmarks.sse_fanout_bench --transport inproc --clients 500
+
+--transport http (default) serves the real dashboard app (Web_Page/Web_page.py)
+on a threaded Werkzeug server and connects every client to its /stream route
+over a socket, so each one costs a server thread, a connection and the
+app's SSE framing like a browser would. --transport inproc reads the
+Broadcaster directly from threads, which isolates the fan-out itself.
+
+Each client count in --clients is run in turn with updates published
+every --interval seconds. The sweep stops at the first count where the
+p99 delivery latency exceeds --p99-target milliseconds or an update is
+not delivered, and the largest count before it is reported as capacity.
+"""
+import argparse
+import json
+import logging
+import socket
+import statistics
+import sys
+import threading
+import time
+from storage import SensorStore
+from web.live_updates import Broadcaster
+
+try:
+    from werkzeug.serving import make_server
+except ImportError:
+    make_server = None
+
+
+def read_frames(lines, updates, latencies):
+    """Record the latency of each update in an SSE line stream, return (received, resyncs)
+
+    The first data line is the snapshot. A later data line without a
+    "sent" stamp is a snapshot resent to a client that fell behind.
+    """
+    received = resyncs = 0
+    snapshot = True
+    for line in lines:
+        if not line.startswith("data: "):
+            continue
+        if snapshot:
+            snapshot = False
+            yield "ready"
+            continue
+        sent = json.loads(line[6:]).get("sent")
+        if sent is None:
+            resyncs += 1
+            continue
+        latencies.append(time.perf_counter() - sent)
+        received += 1
+        if received >= updates:
+            break
+    yield received, resyncs
+
+
+def inproc_client(broadcaster, updates, latencies, ready, outcome):
+    """Consume the Broadcaster's stream directly, like the route's generator"""
+    stream = broadcaster.stream(lambda: {}, heartbeat=1.0)
+
+    def lines():
+        for frame in stream:
+            yield from frame.splitlines()
+
+    for state in read_frames(lines(), updates, latencies):
+        if state == "ready":
+            ready.release()
+        else:
+            outcome.append(state)
+    stream.close()
+
+
+def http_client(host, port, zone, updates, latencies, ready, outcome, timeout):
+    """Consume /stream over a socket, recording delivery latency"""
+    announced = False
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock, sock.makefile("rb") as f:
+            # HTTP/1.0 keeps the body unchunked, one SSE line per line read
+            sock.sendall(f"GET /stream?zone={zone} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+            lines = (raw.decode().rstrip("\r\n") for raw in f)
+            for state in read_frames(lines, updates, latencies):
+                if state == "ready":
+                    announced = True
+                    ready.release()
+                else:
+                    outcome.append(state)
+    except OSError as e:
+        outcome.append(e)
+    if not announced:
+        ready.release()
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else None
+
+
+def run_round(args, clients, start_client, publish, settle):
+    """Connect `clients` clients, publish the updates, return the round's measurements"""
+    ready = threading.Semaphore(0)
+    latencies = [[] for _ in range(clients)]
+    outcomes = [[] for _ in range(clients)]
+    threads = [threading.Thread(target=start_client, args=(latencies[i], ready, outcomes[i]), daemon=True)
+               for i in range(clients)]
+    connect_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        ready.acquire()
+    connect_time = time.perf_counter() - connect_start
+    connected = sum(1 for outcome in outcomes if not outcome)
+
+    publish_time = 0.0
+    start = time.perf_counter()
+    for i in range(args.updates):
+        t = time.perf_counter()
+        publish({"humidity": i % 100, "sent": t})
+        publish_time += time.perf_counter() - t
+        time.sleep(args.interval)
+    for thread in threads:
+        thread.join(args.timeout + 1)
+    elapsed = time.perf_counter() - start
+    settle()
+
+    ordered = sorted(latency for result in latencies for latency in result)
+    errors = sum(1 for outcome in outcomes if outcome and not isinstance(outcome[0], tuple))
+    resyncs = sum(outcome[0][1] for outcome in outcomes if outcome and isinstance(outcome[0], tuple))
+    return {
+        "clients": clients,
+        "connected": connected,
+        "errors": errors,
+        "connect_s": round(connect_time, 3),
+        "delivered": len(ordered) / (clients * args.updates),
+        "resyncs": resyncs,
+        "events_per_sec": len(ordered) / elapsed,
+        "publish_ms": publish_time / args.updates * 1000,
+        "p50_ms": statistics.median(ordered) * 1000 if ordered else None,
+        "p99_ms": percentile(ordered, 99) * 1000 if ordered else None,
+        "max_ms": ordered[-1] * 1000 if ordered else None,
+    }
+
+
+def http_rounds(args):
+    """Yield (clients, client target, publish, settle) per sweep step against the real app"""
+    from benchmarks.pipeline_bench import load_dashboard
+    app = load_dashboard(SensorStore(":memory:"))
+    if app is None or make_server is None:
+        sys.exit("--transport http needs Flask and Werkzeug, install them or use --transport inproc")
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    server.request_queue_size = max(server.request_queue_size, max(args.clients))
+    threading.Thread(target=server.serve_forever, name="sse-bench-http", daemon=True).start()
+    try:
+        for clients in args.clients:
+            # A fresh zone per step keeps the previous step's closing streams out of it
+            zone = f"bench{clients}"
+            broadcaster = app.zone_updates(zone)
+
+            def settle():
+                # Wake the server threads of closed streams so they notice and exit
+                deadline = time.perf_counter() + args.timeout
+                while broadcaster.clients and time.perf_counter() < deadline:
+                    broadcaster.publish({})
+                    time.sleep(0.05)
+
+            yield (clients,
+                   lambda latencies, ready, outcome: http_client(
+                       "127.0.0.1", server.server_port, zone, args.updates, latencies, ready, outcome,
+                       args.timeout),
+                   broadcaster.publish, settle)
+    finally:
+        server.shutdown()
+
+
+def inproc_rounds(args):
+    for clients in args.clients:
+        broadcaster = Broadcaster(size=max(256, args.updates))
+        yield (clients,
+               lambda latencies, ready, outcome: inproc_client(
+                   broadcaster, args.updates, latencies, ready, outcome),
+               broadcaster.publish, lambda: None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", default="50,100,200,400,800,1600",
+                        type=lambda value: sorted(int(n) for n in value.split(",")),
+                        help="comma-separated client counts to sweep, smallest first")
+    parser.add_argument("--updates", type=int, default=100, help="updates published per step")
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between updates")
+    parser.add_argument("--p99-target", type=float, default=100.0, help="p99 delivery latency limit, ms")
+    parser.add_argument("--transport", choices=("http", "inproc"), default="http")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds a client waits for an event")
+    args = parser.parse_args()
+    # One access log line per stream would bury the table
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    rounds = http_rounds(args) if args.transport == "http" else inproc_rounds(args)
+    capacity = None
+    print(f"Transport: {args.transport}  Updates per step: {args.updates}  "
+          f"p99 target: {args.p99_target:g}ms")
+    print(f"{'clients':>8} {'connected':>9} {'delivered':>9} {'events/s':>9} {'publish':>9} "
+          f"{'p50':>8} {'p99':>8} {'max':>8}")
+    for clients, start_client, publish, settle in rounds:
+        result = run_round(args, clients, start_client, publish, settle)
+        print(f"{clients:>8} {result['connected']:>9} {result['delivered']:>8.1%} "
+              f"{result['events_per_sec']:>9,.0f} {result['publish_ms']:>7.3f}ms "
+              + " ".join(f"{result[key]:>6.1f}ms" if result[key] is not None else f"{'-':>8}"
+                         for key in ("p50_ms", "p99_ms", "max_ms")))
+        within = (result["delivered"] >= 1.0 and not result["errors"]
+                  and result["p99_ms"] is not None and result["p99_ms"] <= args.p99_target)
+        if not within:
+            break
+        capacity = clients
+    rounds.close()
+    if capacity is None:
+        print(f"Capacity: below {args.clients[0]} clients at p99 <= {args.p99_target:g}ms")
+    else:
+        print(f"Capacity: {capacity} concurrent clients at p99 <= {args.p99_target:g}ms"
+              + ("" if capacity < args.clients[-1] else ", the largest count tried"))
+
+
+if __name__ == "__main__":
+    main()
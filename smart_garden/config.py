@@ -6,6 +6,34 @@ MQTT_PORT = 1883
 SENSOR_TOPIC = "garden/sensors"
 CONTROL_TOPIC = "garden/control"
 
+# Multi-zone topics, SENSOR_TOPIC/CONTROL_TOPIC are the single-zone default
+SENSOR_TOPIC_TEMPLATE = "garden/{zone}/sensors"
+CONTROL_TOPIC_TEMPLATE = "garden/{zone}/control"
+ANOMALY_TOPIC = "garden/anomalies"
+ANOMALY_TOPIC_TEMPLATE = "garden/{zone}/anomalies"
+ZONES = []          # Zones served by main_controller.py, empty = single zone
+ZONE_WORKERS = 2    # Worker processes the zones are sharded across
+SIMULATOR_ZONE = None  # Zone main_simulator.py publishes for, None = single zone
+
+# Payload format per topic: "json" or "binary" (see messaging/codec.py)
+# Subscribers auto-detect both, so a topic can switch without a flag day
+DEFAULT_PAYLOAD_FORMAT = "json"
+PAYLOAD_FORMATS = {
+    SENSOR_TOPIC: "json",
+    SENSOR_TOPIC_TEMPLATE: "json",
+    "garden/data": "json",
+}
+
+# Publisher batching: latency vs throughput knob (see messaging/batching.py)
+# A batch goes out at BATCH_MAX_READINGS readings or after BATCH_MAX_LATENCY
+# seconds, whichever comes first. 1 reading disables batching.
+BATCH_MAX_READINGS = 1
+BATCH_MAX_LATENCY = 0.5
+
+# Controller runtime (see controllers/async_runtime.py)
+CONTROLLER_QUEUE_SIZE = 1000   # Pause socket reads at this many queued messages
+CONTROLLER_WORKERS = 4         # Handler tasks per controller
+
 # Control Thresholds
 WATERING_THRESHOLD = 30
 LIGHTING_THRESHOLD = 500
@@ -16,4 +44,104 @@ CO2_THRESHOLD_HIGH = 1500
 VENTILATION_THRESHOLD = 50
 DROUGHT_THRESHOLD = 30
 MIN_PH = 4.0
-MAX_PH = 9.0
\ No newline at end of file
+MAX_PH = 9.0
+
+# Control rules (see controllers/rule_engine.py)
+# op: "<", "<=", ">", ">=", "==" or "true"
+# hysteresis: how far past the threshold the value must recover before
+#             the rule can fire again
+# cooldown: seconds between repeated commands while the rule stays active,
+#           0 sends the command only once per activation
+CONTROL_RULES = [
+    {"name": "rain", "field": "rain", "op": "true",
+     "command": {"action": "stop_watering"},
+     "message": "☔ Detected rain! Canceling irrigation..."},
+    {"name": "low_humidity", "field": "humidity", "op": "<", "threshold": WATERING_THRESHOLD,
+     "hysteresis": 5, "cooldown": 60,
+     "command": {"action": "water", "duration": 5},
+     "message": "🚨 Low humidity! Current: {value}% (Threshold: {threshold}%)"},
+    {"name": "low_light", "field": "light", "op": "<", "threshold": LIGHTING_THRESHOLD,
+     "hysteresis": 50, "cooldown": 600,
+     "command": {"action": "light_on", "duration": 10},
+     "message": "🌑 Low light! Current: {value}lux (Threshold: {threshold}lux)"},
+    {"name": "low_co2", "field": "co2", "op": "<", "threshold": CO2_THRESHOLD_LOW,
+     "hysteresis": 50, "cooldown": 60,
+     "command": {"action": "adjust_ventilation", "mode": "enrich", "duration": 15},
+     "message": "🌬️ Low CO₂! Current: {value}ppm (Threshold: {threshold}ppm)"},
+    {"name": "high_co2", "field": "co2", "op": ">", "threshold": CO2_THRESHOLD_HIGH,
+     "hysteresis": 50, "cooldown": 60,
+     "command": {"action": "adjust_ventilation", "mode": "vent", "duration": 10},
+     "message": "⚠️ High CO₂! Current: {value}ppm (Threshold: {threshold}ppm)"},
+    {"name": "low_ph", "field": "ph", "op": "<", "threshold": PH_THRESHOLD_LOW,
+     "hysteresis": 0.2, "cooldown": 300,
+     "command": {"action": "adjust_ph", "substance": "alkaline", "amount": 10},
+     "message": "🚨 Low PH! Current: {value} (Threshold: {threshold})"},
+    {"name": "high_ph", "field": "ph", "op": ">", "threshold": PH_THRESHOLD_HIGH,
+     "hysteresis": 0.2, "cooldown": 300,
+     "command": {"action": "adjust_ph", "substance": "acidic", "amount": 10},
+     "message": "🚨 High PH! Current: {value} (Threshold: {threshold})"},
+]
+
+# Control plane (see controllers/command_plane.py)
+# Maps each command action to the actuator it drives. While a command is
+# active (its "duration", else "hold" seconds) identical commands are
+# suppressed and lower-priority ones for the same actuator are overridden.
+# Commands for one actuator fired by the same reading are merged, the
+# highest priority wins. Unlisted actions pass through unchanged.
+COMMAND_ACTUATORS = {
+    "water": {"actuator": "water_pump", "priority": 1},
+    "stop_watering": {"actuator": "water_pump", "priority": 2, "hold": 600},
+    "light_on": {"actuator": "grow_light", "priority": 1},
+    "adjust_ventilation": {"actuator": "ventilation", "priority": 1},
+    "adjust_ph": {"actuator": "ph_doser", "priority": 1, "hold": 300},
+}
+
+# Anomaly detection (see controllers/anomaly_detector.py)
+# min/max: physically possible range, readings outside are out_of_range
+# max_rate: largest believable change per second, None disables the check
+# stuck: identical readings in a row that mean a stuck probe, 0 disables
+# Out-of-range and stuck values are flagged and kept away from CONTROL_RULES
+# The simulators redraw humidity from 20-80% on every reading, so any
+# change rate is normal for it and only the deviation check applies
+ANOMALY_FIELDS = {
+    "humidity": {"min": 0, "max": 100, "max_rate": None, "stuck": 30},
+    "light": {"min": 0, "max": 2000, "max_rate": None, "stuck": 0},
+    "ph": {"min": 0, "max": 14, "max_rate": 1.0, "stuck": 20},
+    "co2": {"min": 0, "max": 10000, "max_rate": 400, "stuck": 30},
+}
+ANOMALY_EWMA_ALPHA = 0.1     # Weight of the newest reading in the moving average
+ANOMALY_SPIKE_SIGMA = 4.0    # Deviation from the average, in standard deviations
+ANOMALY_WARMUP = 30          # Readings before the deviation check starts
+
+# Predictive irrigation (see controllers/irrigation_forecast.py)
+# Each zone's humidity trend is fitted as readings arrive.
+# FORECAST_COMMAND is sent once humidity is projected to reach
+# WATERING_THRESHOLD within FORECAST_LEAD seconds, unless rain is likely.
+FORECAST_ENABLED = True
+FORECAST_FORGETTING = 0.998   # Weight decay per reading, about 500 readings of memory
+FORECAST_RAIN_WINDOW = 1800   # Seconds the rain frequency is averaged over
+FORECAST_RAIN_SKIP = 0.3      # Skip forecast watering at this rain probability or above
+FORECAST_LEAD = 300           # Seconds ahead of the threshold to water
+FORECAST_WARMUP = 150         # Readings before forecasts are acted on
+FORECAST_COOLDOWN = 60        # Seconds between forecast waterings of a zone
+FORECAST_MIN_RATE = 2.0       # Slowest drying, in %/h, worth watering ahead for
+FORECAST_CONFIDENCE = 4.0     # Standard errors the drying rate must be below zero
+FORECAST_COMMAND = {"action": "water", "duration": 5, "reason": "forecast"}
+
+# Database Configuration
+DB_PATH = "garden_sensor_data.db"
+DB_FLUSH_ROWS = 100        # Flush after this many buffered readings
+DB_FLUSH_INTERVAL = 5.0    # ...or after this many seconds
+DB_PARTITION = "month"     # "day" or "month" partition tables
+DB_BACKEND = "sqlite"      # "sqlite" or "segments" (append-only mmap logs, see storage/segment_log.py)
+SEGMENT_DIR = "garden_segments"  # Root of the segment logs when DB_BACKEND = "segments"
+ARCHIVE_DIR = "archive"    # Root of the columnar archive, see storage/archive.py
+ARCHIVE_FORMAT = "auto"    # "parquet", "arrow", "npy" or "auto" (parquet if pyarrow is installed)
+ARCHIVE_AFTER_DAYS = 30    # Days of raw readings kept in the database
+
+# Monitoring (see monitoring/)
+LOG_LEVEL = "INFO"
+LOG_INTERVAL = 10.0             # Seconds between log lines for a repeating event
+CONTROLLER_METRICS_PORT = 9108  # /metrics of main_controller.py, 0 disables
+SIMULATOR_METRICS_PORT = 9109   # /metrics of main_simulator.py, 0 disables
+ZONE_METRICS_PORT_BASE = 9120   # Zone worker n serves /metrics on this + n, 0 disables
@@ -0,0 +1,132 @@
+"""Heap-based scheduler that switches actuators off after their run time"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class ActuatorScheduler:
+    """Tracks running actuators and fires their OFF events from one thread
+
+    - activate() records a deadline and returns immediately; on_start is
+      called only when the actuator was off
+    - Overlapping requests move the deadline later instead of queueing a
+      second run
+    - Deadlines live in a binary heap, so scheduling and expiry are
+      O(log n) however many actuators are running. Extended deadlines
+      leave stale heap entries that are skipped when popped.
+    - on_start and on_expire run under one `switching` lock, in the order
+      the state changed. An actuator activated again between its expiry
+      and its OFF callback is left on.
+    """
+    def __init__(self, on_expire: Callable[[Hashable], None], clock=time.monotonic,
+                 on_start: Optional[Callable[[Hashable], None]] = None):
+        self.on_expire = on_expire
+        self.on_start = on_start
+        self.clock = clock
+        self.switching = threading.RLock()
+        self.deadlines: Dict[Hashable, float] = {}
+        self.heap: List[Tuple[float, int, Hashable]] = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="actuator-scheduler", daemon=True)
+        self.thread.start()
+
+    def activate(self, actuator: Hashable, duration: float) -> Optional[bool]:
+        """Keep an actuator on for at least `duration` more seconds
+
+        Returns True if the actuator was off and on_start was called,
+        False if its running window was extended and None if the current
+        deadline was already later.
+        """
+        with self.switching:
+            deadline = self.clock() + duration
+            with self.condition:
+                current = self.deadlines.get(actuator)
+                if current is not None and current >= deadline:
+                    return None
+                self.deadlines[actuator] = deadline
+                heapq.heappush(self.heap, (deadline, next(self.counter), actuator))
+                self._compact()
+                # Wake the worker only if this is now the earliest deadline
+                if self.heap[0][2] == actuator:
+                    self.condition.notify()
+            if current is not None:
+                return False
+            if self.on_start is not None:
+                self.on_start(actuator)
+            return True
+
+    def cancel(self, actuator: Hashable) -> bool:
+        """Switch an actuator off now, returns False if it was not running"""
+        with self.switching:
+            with self.condition:
+                if self.deadlines.pop(actuator, None) is None:
+                    return False
+            self.on_expire(actuator)
+            return True
+
+    def is_active(self, actuator: Hashable) -> bool:
+        with self.condition:
+            return actuator in self.deadlines
+
+    def remaining(self, actuator: Hashable) -> Optional[float]:
+        """Seconds until the actuator switches off, None if it is off"""
+        with self.condition:
+            deadline = self.deadlines.get(actuator)
+        return None if deadline is None else max(0.0, deadline - self.clock())
+
+    def _compact(self):
+        """Drop stale entries once they outnumber live ones, caller holds the lock"""
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.heap = [(deadline, next(self.counter), actuator)
+                         for actuator, deadline in self.deadlines.items()]
+            heapq.heapify(self.heap)
+
+    def _pop_expired(self) -> List[Hashable]:
+        """Remove due actuators from the heap, caller holds the lock"""
+        now = self.clock()
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, actuator = heapq.heappop(self.heap)
+            if self.deadlines.get(actuator) == deadline:
+                del self.deadlines[actuator]
+                expired.append(actuator)
+        return expired
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+                expired = self._pop_expired()
+                if not expired:
+                    timeout = self.heap[0][0] - self.clock() if self.heap else None
+                    self.condition.wait(timeout)
+                    continue
+            # Callbacks run outside the condition so they may call activate()
+            for actuator in expired:
+                with self.switching:
+                    if self.is_active(actuator):
+                        # Activated again since it was popped, its ON already went out
+                        continue
+                    try:
+                        self.on_expire(actuator)
+                    except Exception as e:
+                        print(f"❌ Actuator OFF callback failed for {actuator}: {e}")
+
+    def stop(self, switch_off=True):
+        """Stop the worker, optionally switching running actuators off first"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        with self.switching:
+            with self.condition:
+                remaining = list(self.deadlines) if switch_off else []
+                self.deadlines.clear()
+                self.heap.clear()
+            for actuator in remaining:
+                self.on_expire(actuator)
@@ -0,0 +1,136 @@
+"""Streaming anomaly detection with O(1) state per zone and sensor"""
+import math
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from config import ANOMALY_FIELDS, ANOMALY_EWMA_ALPHA, ANOMALY_SPIKE_SIGMA, ANOMALY_WARMUP
+
+OUT_OF_RANGE = "out_of_range"
+STUCK = "stuck"
+SPIKE = "spike"
+# Values with these flags are not trusted for control decisions
+UNTRUSTED = (OUT_OF_RANGE, STUCK)
+
+
+class FieldMonitor:
+    """Online statistics of one sensor in one zone
+
+    Keeps a Welford running mean/variance, an EWMA, the previous value and
+    timestamp, and how often the value has repeated. update() checks the
+    new value against them before folding it in, so memory and time per
+    reading stay constant however long the stream runs.
+    """
+    __slots__ = ("low", "high", "max_rate", "stuck", "n", "mean", "m2",
+                 "ewma", "last", "last_ts", "repeats")
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.low = spec.get("min", -math.inf)
+        self.high = spec.get("max", math.inf)
+        self.max_rate = spec.get("max_rate")
+        self.stuck = spec.get("stuck", 0)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = 0.0
+        self.last = 0.0
+        self.last_ts = 0.0
+        self.repeats = 0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def update(self, value: float, ts: float, alpha: float, sigma: float, warmup: int) -> Optional[str]:
+        """Fold a reading in and return its anomaly kind, None if it looks normal"""
+        if value < self.low or value > self.high:
+            # Impossible values would poison the statistics, leave them out
+            return OUT_OF_RANGE
+        kind = None
+        n = self.n
+        if n:
+            change = value - self.last
+            if change == 0:
+                self.repeats += 1
+                # Every reading of a long enough run is stuck, not just the first
+                if self.stuck and self.repeats >= self.stuck:
+                    kind = STUCK
+            else:
+                self.repeats = 0
+                elapsed = ts - self.last_ts
+                if self.max_rate is not None and elapsed > 0 and abs(change) > self.max_rate * elapsed:
+                    kind = SPIKE
+            if kind is None and n >= warmup and self.m2 > 0 \
+                    and abs(value - self.ewma) > sigma * math.sqrt(self.m2 / (n - 1)):
+                kind = SPIKE
+            self.ewma += alpha * (value - self.ewma)
+        else:
+            self.ewma = value
+        n += 1
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+        self.n = n
+        self.last = value
+        self.last_ts = ts
+        return kind
+
+
+class AnomalyDetector:
+    """Flags stuck, spiking and out-of-range sensor readings per zone
+
+    Sits between message decoding and the rule engine. check() returns
+    one flag dict per anomalous field; the caller publishes them and can
+    drop untrusted values before rules see them. A stuck probe is flagged
+    on every reading of the run, with "ongoing" set after the first, so
+    its values stay untrusted while the flag is only published once.
+    """
+    def __init__(self, fields=ANOMALY_FIELDS, alpha=ANOMALY_EWMA_ALPHA,
+                 sigma=ANOMALY_SPIKE_SIGMA, warmup=ANOMALY_WARMUP):
+        self.specs = dict(fields)
+        self.alpha = alpha
+        self.sigma = sigma
+        self.warmup = warmup
+        self.monitors: Dict[Tuple[Any, str], FieldMonitor] = {}
+        self.checked = 0
+        self.flagged = 0
+
+    def monitor(self, zone, field: str) -> FieldMonitor:
+        key = (zone, field)
+        monitor = self.monitors.get(key)
+        if monitor is None:
+            monitor = self.monitors[key] = FieldMonitor(self.specs[field])
+        return monitor
+
+    def check(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Update the statistics with one reading and return its anomaly flags"""
+        timestamp = data.get("timestamp")
+        ts = timestamp.timestamp() if hasattr(timestamp, "timestamp") else time.time()
+        zone = data.get("zone")
+        flags = []
+        self.checked += 1
+        for field in self.specs:
+            value = data.get(field)
+            if value is None:
+                continue
+            monitor = self.monitors.get((zone, field)) or self.monitor(zone, field)
+            kind = monitor.update(value, ts, self.alpha, self.sigma, self.warmup)
+            if kind is not None:
+                flags.append({
+                    "zone": zone,
+                    "field": field,
+                    "kind": kind,
+                    "value": value,
+                    "expected": round(monitor.ewma, 2),
+                    "std": round(monitor.std, 2),
+                    "ongoing": kind == STUCK and monitor.repeats > monitor.stuck,
+                    "timestamp": timestamp,
+                })
+        self.flagged += len(flags)
+        return flags
+
+    def reset(self, zone=None):
+        """Forget statistics for one zone, or all zones"""
+        if zone is None:
+            self.monitors.clear()
+        else:
+            for key in [key for key in self.monitors if key[0] == zone]:
+                del self.monitors[key]
@@ -0,0 +1,194 @@
+"""asyncio runtime hosting many MQTT controllers on one event loop"""
+import asyncio
+import signal
+from typing import List, Optional
+import paho.mqtt.client as mqtt
+from monitoring import EventLog, counter, gauge
+
+log = EventLog(__name__)
+queue_depth = gauge("controller_queue_depth", "Messages waiting for a handler task", ("zone",))
+read_pauses = counter("controller_read_pauses_total", "Times socket reads were paused for backpressure")
+handler_errors = counter("controller_handler_errors_total", "Exceptions raised by message handlers")
+
+
+class AsyncMqttAdapter:
+    """Drives a paho client from an asyncio loop instead of its own thread
+
+    paho reports socket open/close and pending writes through callbacks;
+    the adapter turns them into loop readers/writers plus a once-a-second
+    loop_misc() task for keepalives. Reading can be paused to push back on
+    the broker when the handlers fall behind.
+    """
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.sock = None
+        self.paused = False
+        self.misc_task: Optional[asyncio.Task] = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.sock = sock
+        if not self.paused:
+            self.loop.add_reader(sock, client.loop_read)
+        self.misc_task = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.sock = None
+        if self.misc_task is not None:
+            self.misc_task.cancel()
+            self.misc_task = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+    def pause_reading(self):
+        if not self.paused and self.sock is not None:
+            self.loop.remove_reader(self.sock)
+        self.paused = True
+
+    def resume_reading(self):
+        if self.paused and self.sock is not None:
+            self.loop.add_reader(self.sock, self.client.loop_read)
+        self.paused = False
+
+
+class ControllerBinding:
+    """Per-controller queue, handler tasks and socket adapter"""
+    def __init__(self, runtime, controller):
+        self.controller = controller
+        self.loop = asyncio.get_running_loop()
+        self.adapter = AsyncMqttAdapter(self.loop, controller.client)
+        # Unbounded queue with explicit watermarks: paho may deliver several
+        # messages per socket read, so put() must never fail
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.high_water = runtime.queue_size
+        self.low_water = runtime.queue_size // 2
+        self.workers = [self.loop.create_task(self.worker()) for _ in range(runtime.workers)]
+        self.closing = False
+        self.reconnect_task: Optional[asyncio.Task] = None
+        controller.client.on_disconnect = self.on_disconnect
+        # Sampled on scrape, costs nothing per message
+        queue_depth.labels(getattr(controller, "zone", None) or "default").set_function(self.queue.qsize)
+
+    def on_disconnect(self, client, userdata, rc):
+        """paho's thread loop reconnects on its own, here we do it"""
+        if rc != 0 and not self.closing and self.reconnect_task is None:
+            self.reconnect_task = self.loop.create_task(self.reconnect())
+
+    async def reconnect(self, max_delay=30):
+        delay = 1
+        try:
+            while not self.closing:
+                await asyncio.sleep(delay)
+                try:
+                    self.controller.client.reconnect()
+                    return
+                except OSError as e:
+                    log.warning("⚠️ Reconnect failed", error=e, retry_in=delay)
+                    delay = min(delay * 2, max_delay)
+        finally:
+            self.reconnect_task = None
+
+    def enqueue(self, msg):
+        """paho on_message callback, runs on the event loop thread"""
+        self.queue.put_nowait(msg)
+        if self.queue.qsize() >= self.high_water and not self.adapter.paused:
+            read_pauses.inc()
+            self.adapter.pause_reading()
+
+    async def worker(self):
+        while True:
+            msg = await self.queue.get()
+            try:
+                result = self.controller.on_message(self.controller.client, None, msg)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                handler_errors.inc()
+                log.error("❌ Handler error", key=type(e).__name__, error=e)
+            finally:
+                self.queue.task_done()
+                if self.adapter.paused and self.queue.qsize() <= self.low_water:
+                    self.adapter.resume_reading()
+
+    async def shutdown(self, drain_timeout):
+        """Stop reading, let queued messages finish, then disconnect"""
+        self.closing = True
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+        self.adapter.pause_reading()
+        try:
+            await asyncio.wait_for(self.queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("⚠️ Dropped queued messages on shutdown", count=self.queue.qsize())
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.controller.client.disconnect()
+
+
+class AsyncControllerRuntime:
+    """Runs any number of controllers on the current event loop
+
+    Pass the runtime to a controller's constructor instead of letting it
+    start paho's background thread. Each controller gets a queue with
+    backpressure (socket reads pause at queue_size pending messages and
+    resume at half that) and `workers` handler tasks.
+    """
+    def __init__(self, queue_size=1000, workers=4, drain_timeout=5.0):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.bindings: List[ControllerBinding] = []
+        self.stop_event: Optional[asyncio.Event] = None
+
+    def attach(self, controller, broker, port, keepalive=60):
+        """Connect a controller's client through the event loop"""
+        binding = ControllerBinding(self, controller)
+        controller.client.on_message = lambda client, userdata, msg: binding.enqueue(msg)
+        self.bindings.append(binding)
+        controller.client.connect(broker, port, keepalive)
+        return binding
+
+    async def detach(self, controller):
+        """Drain and disconnect one controller, leaving the others running"""
+        for binding in self.bindings:
+            if binding.controller is controller:
+                self.bindings.remove(binding)
+                await binding.shutdown(self.drain_timeout)
+                return
+
+    def stop(self):
+        """Ask run_forever() to shut down"""
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    async def run_forever(self):
+        """Serve until stop() or SIGINT/SIGTERM, then shut down cleanly"""
+        loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C cancels the task, finally: still runs
+        try:
+            await self.stop_event.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        await asyncio.gather(*(b.shutdown(self.drain_timeout) for b in self.bindings))
+        self.bindings.clear()
@@ -1,14 +1,32 @@
 """Base controller class for MQTT communication"""
-import paho.mqtt.client as mqtt
+from messaging.transport import create_client, TRANSPORT_TCP
+from monitoring import EventLog
+
+log = EventLog(__name__)
 
 class BaseController:
-    """Base MQTT controller with connection handling"""
-    def __init__(self, broker, port):
-        self.client = mqtt.Client()
+    """Base MQTT controller with connection handling
+
+    By default the client runs on paho's background thread. Pass an
+    AsyncControllerRuntime to run it on an asyncio event loop instead.
+    transport="memory" swaps the socket client for the in-process one.
+    """
+    def __init__(self, broker, port, runtime=None, transport=TRANSPORT_TCP):
+        self.client = create_client(transport)
         self.client.on_connect = self.on_connect
-        self.client.connect(broker, port, 60)
-        self.client.loop_start()
+        self.client.on_message = self.on_message
+        if runtime is None:
+            self.client.connect(broker, port, 60)
+            self.client.loop_start()
+        else:
+            runtime.attach(self, broker, port)
 
     def on_connect(self, client, userdata, flags, rc):
         """MQTT connection callback"""
-        print("✅ Connected to MQTT Broker!" if rc == 0 else f"❌ Connection failed with code {rc}")
\ No newline at end of file
+        if rc == 0:
+            log.info("✅ Connected to MQTT Broker")
+        else:
+            log.error("❌ Connection failed", rc=rc)
+
+    def on_message(self, client, userdata, msg):
+        """MQTT message callback, overridden by subclasses"""
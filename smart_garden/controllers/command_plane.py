@@ -0,0 +1,93 @@
+"""Per-actuator command state: merges conflicts and drops repeats"""
+import math
+import time
+from typing import Dict, Any, Hashable, Iterable, List, Optional, Tuple
+from config import COMMAND_ACTUATORS
+
+EMITTED = "emitted"
+SUPPRESSED = "suppressed"    # identical to the command still in force
+OVERRIDDEN = "overridden"    # a higher-priority command is in force
+MERGED = "merged"            # lost to another command from the same reading
+
+
+class CommandPlane:
+    """Decides which fired commands actually go out on the control topic
+
+    Tracks, per zone and actuator, the last command sent, its priority and
+    until when it is in force (its "duration", else the action's "hold",
+    else until replaced). decide() takes the (tag, command) pairs fired by
+    one reading and:
+
+    - merges commands for the same actuator into one, highest priority
+      wins, so rain's stop_watering beats low humidity's water
+    - suppresses a command identical to the one in force
+    - overrides a lower-priority command while a higher one is in force
+
+    Counters for every outcome are kept for metrics.
+    """
+    def __init__(self, actuators=COMMAND_ACTUATORS, clock=time.monotonic):
+        self.actuators = dict(actuators)
+        self.clock = clock
+        # (zone, actuator) -> (command, priority, in force until)
+        self.state: Dict[Tuple[Any, Hashable], Tuple[Dict[str, Any], int, float]] = {}
+        self.counts = {EMITTED: 0, SUPPRESSED: 0, OVERRIDDEN: 0, MERGED: 0}
+
+    def _spec(self, command: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.actuators.get(command.get("action"))
+
+    def decide(self, fired: Iterable[Tuple[Any, Dict[str, Any]]], zone=None, now=None) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Return the (tag, command) pairs that should be published"""
+        if now is None:
+            now = self.clock()
+        # Merge per actuator, keeping the first of equal priorities
+        chosen: Dict[Hashable, Tuple[int, Any, Dict[str, Any]]] = {}
+        passthrough = []
+        for tag, command in fired:
+            spec = self._spec(command)
+            if spec is None:
+                passthrough.append((tag, command))
+                continue
+            priority = spec.get("priority", 0)
+            current = chosen.get(spec["actuator"])
+            if current is not None:
+                self.counts[MERGED] += 1
+                if current[0] >= priority:
+                    continue
+            chosen[spec["actuator"]] = (priority, tag, command)
+
+        emitted = []
+        for actuator, (priority, tag, command) in chosen.items():
+            key = (zone, actuator)
+            active = self.state.get(key)
+            if active is not None and now < active[2]:
+                if active[0] == command:
+                    self.counts[SUPPRESSED] += 1
+                    continue
+                if active[1] > priority:
+                    self.counts[OVERRIDDEN] += 1
+                    continue
+            hold = command.get("duration", self._spec(command).get("hold"))
+            self.state[key] = (command, priority, math.inf if hold is None else now + hold)
+            emitted.append((tag, command))
+        emitted.extend(passthrough)
+        self.counts[EMITTED] += len(emitted)
+        return emitted
+
+    def commanded(self, actuator: Hashable, zone=None, now=None) -> Optional[Dict[str, Any]]:
+        """The command currently in force for an actuator, None if there is none"""
+        active = self.state.get((zone, actuator))
+        if active is None or (now if now is not None else self.clock()) >= active[2]:
+            return None
+        return active[0]
+
+    def reset(self, zone=None):
+        """Forget commanded state for one zone, or all zones"""
+        if zone is None:
+            self.state.clear()
+        else:
+            for key in [key for key in self.state if key[0] == zone]:
+                del self.state[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.counts[EMITTED] + self.counts[SUPPRESSED] + self.counts[OVERRIDDEN] + self.counts[MERGED]
+        return dict(self.counts, suppression_ratio=round(1 - self.counts[EMITTED] / total, 3) if total else 0.0)
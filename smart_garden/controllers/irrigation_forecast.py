@@ -0,0 +1,210 @@
+"""Predictive watering from per-zone humidity trend forecasts"""
+import math
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from config import (WATERING_THRESHOLD, FORECAST_FORGETTING, FORECAST_RAIN_WINDOW,
+                    FORECAST_RAIN_SKIP, FORECAST_LEAD, FORECAST_WARMUP, FORECAST_COOLDOWN,
+                    FORECAST_COMMAND, FORECAST_MIN_RATE, FORECAST_CONFIDENCE)
+from monitoring import EventLog, counter
+
+log = EventLog(__name__)
+decisions = counter("controller_forecast_total", "Predictive watering decisions", ("outcome",))
+
+class ZoneForecast:
+    """Online humidity trend of one zone
+
+    - A linear trend humidity = level + rate * (t - t_mean) is fitted by
+      exponentially weighted least squares, kept as six decaying sums,
+      so each reading costs a fixed handful of float operations. Readings
+      taken while it rains are left out, rain is not drying.
+    - The residual variance of the fit gives the standard error of the
+      rate, which tells a real drying trend from readings that only
+      fluctuate
+    - rain_probability: time-weighted EWMA of the rain flag over the rain
+      window, which copes with irregular reading intervals
+    """
+    __slots__ = ("n", "origin", "weight", "sum_t", "sum_tt", "sum_h", "sum_th", "sum_hh",
+                 "rain_probability", "last_ts", "last_fired")
+
+    def __init__(self):
+        self.n = 0
+        # Times are seconds since the zone's first reading, keeps the sums well conditioned
+        self.origin = None
+        self.weight = self.sum_t = self.sum_tt = 0.0
+        self.sum_h = self.sum_th = self.sum_hh = 0.0
+        self.rain_probability = 0.0
+        self.last_ts = 0.0
+        self.last_fired = -math.inf
+
+    def _moments(self) -> Tuple[float, float, float, float, float]:
+        """(mean t, mean humidity, var t, cov t/humidity, var humidity) of the weighted readings"""
+        w = self.weight
+        mean_t, mean_h = self.sum_t / w, self.sum_h / w
+        return (mean_t, mean_h, self.sum_tt / w - mean_t * mean_t,
+                self.sum_th / w - mean_t * mean_h, self.sum_hh / w - mean_h * mean_h)
+
+    @property
+    def fitted(self) -> bool:
+        return self.weight > 2 and self._moments()[2] > 0
+
+    @property
+    def rate(self) -> float:
+        """Fitted humidity change per second, 0 before there is a trend to fit"""
+        if not self.fitted:
+            return 0.0
+        _, _, var_t, cov, _ = self._moments()
+        return cov / var_t
+
+    @property
+    def rate_error(self) -> float:
+        """Standard error of rate, infinite before there is a trend to fit"""
+        if not self.fitted:
+            return math.inf
+        _, _, var_t, cov, var_h = self._moments()
+        residual = max(0.0, var_h - cov * cov / var_t) * self.weight / (self.weight - 2)
+        return math.sqrt(residual / (var_t * self.weight))
+
+    @property
+    def level(self) -> float:
+        """Fitted humidity at the latest reading"""
+        if not self.weight:
+            return 0.0
+        mean_t, mean_h, _, _, _ = self._moments()
+        return mean_h + self.rate * (self.last_ts - self.origin - mean_t)
+
+    def drying(self, min_rate: float, confidence: float) -> bool:
+        """Whether the zone dries faster than min_rate (%/s), confidence standard errors clear of 0"""
+        rate = self.rate
+        return rate <= -min_rate and rate + confidence * self.rate_error < 0
+
+    def update(self, humidity: float, rain: Optional[bool], ts: float,
+               forgetting: float, rain_window: float):
+        if self.n:
+            dt = ts - self.last_ts
+            if dt <= 0:
+                # Duplicate or out-of-order reading, it would bend the trend
+                return
+            if rain is not None:
+                self.rain_probability += (1 - math.exp(-dt / rain_window)) * (bool(rain) - self.rain_probability)
+        else:
+            self.origin = ts
+            self.rain_probability = 1.0 if rain else 0.0
+        if not rain:
+            t = ts - self.origin
+            self.weight = forgetting * self.weight + 1
+            self.sum_t = forgetting * self.sum_t + t
+            self.sum_tt = forgetting * self.sum_tt + t * t
+            self.sum_h = forgetting * self.sum_h + humidity
+            self.sum_th = forgetting * self.sum_th + t * humidity
+            self.sum_hh = forgetting * self.sum_hh + humidity * humidity
+        self.last_ts = ts
+        self.n += 1
+
+    def time_to(self, threshold: float) -> Optional[float]:
+        """Seconds until the fitted humidity reaches threshold, None if it is not falling"""
+        rate = self.rate
+        if rate >= 0:
+            return None
+        return max(0.0, (self.level - threshold) / -rate)
+
+
+class ForecastTag:
+    """Stands in for a Rule in the (tag, command) pairs of a reading"""
+    __slots__ = ("name", "field", "message")
+
+    def __init__(self, message: str):
+        self.name = "forecast_watering"
+        self.field = "humidity"
+        self.message = message
+
+    def describe(self, value) -> str:
+        return self.message
+
+
+class IrrigationForecaster:
+    """Waters ahead of the low_humidity rule when a zone is drying out
+
+    evaluate() folds one reading into its zone's ZoneForecast. Once warmed
+    up, if humidity is above threshold but projected to reach it within
+    lead seconds, it returns the watering command, at most once per
+    cooldown. The projection is only trusted when the fitted drying rate
+    is at least min_rate %/h and `confidence` standard errors below zero,
+    so a zone whose humidity only fluctuates is never watered ahead.
+    When rain is probable the watering is skipped instead.
+    Readings already below threshold are left to the reactive rule.
+    """
+    def __init__(self, threshold=WATERING_THRESHOLD, lead=FORECAST_LEAD,
+                 forgetting=FORECAST_FORGETTING, rain_window=FORECAST_RAIN_WINDOW,
+                 rain_skip=FORECAST_RAIN_SKIP, warmup=FORECAST_WARMUP, cooldown=FORECAST_COOLDOWN,
+                 command=FORECAST_COMMAND, min_rate=FORECAST_MIN_RATE, confidence=FORECAST_CONFIDENCE):
+        self.threshold = threshold
+        self.min_rate = min_rate / 3600
+        self.confidence = confidence
+        self.lead = lead
+        self.forgetting = forgetting
+        self.rain_window = rain_window
+        self.rain_skip = rain_skip
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self.command = dict(command)
+        self.zones: Dict[Any, ZoneForecast] = {}
+        self.scheduled = 0
+        self.skipped = 0
+
+    def evaluate(self, data: Dict[str, Any], now: Optional[float] = None) -> List[Tuple[ForecastTag, Dict[str, Any]]]:
+        """Update the zone's forecast with one reading and return a watering command if due"""
+        humidity = data.get("humidity")
+        if humidity is None:
+            return []
+        if now is None:
+            now = time.monotonic()
+        timestamp = data.get("timestamp")
+        ts = timestamp.timestamp() if hasattr(timestamp, "timestamp") else time.time()
+        zone = data.get("zone")
+        state = self.zones.get(zone)
+        if state is None:
+            state = self.zones[zone] = ZoneForecast()
+        state.update(humidity, data.get("rain"), ts, self.forgetting, self.rain_window)
+
+        if state.n < self.warmup or humidity < self.threshold or now - state.last_fired < self.cooldown:
+            return []
+        if not state.drying(self.min_rate, self.confidence):
+            return []
+        eta = state.time_to(self.threshold)
+        if eta is None or eta > self.lead:
+            return []
+        state.last_fired = now
+        if state.rain_probability >= self.rain_skip:
+            self.skipped += 1
+            decisions.labels("skipped_rain").inc()
+            log.info("🌦️ Forecast watering skipped, rain likely", key=zone, zone=zone,
+                     eta=round(eta), rain_probability=round(state.rain_probability, 2))
+            return []
+        self.scheduled += 1
+        decisions.labels("scheduled").inc()
+        return [(ForecastTag(f"🔮 Humidity {humidity}% projected to reach {self.threshold}% "
+                             f"in {eta:.0f}s, watering ahead"), self.command)]
+
+    def forecast(self, zone=None) -> Optional[Dict[str, Any]]:
+        """Current model of a zone, None before its first reading"""
+        state = self.zones.get(zone)
+        if state is None:
+            return None
+        eta = state.time_to(self.threshold)
+        return {
+            "zone": zone,
+            "humidity": round(state.level, 2),
+            "rate_per_hour": round(state.rate * 3600, 2),
+            "rate_error_per_hour": round(state.rate_error * 3600, 2),
+            "drying": state.drying(self.min_rate, self.confidence),
+            "seconds_to_threshold": None if eta is None else round(eta),
+            "rain_probability": round(state.rain_probability, 3),
+            "readings": state.n,
+        }
+
+    def reset(self, zone=None):
+        """Forget the model of one zone, or all zones"""
+        if zone is None:
+            self.zones.clear()
+        else:
+            self.zones.pop(zone, None)
@@ -0,0 +1,120 @@
+"""Declarative threshold rules compiled into a per-field dispatch table"""
+import operator
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "true": lambda value, _: bool(value),
+}
+
+
+class Rule:
+    """One compiled rule with its per-zone activation state
+
+    A rule activates when `value <op> threshold` holds. With a hysteresis
+    band it only releases once the value has moved `hysteresis` past the
+    threshold in the other direction. It fires when it activates and,
+    while it stays active, again every `cooldown` seconds (never again if
+    cooldown is 0).
+    """
+    __slots__ = ("name", "field", "op", "check", "threshold", "release",
+                 "cooldown", "command", "message", "state")
+
+    def __init__(self, spec: Dict[str, Any]):
+        if spec.get("op") not in OPERATORS:
+            raise ValueError(f"Rule {spec.get('name')}: unknown operator {spec.get('op')}")
+        self.name = spec["name"]
+        self.field = spec["field"]
+        self.op = spec["op"]
+        self.check = OPERATORS[self.op]
+        self.threshold = spec.get("threshold")
+        self.command = spec["command"]
+        self.message = spec.get("message")
+        self.cooldown = spec.get("cooldown", 0)
+
+        hysteresis = spec.get("hysteresis", 0)
+        if self.op in ("<", "<="):
+            self.release = self.threshold + hysteresis
+        elif self.op in (">", ">="):
+            self.release = self.threshold - hysteresis
+        else:
+            self.release = None
+        # zone -> [active, last_fired]
+        self.state: Dict[Any, list] = {}
+
+    def is_released(self, value) -> bool:
+        """Check whether the value has left the hysteresis band"""
+        if self.release is None:
+            return not self.check(value, self.threshold)
+        if self.op in ("<", "<="):
+            return value >= self.release
+        return value <= self.release
+
+    def evaluate(self, value, zone, now) -> bool:
+        """Update the activation state and return True if the rule fires"""
+        state = self.state.get(zone)
+        if state is None:
+            state = self.state[zone] = [False, 0.0]
+        if state[0]:
+            if self.is_released(value):
+                state[0] = False
+                return False
+            if self.cooldown and now - state[1] >= self.cooldown:
+                state[1] = now
+                return True
+            return False
+        if self.check(value, self.threshold):
+            state[0] = True
+            state[1] = now
+            return True
+        return False
+
+    def describe(self, value) -> str:
+        """Format the rule's log message for a value"""
+        if self.message:
+            return self.message.format(value=value, threshold=self.threshold)
+        return f"Rule {self.name} fired: {self.field}={value}"
+
+
+class RuleEngine:
+    """Evaluates rules only for the fields present in a reading
+
+    Rules are compiled once into a dict keyed by field, so a reading with
+    three fields never looks at rules for the others.
+    """
+    def __init__(self, specs):
+        self.rules = [Rule(spec) for spec in specs]
+        self.table: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            self.table.setdefault(rule.field, []).append(rule)
+        self.evaluated = 0
+
+    def evaluate(self, data: Dict[str, Any], now: Optional[float] = None) -> List[Tuple[Rule, Dict[str, Any]]]:
+        """Return (rule, command) for every rule that fires on this reading"""
+        if now is None:
+            now = time.monotonic()
+        zone = data.get("zone")
+        fired = []
+        table = self.table
+        for field, value in data.items():
+            rules = table.get(field)
+            if rules is None or value is None:
+                continue
+            self.evaluated += len(rules)
+            for rule in rules:
+                if rule.evaluate(value, zone, now):
+                    fired.append((rule, rule.command))
+        return fired
+
+    def reset(self, zone=None):
+        """Forget activation state for one zone, or all zones"""
+        for rule in self.rules:
+            if zone is None:
+                rule.state.clear()
+            else:
+                rule.state.pop(zone, None)
@@ -1,106 +1,115 @@
 # File: controllers/sensor_controller.py (补全后)
 """Sensor data processing controller"""
 import json
+import time
 from typing import Dict, Any
 from config import *
+from messaging.codec import decode_payloads
+from messaging.topics import sensor_topic, control_topic, anomaly_topic
+from messaging.transport import TRANSPORT_TCP
+from monitoring import EventLog, counter, histogram
+from .anomaly_detector import AnomalyDetector, UNTRUSTED
+from .command_plane import CommandPlane
+from .irrigation_forecast import IrrigationForecaster
 from .base_controller import BaseController
+from .rule_engine import RuleEngine
+
+log = EventLog(__name__)
+messages_in = counter("controller_messages_total", "MQTT messages received on the sensor topic")
+readings_in = counter("controller_readings_total", "Sensor readings processed")
+errors = counter("controller_errors_total", "Messages or readings that failed to process", ("stage",))
+anomalies = counter("controller_anomalies_total", "Anomaly flags raised", ("field", "kind"))
+commands_sent = counter("controller_commands_total", "Control commands published", ("action",))
+parse_seconds = histogram("controller_parse_seconds", "Time to decode one MQTT message")
+rule_seconds = histogram("controller_rule_seconds", "Time to run the rules and command plane on a reading")
+publish_seconds = histogram("controller_publish_seconds", "Time to publish one control command")
 
 class SensorController(BaseController):
-    """Handles sensor data processing and control commands"""
-    def __init__(self, broker, port):
-        super().__init__(broker, port)
-        self.client.subscribe(SENSOR_TOPIC)
-        self.client.on_message = self.on_message
-        print(f"🔍 Subscribed to topic: {SENSOR_TOPIC}")
+    """Handles sensor data processing and control commands
+
+    With a zone it listens on garden/<zone>/sensors and commands
+    garden/<zone>/control, otherwise on the single-zone default topics.
+    Readings pass the anomaly detector first; its flags go to the anomaly
+    topic and stuck or out-of-range values never reach the rules. With
+    forecast on, the irrigation forecaster may water ahead of the rules.
+    """
+    def __init__(self, broker, port, rules=CONTROL_RULES, runtime=None, zone=None,
+                 anomaly_fields=ANOMALY_FIELDS, transport=TRANSPORT_TCP, forecast=FORECAST_ENABLED):
+        self.rules = RuleEngine(rules)
+        self.commands = CommandPlane()
+        self.detector = AnomalyDetector(anomaly_fields) if anomaly_fields else None
+        self.forecaster = IrrigationForecaster() if forecast else None
+        self.zone = zone
+        self.sensor_topic = sensor_topic(zone)
+        self.control_topic = control_topic(zone)
+        self.anomaly_topic = anomaly_topic(zone)
+        super().__init__(broker, port, runtime, transport)
+
+    def on_connect(self, client, userdata, flags, rc):
+        """Subscribe on every (re)connect so subscriptions survive reconnects"""
+        super().on_connect(client, userdata, flags, rc)
+        if rc == 0:
+            self.client.subscribe(self.sensor_topic)
+            log.info("🔍 Subscribed", topic=self.sensor_topic)
 
     def on_message(self, client, userdata, msg):
-        """Process incoming sensor messages"""
+        """Process incoming sensor messages, single or batched"""
+        messages_in.inc()
         try:
-            data = json.loads(msg.payload.decode())
-            print(f"\n📊 Raw Sensor Data: {data}")
-            
-            # Rain check
-            if data.get("rain"):
-                self.handle_rain(data.get("rain"))
-                
-            # Individual sensor processing
-            self.process_humidity(data.get("humidity"))
-            self.process_light(data.get("light"))
-            self.process_co2(data.get("co2"))
-            self.process_ph(data.get("ph"))
-
+            with parse_seconds.time():
+                readings = decode_payloads(msg.payload)
         except Exception as e:
-            print(f"❌ Data processing error: {e}")
-
-    # Handlers for individual sensors
-    def handle_rain(self, rain_status: bool):
-        """Handle rain detection"""
-        if rain_status:
-            print("☔ Detected rain! Canceling irrigation...")
-            self.publish_control({"action": "stop_watering"})
-
-    def process_humidity(self, humidity: float):
-        """Process humidity data"""
-        if humidity < WATERING_THRESHOLD:
-            self.trigger_watering(humidity)
-        else:
-            print(f"💧 Humidity OK: {humidity}% ≥ {WATERING_THRESHOLD}%")
+            errors.labels("parse").inc()
+            log.error("❌ Undecodable sensor message", topic=msg.topic, error=e)
+            return
+        for data in readings:
+            if self.zone is not None:
+                data.setdefault("zone", self.zone)
+            if self.detector is not None:
+                self.screen_reading(data)
+            self.process_reading(data)
 
-    def trigger_watering(self, humidity: float):
-        """Send watering command"""
-        print(f"🚨 Low humidity! Current: {humidity}% (Threshold: {WATERING_THRESHOLD}%)")
-        command = {"action": "water", "duration": 5}
-        self.publish_control(command)
-        print(f"💧 Sent watering command: {command}")
+    def screen_reading(self, data: Dict[str, Any]):
+        """Publish anomaly flags and blank out values the rules must not act on"""
+        for flag in self.detector.check(data):
+            if not flag["ongoing"]:
+                anomalies.labels(flag["field"], flag["kind"]).inc()
+                log.warning("🔎 Anomaly", key=(flag["zone"], flag["field"], flag["kind"]), zone=flag["zone"],
+                            field=flag["field"], kind=flag["kind"], value=flag["value"],
+                            expected=flag["expected"])
+                self.client.publish(self.anomaly_topic, json.dumps(flag, default=str))
+            if flag["kind"] in UNTRUSTED:
+                # The rule engine skips fields whose value is None
+                data[flag["field"]] = None
 
-    def process_light(self, light: float):
-        """Process light data"""
-        if light < LIGHTING_THRESHOLD:
-            self.trigger_light(light)
-        else:
-            print(f"💡 Light OK: {light}lux ≥ {LIGHTING_THRESHOLD}lux")
-
-    def trigger_light(self, light: float):
-        """Send lighting control command"""
-        print(f"🌑 Low light! Current: {light}lux (Threshold: {LIGHTING_THRESHOLD}lux)")
-        command = {"action": "light_on", "duration": 10}
-        self.publish_control(command)
-        print(f"💡 Sent light-on command: {command}")
-
-    def process_co2(self, co2: float):
-        """Process CO2 data"""
-        if co2 < CO2_THRESHOLD_LOW:
-            print(f"🌬️ Low CO₂! Current: {co2}ppm (Threshold: {CO2_THRESHOLD_LOW}ppm)")
-            self.adjust_ventilation("enrich", 15)
-        elif co2 > CO2_THRESHOLD_HIGH:
-            print(f"⚠️ High CO₂! Current: {co2}ppm (Threshold: {CO2_THRESHOLD_HIGH}ppm)")
-            self.adjust_ventilation("vent", 10)
-        else:
-            print(f"🌱 CO₂ Optimal: {co2}ppm")
-
-    def adjust_ventilation(self, mode: str, duration: int):
-        """Send ventilation control command"""
-        command = {"action": "adjust_ventilation", "mode": mode, "duration": duration}
-        self.publish_control(command)
-        print(f"🌀 Sent ventilation command: {command}")
-
-    def process_ph(self, ph: float):
-        """Process pH data"""
-        if ph < PH_THRESHOLD_LOW:
-            print(f"🚨 Low PH! Current: {ph} (Threshold: {PH_THRESHOLD_LOW})")
-            self.adjust_ph("alkaline", 10)
-        elif ph > PH_THRESHOLD_HIGH:
-            print(f"🚨 High PH! Current: {ph} (Threshold: {PH_THRESHOLD_HIGH})")
-            self.adjust_ph("acidic", 10)
-        else:
-            print(f"🧪 PH normal: {ph}")
+    def process_reading(self, data: Dict[str, Any]):
+        """Process one sensor reading through the rule engine"""
+        try:
+            readings_in.inc()
+            zone = data.get("zone")
+            log.debug("📊 Raw sensor data", key=zone, **data)
+            start = time.perf_counter()
+            fired = self.rules.evaluate(data)
+            if self.forecaster is not None:
+                fired.extend(self.forecaster.evaluate(data))
+            # Repeats of a command still in force and merged conflicts are dropped here
+            decided = self.commands.decide(fired, zone)
+            rule_seconds.observe(time.perf_counter() - start)
+            for rule, command in fired:
+                # A constant event keeps the throttle key per rule, not per reading value
+                log.info("⚡ Rule fired", key=(zone, rule.name), zone=zone, rule=rule.name,
+                         value=data[rule.field], message=rule.describe(data[rule.field]))
+            for rule, command in decided:
+                self.publish_control(command)
+                commands_sent.labels(command.get("action")).inc()
+                log.info("📤 Sent command", key=(zone, rule.name), zone=zone, rule=rule.name,
+                         command=json.dumps(command))
 
-    def adjust_ph(self, substance: str, amount: int):
-        """Send pH adjustment command"""
-        command = {"action": "adjust_ph", "substance": substance, "amount": amount}
-        self.publish_control(command)
-        print(f"🧪 Sent PH adjustment command: {command}")
+        except Exception as e:
+            errors.labels("process").inc()
+            log.error("❌ Data processing error", key=type(e).__name__, error=e)
 
     def publish_control(self, command: Dict[str, Any]):
         """Publish control command to MQTT"""
-        self.client.publish(CONTROL_TOPIC, json.dumps(command))
\ No newline at end of file
+        with publish_seconds.time():
+            self.client.publish(self.control_topic, json.dumps(command))
\ No newline at end of file
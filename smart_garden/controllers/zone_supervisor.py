@@ -0,0 +1,172 @@
+"""Shards garden zones across controller worker processes"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import signal
+from typing import Dict, Iterable, List, Optional, Set
+from config import CONTROLLER_QUEUE_SIZE, CONTROLLER_WORKERS
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes
+
+    Adding or removing a node only moves the keys that hash next to its
+    virtual nodes, roughly 1/n of them, so zones stay on their worker.
+    """
+    def __init__(self, nodes: Iterable[str] = (), replicas=100):
+        self.replicas = replicas
+        self.nodes: Set[str] = set()
+        self.hashes: List[int] = []
+        self.owners: Dict[int, str] = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        self.nodes.add(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point in self.owners:
+                continue
+            bisect.insort(self.hashes, point)
+            self.owners[point] = node
+
+    def remove(self, node: str):
+        self.nodes.discard(node)
+        points = [p for p, owner in self.owners.items() if owner == node]
+        for point in points:
+            del self.owners[point]
+            del self.hashes[bisect.bisect_left(self.hashes, point)]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the node owning a key"""
+        if not self.hashes:
+            return None
+        index = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.owners[self.hashes[index]]
+
+
+def _worker_main(worker_id, broker, port, commands, metrics_port=0):
+    """Worker process entry point"""
+    # Ctrl+C goes to the whole process group, let the supervisor stop us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from monitoring import serve_metrics
+    serve_metrics(metrics_port)
+    asyncio.run(_serve_zones(worker_id, broker, port, commands))
+
+
+async def _serve_zones(worker_id, broker, port, commands):
+    """Run one SensorController per assigned zone on a shared event loop"""
+    from .async_runtime import AsyncControllerRuntime
+    from .sensor_controller import SensorController
+
+    loop = asyncio.get_running_loop()
+    runtime = AsyncControllerRuntime(CONTROLLER_QUEUE_SIZE, CONTROLLER_WORKERS)
+    controllers = {}
+    while True:
+        zones = await loop.run_in_executor(None, commands.get)
+        if zones is None:
+            break
+        for zone in set(controllers) - zones:
+            await runtime.detach(controllers.pop(zone))
+            print(f"➖ Worker {worker_id} released zone {zone}")
+        for zone in sorted(zones - set(controllers)):
+            controllers[zone] = SensorController(broker, port, runtime=runtime, zone=zone)
+            print(f"➕ Worker {worker_id} took zone {zone}")
+    await runtime.shutdown()
+
+
+class ZoneSupervisor:
+    """Assigns zones to worker processes with consistent hashing
+
+    Each worker runs an asyncio runtime holding the SensorControllers of
+    its zones, so a zone's rule state lives in exactly one process. When
+    workers or zones are added or removed only the zones whose owner
+    changed are moved. With metrics_port set, worker n serves its
+    /metrics on metrics_port + n.
+    """
+    def __init__(self, broker, port, zones: Iterable[str] = (), workers=2, replicas=100, metrics_port=0):
+        self.broker = broker
+        self.port = port
+        self.metrics_port = metrics_port
+        self.zones: Set[str] = set(zones)
+        self.ring = HashRing(replicas=replicas)
+        self.processes: Dict[str, multiprocessing.Process] = {}
+        self.commands: Dict[str, multiprocessing.Queue] = {}
+        self.assigned: Dict[str, Set[str]] = {}
+        self.worker_ids = itertools.count()
+        self.initial_workers = workers
+
+    def start(self):
+        for _ in range(self.initial_workers):
+            self.add_worker(rebalance=False)
+        self.rebalance()
+
+    def add_worker(self, rebalance=True) -> str:
+        """Start a worker process and move its share of zones to it"""
+        number = next(self.worker_ids)
+        worker_id = f"worker-{number}"
+        commands = multiprocessing.Queue()
+        metrics_port = self.metrics_port + number if self.metrics_port else 0
+        process = multiprocessing.Process(
+            target=_worker_main, args=(worker_id, self.broker, self.port, commands, metrics_port),
+            name=worker_id, daemon=True)
+        process.start()
+        self.processes[worker_id] = process
+        self.commands[worker_id] = commands
+        self.assigned[worker_id] = set()
+        self.ring.add(worker_id)
+        if rebalance:
+            self.rebalance()
+        return worker_id
+
+    def remove_worker(self, worker_id: str):
+        """Hand a worker's zones to the others, then stop it"""
+        self.ring.remove(worker_id)
+        self.rebalance()
+        self.commands[worker_id].put(None)
+        self.processes.pop(worker_id).join(timeout=10)
+        del self.commands[worker_id]
+        del self.assigned[worker_id]
+
+    def add_zone(self, zone: str):
+        self.zones.add(zone)
+        self.rebalance()
+
+    def remove_zone(self, zone: str):
+        self.zones.discard(zone)
+        self.rebalance()
+
+    def assignment(self) -> Dict[str, Set[str]]:
+        """Compute the zone set each live worker should own"""
+        plan = {worker_id: set() for worker_id in self.ring.nodes}
+        for zone in self.zones:
+            owner = self.ring.get(zone)
+            if owner is not None:
+                plan[owner].add(zone)
+        return plan
+
+    def rebalance(self):
+        """Send new zone sets to the workers whose assignment changed
+
+        Workers apply their commands independently, so during a hand-over a
+        moving zone can briefly be served by both its old and new owner.
+        """
+        plan = self.assignment()
+        for worker_id, zones in plan.items():
+            if zones != self.assigned.get(worker_id):
+                self.assigned[worker_id] = zones
+                self.commands[worker_id].put(zones)
+        return plan
+
+    def stop(self):
+        for worker_id, commands in self.commands.items():
+            commands.put(None)
+        for process in self.processes.values():
+            process.join(timeout=10)
+        self.processes.clear()
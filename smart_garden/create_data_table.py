@@ -1,26 +1,15 @@
-import sqlite3
+from config import DB_PATH, DB_PARTITION
+from storage.sensor_store import SensorStore
  
-def create_table():
-    
-    conn = sqlite3.connect('garden_sensor_data.db')
-    cursor = conn.cursor()
- 
-    # create table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS SensorData (
-            ID INTEGER PRIMARY KEY AUTOINCREMENT,
-            Timestamp TEXT NOT NULL,
-            Humidity REAL NOT NULL,
-            DroughtAlert INTEGER NOT NULL,
-            Light INTEGER NOT NULL,
-            PH REAL NOT NULL,
-            Rain INTEGER NOT NULL,
-            CO2 REAL NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
+def create_table(db_path=DB_PATH):
+    """Create the partitioned schema, migrating a legacy flat SensorData table"""
+    store = SensorStore(db_path, DB_PARTITION)
+    migrated = store.migrated_rows
+    store.close()
+    return migrated
  
 if __name__ == '__main__':
-    create_table()
-    print("Table SensorData created successfully.")
+    migrated = create_table()
+    print("Partitioned SensorData schema created successfully.")
+    if migrated:
+        print(f"Migrated {migrated} rows from the legacy SensorData table.")
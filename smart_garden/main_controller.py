@@ -1,10 +1,38 @@
 """Main entry point for the garden controller"""
-from config import MQTT_BROKER, MQTT_PORT
+import asyncio
+import time
+from config import (MQTT_BROKER, MQTT_PORT, CONTROLLER_QUEUE_SIZE, CONTROLLER_WORKERS,
+                    ZONES, ZONE_WORKERS, CONTROLLER_METRICS_PORT, ZONE_METRICS_PORT_BASE)
+from controllers.async_runtime import AsyncControllerRuntime
 from controllers.sensor_controller import SensorController
+from controllers.zone_supervisor import ZoneSupervisor
+from monitoring import serve_metrics
 
-if __name__ == "__main__":
-    controller = SensorController(MQTT_BROKER, MQTT_PORT)
+async def run_single_zone():
+    runtime = AsyncControllerRuntime(CONTROLLER_QUEUE_SIZE, CONTROLLER_WORKERS)
+    serve_metrics(CONTROLLER_METRICS_PORT)
+    SensorController(MQTT_BROKER, MQTT_PORT, runtime=runtime)
     print("🌱 Smart Garden Controller started...")
-    # Keep main thread alive (MQTT loop runs in background)
-    while True:
-        pass
\ No newline at end of file
+    # The event loop idles until a message or signal arrives
+    await runtime.run_forever()
+
+def run_zones():
+    # Worker n serves its /metrics on ZONE_METRICS_PORT_BASE + n
+    supervisor = ZoneSupervisor(MQTT_BROKER, MQTT_PORT, ZONES, ZONE_WORKERS, metrics_port=ZONE_METRICS_PORT_BASE)
+    supervisor.start()
+    print(f"🌱 Smart Garden Controller started for {len(ZONES)} zones on {ZONE_WORKERS} workers...")
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        supervisor.stop()
+
+if __name__ == "__main__":
+    try:
+        if ZONES:
+            run_zones()
+        else:
+            asyncio.run(run_single_zone())
+    except KeyboardInterrupt:
+        pass
+    print("🛑 Smart Garden Controller stopped")
@@ -1,15 +1,24 @@
 """Main entry point for sensor simulator"""
 import time
-import json
-import sqlite3
 from datetime import datetime, timezone
-from config import MQTT_BROKER, MQTT_PORT, SENSOR_TOPIC
+from config import (MQTT_BROKER, MQTT_PORT,
+                    DB_FLUSH_ROWS, DB_FLUSH_INTERVAL, DB_PARTITION, DB_BACKEND,
+                    BATCH_MAX_READINGS, BATCH_MAX_LATENCY, SIMULATOR_ZONE,
+                    SIMULATOR_METRICS_PORT)
 import paho.mqtt.client as mqtt
 from sensors.humidity_sensor import HumiditySensor
 from sensors.light_sensor import LightSensor
 from sensors.ph_sensor import PhSensor
 from sensors.co2_sensor import Co2Sensor
 from sensors.rain_sensor import RainSensor
+from storage.backends import default_path
+from storage.ingest_writer import SensorDataWriter
+from messaging.codec import topic_format
+from messaging.batching import BatchPublisher
+from messaging.topics import sensor_topic
+from monitoring import EventLog, serve_metrics
+
+log = EventLog("simulator")
 
 def create_sensor_simulator():
     """Create and return all sensor instances"""
@@ -21,23 +30,39 @@ def create_sensor_simulator():
         "rain": RainSensor()
     }
     
-def insert_sensor_data(db_connection, timestamp, humidity, drought_alert, light, ph, rain, co2):
-    """Insert sensor data into the database"""
-    cursor = db_connection.cursor()
-    cursor.execute('''
-        INSERT INTO SensorData (Timestamp, Humidity, DroughtAlert, Light, PH, Rain, CO2)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (timestamp, humidity, drought_alert, light, ph, rain, co2))
-    db_connection.commit()
+def insert_sensor_data(writer, timestamp, humidity, drought_alert, light, ph, rain, co2, zone=None):
+    """Queue sensor data for the batched database writer"""
+    writer.add(timestamp, humidity, drought_alert, light, ph, rain, co2, zone)
+
+
+def publish_reading(publisher, writer, payload, zone=None):
+    """Publish one reading over MQTT and queue it for the database"""
+    publisher.publish(payload)
+    insert_sensor_data(
+        writer,
+        payload["timestamp"],
+        payload["humidity"],
+        1 if payload["drought_alert"] else 0,
+        payload["light"],
+        payload["ph"],
+        1 if payload["rain"] else 0,
+        payload["co2"],
+        zone=zone
+    )
 
 
 def main():
-    # Connect to SQLite database
-    db_connection = sqlite3.connect('garden_sensor_data.db')
+    # Batched writer for the SQLite database or segment logs, per DB_BACKEND
+    db_writer = SensorDataWriter(default_path(DB_BACKEND), DB_FLUSH_ROWS, DB_FLUSH_INTERVAL,
+                                 DB_PARTITION, DB_BACKEND)
     client = mqtt.Client()
     client.connect(MQTT_BROKER, MQTT_PORT, 60)
     client.loop_start()
+    serve_metrics(SIMULATOR_METRICS_PORT)
     sensors = create_sensor_simulator()
+    topic = sensor_topic(SIMULATOR_ZONE)
+    publisher = BatchPublisher(client, topic, topic_format(topic),
+                               BATCH_MAX_READINGS, BATCH_MAX_LATENCY)
 
     try:
         while True:
@@ -52,31 +77,19 @@ def main():
                 "co2": sensors["co2"].read()
             }
             
-            client.publish(SENSOR_TOPIC, json.dumps(payload), qos=1)
-            print(f"Published combined data: {payload}")
-            
-            drought_alert_int = 1 if payload["drought_alert"] else 0
-            rain_int = 1 if payload["rain"] else 0
-             # Insert data into SQLite database
-            insert_sensor_data(
-                db_connection,
-                payload["timestamp"],
-                payload["humidity"],
-                drought_alert_int,
-                payload["light"],
-                payload["ph"],
-                rain_int,
-                payload["co2"]
-            )
+            publish_reading(publisher, db_writer, payload, zone=SIMULATOR_ZONE)
+            log.info("Published combined data", **payload)
             
             time.sleep(2)
 
     except KeyboardInterrupt:
         print("Stopping sensor simulator...")
     finally:
+        publisher.close()
         client.loop_stop()
         client.disconnect()
-        db_connection.close()
+        db_writer.close()
+        print(f"Database writer stats: {db_writer.stats()}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
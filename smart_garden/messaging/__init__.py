@@ -0,0 +1,14 @@
+from .codec import (encode_payload, decode_payload, encode_batch, decode_payloads,
+                    topic_format, is_binary, FORMAT_JSON, FORMAT_BINARY)
+from .batching import BatchPublisher
+from .topics import sensor_topic, control_topic, anomaly_topic, zone_from_topic
+from .subscriptions import topic_matches, SubscriptionTable
+from .memory_transport import MemoryBroker, MemoryClient
+from .local_broker import LocalBroker
+from .transport import create_client, TRANSPORT_TCP, TRANSPORT_MEMORY
+
+__all__ = ['encode_payload', 'decode_payload', 'encode_batch', 'decode_payloads',
+           'topic_format', 'is_binary', 'FORMAT_JSON', 'FORMAT_BINARY', 'BatchPublisher',
+           'sensor_topic', 'control_topic', 'anomaly_topic', 'zone_from_topic',
+           'topic_matches', 'SubscriptionTable', 'MemoryBroker', 'MemoryClient', 'LocalBroker',
+           'create_client', 'TRANSPORT_TCP', 'TRANSPORT_MEMORY']
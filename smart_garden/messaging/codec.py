@@ -0,0 +1,166 @@
+"""Sensor payload codec shared by all publishers and subscribers"""
+import json
+import math
+import struct
+from datetime import datetime
+from typing import Dict, Any, List, Sequence
+from config import PAYLOAD_FORMATS, DEFAULT_PAYLOAD_FORMAT
+from storage.timestamps import to_epoch_ms, from_epoch_ms
+from .topics import zone_from_topic
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+
+# Binary layout v1 (little endian, 27 bytes):
+#   B  header   0xB0 | version, never '{' or whitespace so JSON is detectable
+#   B  present  bit per field in FIELD_BITS
+#   B  flags    bit 0 drought_alert, bit 1 rain
+#   q  timestamp in epoch milliseconds
+#   4f humidity, light, ph, co2 as float32
+#
+# Batch layout (v1 with BATCH_FLAG set in the header):
+#   B  header   0xB0 | BATCH_FLAG | version
+#   H  count
+#   count x (B zone length, zone UTF-8 bytes, v1 record)
+BINARY_VERSION = 1
+BATCH_FLAG = 0x08
+HEADER = 0xB0 | BINARY_VERSION
+BATCH_HEADER = HEADER | BATCH_FLAG
+RECORD = struct.Struct("<BBBq4f")
+BATCH_PREFIX = struct.Struct("<BH")
+MAX_BATCH_READINGS = 0xFFFF
+FLOAT_FIELDS = ("humidity", "light", "ph", "co2")
+BOOL_FIELDS = ("drought_alert", "rain")
+FIELD_BITS = {name: 1 << i for i, name in enumerate(FLOAT_FIELDS + BOOL_FIELDS)}
+
+
+def topic_format(topic: str) -> str:
+    """Return the payload format configured for a topic
+
+    Zone topics fall back to the entry for their template, e.g.
+    garden/gh1/sensors uses PAYLOAD_FORMATS["garden/{zone}/sensors"].
+    """
+    if topic in PAYLOAD_FORMATS:
+        return PAYLOAD_FORMATS[topic]
+    zone = zone_from_topic(topic)
+    if zone is not None:
+        template = topic.replace(f"/{zone}/", "/{zone}/", 1)
+        return PAYLOAD_FORMATS.get(template, DEFAULT_PAYLOAD_FORMAT)
+    return DEFAULT_PAYLOAD_FORMAT
+
+
+def encode_payload(payload: Dict[str, Any], fmt: str = FORMAT_JSON) -> bytes:
+    """Encode a sensor reading in the given format"""
+    if fmt == FORMAT_JSON:
+        timestamp = payload.get("timestamp")
+        if isinstance(timestamp, datetime):
+            payload = dict(payload, timestamp=timestamp.isoformat())
+        return json.dumps(payload).encode()
+    if fmt != FORMAT_BINARY:
+        raise ValueError(f"Unknown payload format: {fmt}")
+
+    present = flags = 0
+    values = []
+    for name in FLOAT_FIELDS:
+        value = payload.get(name)
+        if value is None:
+            values.append(math.nan)
+        else:
+            present |= FIELD_BITS[name]
+            values.append(value)
+    for bit, name in enumerate(BOOL_FIELDS):
+        value = payload.get(name)
+        if value is not None:
+            present |= FIELD_BITS[name]
+            flags |= bool(value) << bit
+    return RECORD.pack(HEADER, present, flags, to_epoch_ms(payload["timestamp"]), *values)
+
+
+def is_binary(raw: bytes) -> bool:
+    """Check whether a payload uses the binary layout"""
+    return len(raw) > 0 and raw[0] & 0xF0 == 0xB0
+
+
+def decode_payload(raw: bytes) -> Dict[str, Any]:
+    """Decode a JSON or binary payload into a reading dict
+
+    The timestamp is returned as an aware datetime for both formats.
+    Binary float32 values are rounded to 2 decimals, which restores the
+    1-decimal values the simulators publish.
+    """
+    if not is_binary(raw):
+        data = json.loads(raw.decode() if isinstance(raw, (bytes, bytearray)) else raw)
+        if isinstance(data.get("timestamp"), str):
+            data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+        return data
+
+    if raw[0] != HEADER:
+        raise ValueError(f"Unsupported binary payload header: {raw[0]:#x}")
+    return _unpack_record(raw, 0)
+
+
+def _unpack_record(raw: bytes, offset: int) -> Dict[str, Any]:
+    """Decode one binary record starting at offset"""
+    header, present, flags, ts_ms, *values = RECORD.unpack_from(raw, offset)
+    data = {"timestamp": from_epoch_ms(ts_ms)}
+    for name, value in zip(FLOAT_FIELDS, values):
+        if present & FIELD_BITS[name]:
+            data[name] = round(value, 2)
+    for bit, name in enumerate(BOOL_FIELDS):
+        if present & FIELD_BITS[name]:
+            data[name] = bool(flags >> bit & 1)
+    return data
+
+
+def encode_batch(payloads: Sequence[Dict[str, Any]], fmt: str = FORMAT_JSON) -> bytes:
+    """Encode several readings, possibly from several zones, as one message"""
+    if fmt == FORMAT_JSON:
+        return json.dumps({"batch": [
+            dict(p, timestamp=p["timestamp"].isoformat())
+            if isinstance(p.get("timestamp"), datetime) else p
+            for p in payloads
+        ]}).encode()
+    if fmt != FORMAT_BINARY:
+        raise ValueError(f"Unknown payload format: {fmt}")
+    if len(payloads) > MAX_BATCH_READINGS:
+        raise ValueError(f"Batch too large: {len(payloads)} readings")
+
+    parts = [BATCH_PREFIX.pack(BATCH_HEADER, len(payloads))]
+    for payload in payloads:
+        zone = str(payload.get("zone") or "").encode()
+        parts.append(bytes((len(zone),)) + zone)
+        parts.append(encode_payload(payload, FORMAT_BINARY))
+    return b"".join(parts)
+
+
+def decode_payloads(raw: bytes) -> List[Dict[str, Any]]:
+    """Decode a single or batched message into a list of readings
+
+    Subscribers should use this so batching can be switched on without
+    touching them.
+    """
+    if not is_binary(raw):
+        data = json.loads(raw.decode() if isinstance(raw, (bytes, bytearray)) else raw)
+        readings = data["batch"] if "batch" in data else [data]
+        for reading in readings:
+            if isinstance(reading.get("timestamp"), str):
+                reading["timestamp"] = datetime.fromisoformat(reading["timestamp"])
+        return readings
+
+    if raw[0] == HEADER:
+        return [_unpack_record(raw, 0)]
+    if raw[0] != BATCH_HEADER:
+        raise ValueError(f"Unsupported binary payload header: {raw[0]:#x}")
+    _, count = BATCH_PREFIX.unpack_from(raw)
+    offset = BATCH_PREFIX.size
+    readings = []
+    for _ in range(count):
+        zone_len = raw[offset]
+        zone = bytes(raw[offset + 1:offset + 1 + zone_len]).decode()
+        offset += 1 + zone_len
+        reading = _unpack_record(raw, offset)
+        if zone:
+            reading["zone"] = zone
+        readings.append(reading)
+        offset += RECORD.size
+    return readings
@@ -0,0 +1,364 @@
+"""Minimal MQTT 3.1.1 broker for tests, benchmarks and machines without Mosquitto
+
+Run from the smart_garden directory to serve the usual localhost:1883:
+    python -m messaging.local_broker
+
+Supports what the project's paho clients use: CONNECT with clean
+sessions, QoS 0/1/2 publishes (QoS 2 is granted as 1 towards
+subscribers), retained messages, last will, + and # wildcards,
+SUBSCRIBE/UNSUBSCRIBE and keepalive. Sessions are not persisted and
+outgoing QoS 1 messages are not retried.
+"""
+import argparse
+import asyncio
+import itertools
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+from .subscriptions import SubscriptionTable, topic_matches
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+CONNACK_ACCEPTED = 0
+CONNACK_BAD_PROTOCOL = 1
+MAX_GRANTED_QOS = 1
+# Pause a publisher while any subscriber has this much unsent data
+WRITE_HIGH_WATER = 1 << 20
+
+
+class ProtocolError(Exception):
+    """The peer sent something this broker does not understand"""
+
+
+def encode_length(length: int) -> bytes:
+    """MQTT variable-length remaining length"""
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def encode_string(value: bytes) -> bytes:
+    return struct.pack("!H", len(value)) + value
+
+
+def packet(kind: int, flags: int, body: bytes) -> bytes:
+    return bytes(((kind << 4) | flags,)) + encode_length(len(body)) + body
+
+
+class Reader:
+    """Cursor over a packet body"""
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def u8(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def u16(self) -> int:
+        value = struct.unpack_from("!H", self.data, self.pos)[0]
+        self.pos += 2
+        return value
+
+    def bytes(self) -> bytes:
+        size = self.u16()
+        value = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return value
+
+    def string(self) -> str:
+        return self.bytes().decode()
+
+    def rest(self) -> bytes:
+        return self.data[self.pos:]
+
+    def more(self) -> bool:
+        return self.pos < len(self.data)
+
+
+class Session:
+    """One connected client"""
+    def __init__(self, broker, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.client_id = ""
+        self.keepalive = 0
+        self.will: Optional[Tuple[str, bytes, int, bool]] = None
+        self.packet_ids = itertools.cycle(range(1, 65536))
+        self.pending_qos2 = set()
+        self.closed = False
+
+    def send(self, data: bytes):
+        if not self.closed:
+            self.writer.write(data)
+
+    def deliver(self, topic: bytes, payload: bytes, qos: int, retain=False):
+        """Send a PUBLISH to this client"""
+        flags = (qos << 1) | (1 if retain else 0)
+        body = encode_string(topic)
+        if qos:
+            body += struct.pack("!H", next(self.packet_ids))
+        self.send(packet(PUBLISH, flags, body + payload))
+
+    async def read_packet(self) -> Tuple[int, int, bytes]:
+        header = await self.reader.readexactly(1)
+        length, shift = 0, 0
+        while True:
+            byte = (await self.reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+            if shift > 21:
+                raise ProtocolError("remaining length too long")
+        body = await self.reader.readexactly(length) if length else b""
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    async def run(self):
+        try:
+            kind, _, body = await asyncio.wait_for(self.read_packet(), 10)
+            if kind != CONNECT or not self.on_connect(body):
+                return
+            while True:
+                # 1.5 x keepalive without any packet means the client is gone
+                timeout = self.keepalive * 1.5 if self.keepalive else None
+                kind, flags, body = await asyncio.wait_for(self.read_packet(), timeout)
+                if kind == DISCONNECT:
+                    self.will = None
+                    return
+                self.handle(kind, flags, body)
+                await self.broker.backpressure()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            self.close()
+
+    def on_connect(self, body: bytes) -> bool:
+        data = Reader(body)
+        protocol, level = data.string(), data.u8()
+        if (protocol, level) not in (("MQTT", 4), ("MQIsdp", 3)):
+            self.send(packet(CONNACK, 0, bytes((0, CONNACK_BAD_PROTOCOL))))
+            return False
+        flags = data.u8()
+        self.keepalive = data.u16()
+        self.client_id = data.string() or f"local-{id(self):x}"
+        if flags & 0x04:
+            topic, message = data.string(), data.bytes()
+            self.will = (topic, message, (flags >> 3) & 0x03, bool(flags & 0x20))
+        # Username/password (flags 0x80/0x40) are accepted without checking
+        self.broker.register(self)
+        self.send(packet(CONNACK, 0, bytes((0, CONNACK_ACCEPTED))))
+        return True
+
+    def handle(self, kind: int, flags: int, body: bytes):
+        data = Reader(body)
+        if kind == PUBLISH:
+            qos, retain = (flags >> 1) & 0x03, bool(flags & 0x01)
+            topic = data.bytes()
+            packet_id = data.u16() if qos else None
+            payload = data.rest()
+            if qos == 2:
+                self.send(packet(PUBREC, 0, struct.pack("!H", packet_id)))
+                # A retransmitted QoS 2 publish must not be delivered twice
+                if packet_id in self.pending_qos2:
+                    return
+                self.pending_qos2.add(packet_id)
+            elif qos == 1:
+                self.send(packet(PUBACK, 0, struct.pack("!H", packet_id)))
+            self.broker.route(topic, payload, qos, retain)
+        elif kind == PUBREL:
+            packet_id = data.u16()
+            self.pending_qos2.discard(packet_id)
+            self.send(packet(PUBCOMP, 0, struct.pack("!H", packet_id)))
+        elif kind == SUBSCRIBE:
+            packet_id = data.u16()
+            granted = []
+            while data.more():
+                topic_filter, qos = data.string(), min(data.u8() & 0x03, MAX_GRANTED_QOS)
+                self.broker.subscriptions.add(self, topic_filter, qos)
+                granted.append((topic_filter, qos))
+            self.send(packet(SUBACK, 0, struct.pack("!H", packet_id) + bytes(q for _, q in granted)))
+            for topic_filter, qos in granted:
+                self.broker.send_retained(self, topic_filter, qos)
+        elif kind == UNSUBSCRIBE:
+            packet_id = data.u16()
+            while data.more():
+                self.broker.subscriptions.remove(self, data.string())
+            self.send(packet(UNSUBACK, 0, struct.pack("!H", packet_id)))
+        elif kind == PINGREQ:
+            self.send(packet(PINGRESP, 0, b""))
+        elif kind in (PUBACK, PUBREC, PUBCOMP):
+            pass  # Outgoing messages are fire-and-forget
+        else:
+            raise ProtocolError(f"unexpected packet type {kind}")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.broker.unregister(self)
+        if self.will is not None:
+            topic, message, qos, retain = self.will
+            self.broker.route(topic.encode(), message, qos, retain)
+        self.writer.close()
+
+
+class LocalBroker:
+    """asyncio MQTT broker, in the current loop or on a background thread
+
+    In a test or benchmark:
+        broker = LocalBroker(port=0).start()   # port 0 picks a free port
+        ... connect paho clients to 127.0.0.1:broker.port ...
+        broker.stop()
+    """
+    def __init__(self, host="127.0.0.1", port=1883):
+        self.host = host
+        self.port = port
+        self.subscriptions = SubscriptionTable()
+        self.sessions: Dict[str, Session] = {}
+        self.retained: Dict[bytes, Tuple[bytes, int]] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.tasks = set()
+        self.messages_in = 0
+        self.messages_out = 0
+
+    # ---------- Routing ----------
+    def register(self, session: Session):
+        # A second connection with the same client id takes over
+        previous = self.sessions.get(session.client_id)
+        if previous is not None:
+            previous.close()
+        self.sessions[session.client_id] = session
+
+    def unregister(self, session: Session):
+        if self.sessions.get(session.client_id) is session:
+            del self.sessions[session.client_id]
+        self.subscriptions.remove(session)
+
+    def route(self, topic: bytes, payload: bytes, qos: int, retain: bool):
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                self.retained.pop(topic, None)
+        self.messages_in += 1
+        subscribers = self.subscriptions.match(topic.decode())
+        for session, granted in subscribers.items():
+            session.deliver(topic, payload, min(qos, granted))
+        self.messages_out += len(subscribers)
+
+    def send_retained(self, session: Session, topic_filter: str, granted: int):
+        for topic, (payload, qos) in self.retained.items():
+            if topic_matches(topic_filter, topic.decode()):
+                session.deliver(topic, payload, min(qos, granted), retain=True)
+
+    async def backpressure(self):
+        """Let slow subscribers catch up before reading more from a publisher"""
+        for session in list(self.sessions.values()):
+            if session.writer.transport.get_write_buffer_size() > WRITE_HIGH_WATER:
+                try:
+                    await session.writer.drain()
+                except ConnectionError:
+                    pass
+
+    # ---------- Server ----------
+    async def _on_client(self, reader, writer):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            await Session(self, reader, writer).run()
+        finally:
+            self.tasks.discard(task)
+
+    async def serve(self):
+        """Start listening on the running loop, returns once bound"""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._on_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            for session in list(self.sessions.values()):
+                session.will = None
+                session.close()
+            # Closed transports end every session's read loop
+            if self.tasks:
+                await asyncio.wait(list(self.tasks), timeout=5)
+            await self.server.wait_closed()
+            self.server = None
+
+    def start(self) -> "LocalBroker":
+        """Serve on a daemon thread with its own event loop"""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.serve())
+            except OSError as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self.thread = threading.Thread(target=run, name="local-mqtt-broker", daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        if self.loop is not None and self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+
+    def stats(self):
+        return {
+            "clients": len(self.sessions),
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "retained": len(self.retained),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local MQTT 3.1.1 broker for development")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+
+    async def run():
+        broker = LocalBroker(args.host, args.port)
+        await broker.serve()
+        print(f"📡 Local MQTT broker listening on {broker.host}:{broker.port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await broker.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("🛑 Local MQTT broker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""In-process MQTT transport: paho-compatible clients without sockets or a broker
+
+MemoryClient implements the part of paho's Client API this project uses
+(connect, subscribe, publish, the loop_* family and the socket callbacks
+AsyncControllerRuntime hooks into), so controllers, simulators and
+benchmarks can run unchanged in one process. Clients connecting to the
+same host and port share a MemoryBroker.
+"""
+import itertools
+import select
+import socket
+import threading
+from collections import deque
+from typing import Dict, Tuple
+from .subscriptions import SubscriptionTable, topic_matches
+
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+
+class MemoryMessage:
+    """Same attributes as paho's MQTTMessage"""
+    __slots__ = ("topic", "payload", "qos", "retain", "mid")
+
+    def __init__(self, topic: str, payload: bytes, qos: int, retain=False, mid=0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+
+
+class MemoryMessageInfo:
+    """Return value of publish(), delivery is immediate"""
+    __slots__ = ("rc", "mid")
+
+    def __init__(self, rc: int, mid: int):
+        self.rc = rc
+        self.mid = mid
+
+    def wait_for_publish(self, timeout=None):
+        pass
+
+    def is_published(self) -> bool:
+        return self.rc == MQTT_ERR_SUCCESS
+
+
+class MemoryBroker:
+    """Routes publishes straight into subscribers' inboxes
+
+    Brokers are registered by (host, port); MemoryClient.connect() picks
+    the one matching its arguments, so the usual broker settings work.
+    """
+    _brokers: Dict[Tuple[str, int], "MemoryBroker"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self):
+        self.subscriptions = SubscriptionTable()
+        self.retained: Dict[str, Tuple[bytes, int]] = {}
+        self.lock = threading.Lock()
+        self.messages_in = 0
+        self.messages_out = 0
+
+    @classmethod
+    def get(cls, host="localhost", port=1883) -> "MemoryBroker":
+        with cls._registry_lock:
+            broker = cls._brokers.get((host, port))
+            if broker is None:
+                broker = cls._brokers[(host, port)] = cls()
+            return broker
+
+    @classmethod
+    def reset(cls):
+        """Forget every broker, e.g. between benchmark runs"""
+        with cls._registry_lock:
+            cls._brokers.clear()
+
+    def subscribe(self, client, topic_filter: str, qos: int):
+        with self.lock:
+            self.subscriptions.add(client, topic_filter, qos)
+            retained = [(topic, payload, min(q, qos)) for topic, (payload, q) in self.retained.items()
+                        if topic_matches(topic_filter, topic)]
+        for topic, payload, granted in retained:
+            client.deliver(MemoryMessage(topic, payload, granted, retain=True))
+
+    def unsubscribe(self, client, topic_filter=None):
+        with self.lock:
+            self.subscriptions.remove(client, topic_filter)
+
+    def publish(self, topic: str, payload: bytes, qos: int, retain: bool):
+        with self.lock:
+            if retain:
+                if payload:
+                    self.retained[topic] = (payload, qos)
+                else:
+                    self.retained.pop(topic, None)
+            subscribers = self.subscriptions.match(topic)
+            self.messages_in += 1
+            self.messages_out += len(subscribers)
+        for client, granted in subscribers.items():
+            client.deliver(MemoryMessage(topic, payload, min(qos, granted)))
+
+    def stats(self):
+        return {
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "retained": len(self.retained),
+        }
+
+
+def _to_bytes(payload) -> bytes:
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode()
+    return str(payload).encode()
+
+
+class MemoryClient:
+    """paho Client stand-in that talks to a MemoryBroker
+
+    Incoming messages wait in an inbox and are dispatched by the client's
+    own loop (loop_start(), loop_forever(), loop() or, under
+    AsyncControllerRuntime, loop_read() when the wake-up socket becomes
+    readable), so callbacks run on the same kind of thread as with paho.
+    """
+    def __init__(self, client_id="", clean_session=None, userdata=None, protocol=None,
+                 transport=None, callback_api_version=None):
+        self.client_id = client_id
+        self.userdata = userdata
+        # paho 2.x VERSION2 passes reason codes and properties to callbacks
+        self.v2 = callback_api_version is not None and "2" in str(callback_api_version)
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_subscribe = None
+        self.on_publish = None
+        self.on_socket_open = None
+        self.on_socket_close = None
+        self.on_socket_register_write = None
+        self.on_socket_unregister_write = None
+
+        self.broker = None
+        self.inbox = deque()
+        self.mids = itertools.count(1)
+        # Wake-up socket so select()-based loops notice new messages
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.wake_pending = False
+        self.wake_lock = threading.Lock()
+        self.thread = None
+        self.running = False
+
+    # ---------- Connection ----------
+    def connect(self, host="localhost", port=1883, keepalive=60, bind_address=""):
+        self.broker = MemoryBroker.get(host, port)
+        if self.on_socket_open is not None:
+            self.on_socket_open(self, self.userdata, self.wake_r)
+        self._post(("connect",))
+        return MQTT_ERR_SUCCESS
+
+    def connect_async(self, host="localhost", port=1883, keepalive=60, bind_address=""):
+        return self.connect(host, port, keepalive)
+
+    def reconnect(self):
+        if self.broker is None:
+            raise ConnectionError("reconnect() before connect()")
+        self._post(("connect",))
+        return MQTT_ERR_SUCCESS
+
+    def disconnect(self):
+        if self.broker is None:
+            return MQTT_ERR_NO_CONN
+        self.broker.unsubscribe(self)
+        self.broker = None
+        self.inbox.clear()
+        if self.on_socket_close is not None:
+            self.on_socket_close(self, self.userdata, self.wake_r)
+        if self.on_disconnect is not None:
+            if self.v2:
+                self.on_disconnect(self, self.userdata, {}, 0, None)
+            else:
+                self.on_disconnect(self, self.userdata, 0)
+        return MQTT_ERR_SUCCESS
+
+    def is_connected(self) -> bool:
+        return self.broker is not None
+
+    def will_set(self, topic, payload=None, qos=0, retain=False):
+        pass  # In-process clients never drop off unexpectedly
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    # ---------- Pub/sub ----------
+    def subscribe(self, topic, qos=0):
+        if self.broker is None:
+            return MQTT_ERR_NO_CONN, None
+        topics = [(topic, qos)] if isinstance(topic, str) else list(topic)
+        for topic_filter, topic_qos in topics:
+            self.broker.subscribe(self, topic_filter, min(topic_qos, 1))
+        mid = next(self.mids)
+        if self.on_subscribe is not None:
+            self._post(("subscribe", mid, tuple(min(q, 1) for _, q in topics)))
+        return MQTT_ERR_SUCCESS, mid
+
+    def unsubscribe(self, topic):
+        if self.broker is None:
+            return MQTT_ERR_NO_CONN, None
+        for topic_filter in [topic] if isinstance(topic, str) else topic:
+            self.broker.unsubscribe(self, topic_filter)
+        return MQTT_ERR_SUCCESS, next(self.mids)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        mid = next(self.mids)
+        if self.broker is None:
+            return MemoryMessageInfo(MQTT_ERR_NO_CONN, mid)
+        self.broker.publish(topic, _to_bytes(payload), qos, retain)
+        if self.on_publish is not None:
+            self._post(("publish", mid))
+        return MemoryMessageInfo(MQTT_ERR_SUCCESS, mid)
+
+    def deliver(self, message: MemoryMessage):
+        """Called by the broker, from the publisher's thread"""
+        self._post(message)
+
+    # ---------- Inbox ----------
+    def _post(self, item):
+        self.inbox.append(item)
+        # One wake-up byte per batch: only write when the loop may be asleep
+        if not self.wake_pending:
+            self._wake()
+
+    def _dispatch(self, limit=None) -> int:
+        handled = 0
+        with self.wake_lock:
+            self.wake_pending = False
+            try:
+                self.wake_r.recv(4096)
+            except BlockingIOError:
+                pass
+        inbox = self.inbox
+        while inbox and (limit is None or handled < limit):
+            item = inbox.popleft()
+            handled += 1
+            if isinstance(item, MemoryMessage):
+                if self.on_message is not None:
+                    self.on_message(self, self.userdata, item)
+            elif item[0] == "connect":
+                if self.on_connect is not None:
+                    if self.v2:
+                        self.on_connect(self, self.userdata, {}, 0, None)
+                    else:
+                        self.on_connect(self, self.userdata, {}, 0)
+            elif item[0] == "subscribe":
+                if self.v2:
+                    self.on_subscribe(self, self.userdata, item[1], item[2], None)
+                else:
+                    self.on_subscribe(self, self.userdata, item[1], item[2])
+            elif item[0] == "publish":
+                self.on_publish(self, self.userdata, item[1])
+        if inbox:
+            # Messages left over (limit reached), make sure the loop comes back
+            self._wake()
+        return handled
+
+    def _wake(self):
+        with self.wake_lock:
+            if not self.wake_pending:
+                self.wake_pending = True
+                try:
+                    self.wake_w.send(b"\0")
+                except BlockingIOError:
+                    pass
+
+    # ---------- Loops ----------
+    def loop(self, timeout=1.0, max_packets=1):
+        """Wait up to timeout for messages and dispatch them"""
+        if not self.inbox:
+            select.select([self.wake_r], [], [], timeout)
+        self._dispatch()
+        return MQTT_ERR_SUCCESS
+
+    def loop_forever(self, timeout=1.0, retry_first_connection=False):
+        self.running = True
+        while self.running:
+            self.loop(timeout)
+        return MQTT_ERR_SUCCESS
+
+    def loop_start(self):
+        if self.thread is not None:
+            return MQTT_ERR_SUCCESS
+        self.thread = threading.Thread(target=self.loop_forever, name="memory-mqtt-loop", daemon=True)
+        self.thread.start()
+        return MQTT_ERR_SUCCESS
+
+    def loop_stop(self, force=False):
+        if self.thread is None:
+            return MQTT_ERR_SUCCESS
+        self.running = False
+        self._wake()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        return MQTT_ERR_SUCCESS
+
+    # External event loop API, see controllers/async_runtime.py
+    def loop_read(self, max_packets=1):
+        # Bounded so one busy client cannot starve the event loop
+        self._dispatch(limit=1000)
+        return MQTT_ERR_SUCCESS
+
+    def loop_write(self, max_packets=1):
+        return MQTT_ERR_SUCCESS
+
+    def loop_misc(self):
+        return MQTT_ERR_SUCCESS if self.broker is not None else MQTT_ERR_NO_CONN
+
+    def want_write(self) -> bool:
+        return False
+
+    def socket(self):
+        return self.wake_r
@@ -0,0 +1,64 @@
+"""MQTT topic filter matching shared by the local broker and memory transport"""
+from typing import Dict, Hashable, Optional
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """MQTT 3.1.1 filter matching with + and # wildcards"""
+    if topic_filter == topic:
+        return True
+    # Wildcards never match $SYS-style topics at the first level
+    if topic.startswith("$") and topic_filter[:1] in ("+", "#"):
+        return False
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[i]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class SubscriptionTable:
+    """Topic filter -> {subscriber: qos}, with per-topic lookups cached
+
+    Publishers usually reuse a handful of topics, so match() resolves a
+    topic against every filter once and serves later publishes from the
+    cache until a subscription changes.
+    """
+    def __init__(self, cache_size=10000):
+        self.filters: Dict[str, Dict[Hashable, int]] = {}
+        self.cache: Dict[str, Dict[Hashable, int]] = {}
+        self.cache_size = cache_size
+
+    def add(self, subscriber: Hashable, topic_filter: str, qos: int):
+        self.filters.setdefault(topic_filter, {})[subscriber] = qos
+        self.cache.clear()
+
+    def remove(self, subscriber: Hashable, topic_filter: Optional[str] = None):
+        """Drop one subscription, or all of a subscriber's when topic_filter is None"""
+        filters = [topic_filter] if topic_filter is not None else list(self.filters)
+        for name in filters:
+            subscribers = self.filters.get(name)
+            if subscribers is not None and subscribers.pop(subscriber, None) is not None:
+                if not subscribers:
+                    del self.filters[name]
+        self.cache.clear()
+
+    def match(self, topic: str) -> Dict[Hashable, int]:
+        """Subscribers of a topic with their highest granted qos"""
+        matched = self.cache.get(topic)
+        if matched is not None:
+            return matched
+        matched = {}
+        for topic_filter, subscribers in self.filters.items():
+            if topic_matches(topic_filter, topic):
+                for subscriber, qos in subscribers.items():
+                    if qos > matched.get(subscriber, -1):
+                        matched[subscriber] = qos
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[topic] = matched
+        return matched
@@ -0,0 +1,30 @@
+"""Per-zone MQTT topic names"""
+from typing import Optional
+from config import (SENSOR_TOPIC, CONTROL_TOPIC, ANOMALY_TOPIC, SENSOR_TOPIC_TEMPLATE,
+                    CONTROL_TOPIC_TEMPLATE, ANOMALY_TOPIC_TEMPLATE)
+
+
+def sensor_topic(zone: Optional[str] = None) -> str:
+    """Sensor topic of a zone, the single-zone SENSOR_TOPIC when zone is None"""
+    return SENSOR_TOPIC if zone is None else SENSOR_TOPIC_TEMPLATE.format(zone=zone)
+
+
+def control_topic(zone: Optional[str] = None) -> str:
+    """Control topic of a zone, the single-zone CONTROL_TOPIC when zone is None"""
+    return CONTROL_TOPIC if zone is None else CONTROL_TOPIC_TEMPLATE.format(zone=zone)
+
+
+def anomaly_topic(zone: Optional[str] = None) -> str:
+    """Anomaly flag topic of a zone, the single-zone ANOMALY_TOPIC when zone is None"""
+    return ANOMALY_TOPIC if zone is None else ANOMALY_TOPIC_TEMPLATE.format(zone=zone)
+
+
+def zone_from_topic(topic: str) -> Optional[str]:
+    """Extract the zone from a namespaced sensor, control or anomaly topic"""
+    for template in (SENSOR_TOPIC_TEMPLATE, CONTROL_TOPIC_TEMPLATE, ANOMALY_TOPIC_TEMPLATE):
+        prefix, suffix = template.split("{zone}")
+        if topic.startswith(prefix) and topic.endswith(suffix) and len(topic) > len(prefix) + len(suffix):
+            zone = topic[len(prefix):len(topic) - len(suffix)]
+            if "/" not in zone:
+                return zone
+    return None
@@ -0,0 +1,19 @@
+"""MQTT client factory: real paho sockets or the in-process memory transport"""
+import paho.mqtt.client as mqtt
+from .memory_transport import MemoryClient
+
+TRANSPORT_TCP = "tcp"
+TRANSPORT_MEMORY = "memory"
+
+
+def create_client(transport=TRANSPORT_TCP, client_id=""):
+    """paho Client for "tcp", MemoryClient for "memory"
+
+    The memory transport only reaches clients in the same process, use it
+    for tests and benchmarks that run the whole pipeline in one process.
+    """
+    if transport == TRANSPORT_TCP:
+        return mqtt.Client(client_id)
+    if transport == TRANSPORT_MEMORY:
+        return MemoryClient(client_id)
+    raise ValueError(f"Unknown MQTT transport: {transport!r}")
@@ -0,0 +1,6 @@
+from .metrics import (Counter, Gauge, Histogram, Registry, REGISTRY, CONTENT_TYPE,
+                      counter, gauge, histogram, serve_metrics)
+from .logs import EventLog, configure
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'Registry', 'REGISTRY', 'CONTENT_TYPE',
+           'counter', 'gauge', 'histogram', 'serve_metrics', 'EventLog', 'configure']
@@ -0,0 +1,104 @@
+"""Rate-limited structured logging for per-message events
+
+Per-reading print() calls cost more than the work they describe at high
+rates. EventLog writes one line per event with key=value fields through
+the standard logging module, and repeats of the same event key are
+logged at most once per interval; the line after a quiet period carries
+how many were skipped.
+"""
+import logging
+import sys
+import threading
+import time
+from typing import Dict, Hashable, Tuple
+from config import LOG_LEVEL, LOG_INTERVAL
+from .metrics import counter
+
+_configured = False
+_configure_lock = threading.Lock()
+
+log_suppressed = counter("log_suppressed_total", "Log lines dropped by rate limiting", ("logger",))
+
+
+def configure(level=LOG_LEVEL):
+    """Install a stdout handler on the root logger once per process"""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(level)
+        _configured = True
+
+
+def format_fields(fields: Dict[str, object]) -> str:
+    """key=value pairs, values with spaces are quoted"""
+    parts = []
+    for key, value in fields.items():
+        text = str(value)
+        if not text or " " in text or "=" in text or '"' in text:
+            text = '"' + text.replace('"', '\\"') + '"'
+        parts.append(f"{key}={text}")
+    return " ".join(parts)
+
+
+class EventLog:
+    """Logger that throttles each event key to one line per interval
+
+    log.info("📤 command sent", key=(zone, action), zone=zone, action=action)
+
+    key defaults to the event text, so the event should be a constant and
+    the values go in fields. interval=0 logs every call. At most max_keys
+    keys are tracked; when full, keys quiet for an interval are dropped
+    first, then the least recently logged ones.
+    """
+    def __init__(self, name: str, interval: float = LOG_INTERVAL, max_keys: int = 4096):
+        configure()
+        self.logger = logging.getLogger(name)
+        self.interval = interval
+        self.max_keys = max_keys
+        # key -> (last logged at, calls skipped since), in order of last logging
+        self.last: Dict[Hashable, Tuple[float, int]] = {}
+        self.lock = threading.Lock()
+        self.suppressed = log_suppressed.labels(name)
+
+    def log(self, level: int, event: str, key: Hashable = None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if self.interval:
+            key = event if key is None else (event, key)
+            now = time.monotonic()
+            with self.lock:
+                last, skipped = self.last.get(key, (None, 0))
+                if last is not None and now - last < self.interval:
+                    self.last[key] = (last, skipped + 1)
+                    self.suppressed.inc()
+                    return
+                self.last.pop(key, None)
+                if len(self.last) >= self.max_keys:
+                    self._evict(now)
+                self.last[key] = (now, 0)
+            if skipped:
+                fields["suppressed"] = skipped
+        self.logger.log(level, f"{event} {format_fields(fields)}" if fields else event)
+
+    def _evict(self, now: float):
+        """Drop keys quiet for an interval, or the oldest half if none are"""
+        stale = [key for key, (last, _) in self.last.items() if now - last >= self.interval]
+        for key in stale or list(self.last)[:len(self.last) // 2 or 1]:
+            del self.last[key]
+
+    def debug(self, event, key=None, **fields):
+        self.log(logging.DEBUG, event, key, **fields)
+
+    def info(self, event, key=None, **fields):
+        self.log(logging.INFO, event, key, **fields)
+
+    def warning(self, event, key=None, **fields):
+        self.log(logging.WARNING, event, key, **fields)
+
+    def error(self, event, key=None, **fields):
+        self.log(logging.ERROR, event, key, **fields)
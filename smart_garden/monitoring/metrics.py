@@ -0,0 +1,306 @@
+"""In-process counters, gauges and histograms with Prometheus text output
+
+Metrics live in a Registry (REGISTRY by default) and are created with
+counter()/gauge()/histogram(), which return the existing metric when a
+name is registered twice, so modules can declare what they record at
+import time. render() produces the text exposition format served on
+/metrics by the web apps and by serve_metrics() in the other processes.
+"""
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds, from 50 microseconds (a rule pass) to 10s (a stalled flush)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(ABC):
+    """A named metric with one child per combination of label values
+
+    Subclasses set kind and child_class and render their children in samples().
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+        # Unlabelled metrics are used directly, e.g. counter.inc()
+        self.default = None if self.label_names else self._child(())
+
+    def labels(self, *values):
+        """Child for one combination of label values, created on first use"""
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {values}")
+            child = self._child(key)
+        return child
+
+    def _child(self, key):
+        with self.lock:
+            child = self.children.get(key)
+            if child is None:
+                child = self.children[key] = self.child_class()
+            return child
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines of every child"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class CounterValue:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. messages received"""
+    kind = "counter"
+    child_class = CounterValue
+
+    def inc(self, amount: float = 1):
+        self.default.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self.default.value
+
+    def samples(self):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.value)}"
+                for key, child in list(self.children.items())]
+
+
+class GaugeValue:
+    __slots__ = ("value", "function", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self.lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Sample the value when scraped instead of tracking it"""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(Metric):
+    """Value that goes up and down, e.g. queue depth"""
+    kind = "gauge"
+    child_class = GaugeValue
+
+    def set(self, value: float):
+        self.default.set(value)
+
+    def inc(self, amount: float = 1):
+        self.default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.default.dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self.default.set_function(function)
+
+    @property
+    def value(self) -> float:
+        return self.default.get()
+
+    def samples(self):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.get())}"
+                for key, child in list(self.children.items())]
+
+
+class HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the duration of its block"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(Metric):
+    """Distribution of durations or sizes in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def child_class(self):
+        return HistogramValue(self.bounds)
+
+    def observe(self, value: float):
+        self.default.observe(value)
+
+    def time(self):
+        return self.default.time()
+
+    def samples(self):
+        lines = []
+        for key, child in list(self.children.items()):
+            with child.lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket in zip(self.bounds + (math.inf,), counts):
+                cumulative += bucket
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """The set of metrics one process exposes"""
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labels=(), registry=REGISTRY) -> Counter:
+    return registry.register(Counter(name, help, labels))
+
+
+def gauge(name, help, labels=(), registry=REGISTRY) -> Gauge:
+    return registry.register(Gauge(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY) -> Histogram:
+    return registry.register(Histogram(name, help, labels, buckets))
+
+
+def serve_metrics(port: int, host="0.0.0.0", registry=REGISTRY) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on a daemon thread, for processes without a web app
+
+    Returns None when port is 0 (disabled) or cannot be bound, which is
+    logged and otherwise ignored.
+    """
+    if not port:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood the console
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        # A taken port costs the metrics, not the process that records them
+        from .logs import EventLog
+        EventLog(__name__).error("⚠️ Metrics endpoint not started", port=port, error=e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -1,3 +1,4 @@
+from .batch_engine import SensorBatch
 from .base_sensor import BaseSensor
 from .humidity_sensor import HumiditySensor
 from .light_sensor import LightSensor
@@ -5,4 +6,4 @@ from .ph_sensor import PhSensor
 from .co2_sensor import Co2Sensor
 from .rain_sensor import RainSensor
 
-__all__ = ['BaseSensor', 'HumiditySensor', 'LightSensor', 'PhSensor', 'Co2Sensor', 'RainSensor']
\ No newline at end of file
+__all__ = ['SensorBatch', 'BaseSensor', 'HumiditySensor', 'LightSensor', 'PhSensor', 'Co2Sensor', 'RainSensor']
\ No newline at end of file
@@ -1,12 +1,17 @@
 """Base class for sensor simulations"""
-import random
 from datetime import datetime, timezone
+from .batch_engine import SensorBatch
 
 class BaseSensor:
-    """Base class for all sensor simulations"""
-    def __init__(self):
-        self.timestamp = datetime.now(timezone.utc).isoformat()
+    """Base class for all sensor simulations
 
-    def generate_value(self, min_val, max_val):
-        """Generate random value within range"""
-        return round(random.uniform(min_val, max_val), 1)
\ No newline at end of file
+    A sensor is a view of one bed in a SensorBatch. Without an engine it
+    owns a private single-bed batch and read() advances it. With a shared
+    engine the load-test driver calls engine.step() and read() returns the
+    latest value of bed `index`.
+    """
+    def __init__(self, engine=None, index=0, seed=None):
+        self.timestamp = datetime.now(timezone.utc).isoformat()
+        self.owns_engine = engine is None
+        self.engine = SensorBatch(1, seed) if engine is None else engine
+        self.index = index
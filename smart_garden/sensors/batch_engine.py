@@ -0,0 +1,99 @@
+"""Vectorized simulation engine for many virtual garden beds"""
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import numpy as np
+from config import MIN_PH, MAX_PH, DROUGHT_THRESHOLD
+
+# Random-walk and clamp parameters, kept identical to the scalar sensors
+HUMIDITY_INIT_RANGE = (20.0, 80.0)
+HUMIDITY_STEP = 5.0
+HUMIDITY_LIMITS = (0, 100)
+PH_INIT = 6.5
+PH_STEP = 0.6
+CO2_INIT = 400.0
+CO2_STEP = 200.0
+CO2_LIMITS = (350, 2000)
+DAY_LIGHT_RANGE = (600, 1000)
+NIGHT_LIGHT_RANGE = (0, 100)
+RAIN_PROBABILITY = 0.1
+
+
+class SensorBatch:
+    """Holds the state of N sensors per type in NumPy arrays
+
+    Every read_* call advances all N sensors of one type in a single
+    vectorized step and returns the new values as an array. step() reads
+    every type at once. The RNG is seedable for reproducible load tests.
+    """
+    def __init__(self, size: int, seed: Optional[int] = None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.humidity = np.round(self.rng.uniform(*HUMIDITY_INIT_RANGE, size), 1)
+        self.drought_alert = np.zeros(size, dtype=bool)
+        self.light = np.zeros(size)
+        self.ph = np.full(size, PH_INIT)
+        self.co2 = np.full(size, CO2_INIT)
+        self.rain = np.zeros(size, dtype=bool)
+
+    def read_humidity(self, walk: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Return humidity values with drought alerts
+
+        walk=False draws fresh values in the initial range without alerts,
+        like HumiditySensor.read() with no current value.
+        """
+        if not walk:
+            self.humidity = np.round(self.rng.uniform(*HUMIDITY_INIT_RANGE, self.size), 1)
+            self.drought_alert = np.zeros(self.size, dtype=bool)
+        else:
+            new_value = self.humidity + self.rng.uniform(-HUMIDITY_STEP, HUMIDITY_STEP, self.size)
+            self.drought_alert = new_value < DROUGHT_THRESHOLD
+            self.humidity = np.round(np.clip(new_value, *HUMIDITY_LIMITS), 1)
+        return self.humidity, self.drought_alert
+
+    def read_light(self, hour: Optional[int] = None) -> np.ndarray:
+        """Return light values for the day/night cycle of the given hour"""
+        if hour is None:
+            hour = datetime.now().hour
+        low, high = DAY_LIGHT_RANGE if 6 <= hour < 18 else NIGHT_LIGHT_RANGE
+        self.light = np.round(self.rng.uniform(low, high, self.size), 1)
+        return self.light
+
+    def read_ph(self) -> np.ndarray:
+        """Return pH values after one clamped random-walk step"""
+        change = self.rng.uniform(-PH_STEP, PH_STEP, self.size)
+        self.ph = np.round(np.clip(self.ph + change, MIN_PH, MAX_PH), 1)
+        return self.ph
+
+    def read_co2(self) -> np.ndarray:
+        """Return CO2 values after one clamped random-walk step"""
+        change = self.rng.uniform(-CO2_STEP, CO2_STEP, self.size)
+        self.co2 = np.round(np.clip(self.co2 + change, *CO2_LIMITS), 1)
+        return self.co2
+
+    def read_rain(self) -> np.ndarray:
+        """Return rain detection flags"""
+        self.rain = self.rng.random(self.size) < RAIN_PROBABILITY
+        return self.rain
+
+    def step(self, hour: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Advance every sensor of every bed and return the new readings"""
+        humidity, drought_alert = self.read_humidity()
+        return {
+            "humidity": humidity,
+            "drought_alert": drought_alert,
+            "light": self.read_light(hour),
+            "ph": self.read_ph(),
+            "rain": self.read_rain(),
+            "co2": self.read_co2(),
+        }
+
+    def payload(self, index: int) -> Dict[str, object]:
+        """Return the latest readings of one bed as plain Python values"""
+        return {
+            "humidity": float(self.humidity[index]),
+            "drought_alert": bool(self.drought_alert[index]),
+            "light": float(self.light[index]),
+            "ph": float(self.ph[index]),
+            "rain": bool(self.rain[index]),
+            "co2": float(self.co2[index]),
+        }
@@ -1,5 +1,4 @@
 """CO2 sensor simulation module"""
-import random
 from .base_sensor import BaseSensor
 
 class Co2Sensor(BaseSensor):
@@ -9,12 +8,12 @@ class Co2Sensor(BaseSensor):
     - Fluctuation range: ±50ppm
     - Recommended greenhouse optimization range: 800-1200ppm
     """
-    def __init__(self):
-        super().__init__()
-        self.current_co2 = 400.0  # Atmospheric baseline
+    @property
+    def current_co2(self):
+        return float(self.engine.co2[self.index])
 
     def read(self):
         """Generate CO2 value with fluctuation"""
-        change = random.uniform(-200, 200)
-        self.current_co2 = round(max(350, min(2000, self.current_co2 + change)), 1)
-        return self.current_co2
\ No newline at end of file
+        if self.owns_engine:
+            self.engine.read_co2()
+        return self.current_co2
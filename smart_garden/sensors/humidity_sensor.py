@@ -1,13 +1,15 @@
 """Humidity sensor simulation module"""
-import random
 from .base_sensor import BaseSensor
 
 class HumiditySensor(BaseSensor):
     """Simulates humidity sensor with drought detection"""
     def read(self, current_value=None):
         """Generate humidity value with drought alert"""
-        if current_value is None:
-            return self.generate_value(20.0, 80.0), False
-            
-        new_value = current_value + random.uniform(-5, 5)
-        return round(max(0, min(100, new_value)), 1), new_value < 30
\ No newline at end of file
+        if self.owns_engine:
+            if current_value is None:
+                self.engine.read_humidity(walk=False)
+            else:
+                self.engine.humidity[self.index] = current_value
+                self.engine.read_humidity()
+        return (float(self.engine.humidity[self.index]),
+                bool(self.engine.drought_alert[self.index]))
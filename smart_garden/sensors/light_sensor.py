@@ -1,6 +1,5 @@
 """Light sensor simulation module"""
 from .base_sensor import BaseSensor
-from datetime import datetime
 
 class LightSensor(BaseSensor):
     """Simulates light sensor with day/night cycle
@@ -11,7 +10,6 @@ class LightSensor(BaseSensor):
     """
     def read(self):
         """Generate light value based on time of day"""
-        hour = datetime.now().hour
-        if 6 <= hour < 18:
-            return self.generate_value(600, 1000)
-        return self.generate_value(0, 100)
\ No newline at end of file
+        if self.owns_engine:
+            self.engine.read_light()
+        return float(self.engine.light[self.index])
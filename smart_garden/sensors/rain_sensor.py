@@ -1,9 +1,10 @@
 """Rain sensor simulation module"""
-import random
 from .base_sensor import BaseSensor
 
 class RainSensor(BaseSensor):
     """Simulates rain detection sensor (10% probability)"""
     def read(self):
         """Determine rain occurrence"""
-        return random.random() < 0.1
\ No newline at end of file
+        if self.owns_engine:
+            self.engine.read_rain()
+        return bool(self.engine.rain[self.index])
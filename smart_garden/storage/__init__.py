@@ -0,0 +1,10 @@
+from .timestamps import to_epoch_ms, from_epoch_ms
+from .sensor_store import SensorStore, DEFAULT_ZONE
+from .rollups import RollupManager, RESOLUTIONS
+from .segment_log import SegmentStore
+from .backends import BACKENDS, default_path, open_store
+from .ingest_writer import SensorDataWriter
+
+__all__ = ['SensorStore', 'DEFAULT_ZONE', 'to_epoch_ms', 'from_epoch_ms',
+           'RollupManager', 'RESOLUTIONS', 'SensorDataWriter', 'SegmentStore',
+           'BACKENDS', 'default_path', 'open_store']
@@ -0,0 +1,346 @@
+"""Columnar archive of old sensor readings, partitioned by day and zone
+
+Readings are streamed out of a SensorStore in chunks and written as one
+part per day and zone:
+
+    <root>/day=2024-05-01/zone=default/part-000.parquet   (Parquet)
+    <root>/day=2024-05-01/zone=default/part-000.arrow     (Arrow IPC file)
+    <root>/day=2024-05-01/zone=default/part-000/<column>.npy  (NumPy)
+
+Each zone directory also holds a manifest.json recording the row count
+of every part and the store's prune watermark when it was written. A
+part whose day has not been pruned since still mirrors rows in the
+store, so archiving that day again replaces it (or skips the day when
+nothing changed) instead of adding a duplicate part. Only rows arriving
+after a prune go into a part of their own.
+
+Columns are typed: int64 epoch-ms timestamp, float32 sensor values and
+bool flags. Parquet and Arrow need the optional pyarrow package; the
+NumPy layout works everywhere and is what "auto" falls back to. Every
+format is read back memory-mapped.
+
+Run from the smart_garden directory to archive and prune everything
+older than 30 days:
+    python -m storage.archive --older-than-days 30 --prune --vacuum
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote
+import numpy as np
+from config import DB_PATH, DB_PARTITION, ARCHIVE_DIR, ARCHIVE_FORMAT, ARCHIVE_AFTER_DAYS
+from .sensor_store import SensorStore, SENSOR_FIELDS
+from .timestamps import to_epoch_ms
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNS = ("timestamp",) + SENSOR_FIELDS
+DTYPES = {
+    "timestamp": np.int64,
+    "humidity": np.float32,
+    "drought_alert": np.bool_,
+    "light": np.float32,
+    "ph": np.float32,
+    "rain": np.bool_,
+    "co2": np.float32,
+}
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "npy": ""}
+MANIFEST = "manifest.json"
+DAY_MS = 86_400_000
+
+
+def resolve_format(fmt: str) -> str:
+    """Map "auto" to parquet when pyarrow is installed, else npy"""
+    if fmt == "auto":
+        return "parquet" if pa is not None else "npy"
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown archive format: {fmt}")
+    if fmt != "npy" and pa is None:
+        raise ImportError(f"The {fmt} archive format needs pyarrow, install it or use npy")
+    return fmt
+
+
+def day_floor(ts_ms: int) -> int:
+    return ts_ms - ts_ms % DAY_MS
+
+
+def day_name(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def to_columns(rows: Sequence[tuple]) -> Dict[str, np.ndarray]:
+    """Typed column arrays from (timestamp, *SENSOR_FIELDS) row tuples"""
+    # Epoch milliseconds stay exact in float64, so one conversion serves every column
+    matrix = np.array(rows, dtype=np.float64).reshape(len(rows), len(COLUMNS))
+    return {name: matrix[:, i].astype(DTYPES[name]) for i, name in enumerate(COLUMNS)}
+
+
+class PartWriter:
+    """Streams chunks of one day/zone into a part, moved into place on close"""
+    def __init__(self, path: str, fmt: str, rows: int):
+        self.path = path
+        self.fmt = fmt
+        self.tmp_path = path + ".tmp"
+        self.written = 0
+        if fmt == "npy":
+            os.makedirs(self.tmp_path)
+            # Sized up front from the row count, then filled chunk by chunk
+            self.arrays = {name: np.lib.format.open_memmap(
+                os.path.join(self.tmp_path, name + ".npy"), mode="w+", dtype=DTYPES[name], shape=(rows,))
+                for name in COLUMNS}
+        else:
+            self.schema = pa.schema([(name, pa.from_numpy_dtype(DTYPES[name])) for name in COLUMNS])
+            if fmt == "parquet":
+                self.writer = pq.ParquetWriter(self.tmp_path, self.schema, compression="zstd")
+            else:
+                self.sink = pa.OSFile(self.tmp_path, "wb")
+                self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, columns: Dict[str, np.ndarray]):
+        count = len(columns["timestamp"])
+        if self.fmt == "npy":
+            for name, values in columns.items():
+                self.arrays[name][self.written:self.written + count] = values
+        else:
+            batch = pa.record_batch([pa.array(columns[name]) for name in COLUMNS], schema=self.schema)
+            if self.fmt == "parquet":
+                self.writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                self.writer.write_batch(batch)
+        self.written += count
+
+    def close(self):
+        if self.fmt == "npy":
+            for array in self.arrays.values():
+                array.flush()
+            del self.arrays
+        else:
+            self.writer.close()
+            if self.fmt == "arrow":
+                self.sink.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self.fmt == "npy":
+            self.arrays = None
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+        else:
+            try:
+                self.writer.close()
+                if self.fmt == "arrow":
+                    self.sink.close()
+            finally:
+                if os.path.exists(self.tmp_path):
+                    os.remove(self.tmp_path)
+
+
+class SensorArchive:
+    """Writes and reads the day/zone partitioned archive under root"""
+    def __init__(self, root: str, fmt: str = "auto"):
+        self.root = root
+        self.fmt = resolve_format(fmt)
+
+    # ---------- Layout ----------
+    def part_dir(self, day: str, zone: str) -> str:
+        return os.path.join(self.root, f"day={day}", f"zone={quote(zone, safe='')}")
+
+    def _next_part(self, directory: str) -> str:
+        """A new part path; parts are never overwritten, replaced ones are removed"""
+        existing = os.listdir(directory) if os.path.isdir(directory) else []
+        index = 0
+        while any(name.startswith(f"part-{index:03d}") for name in existing):
+            index += 1
+        return os.path.join(directory, f"part-{index:03d}{EXTENSIONS[self.fmt]}")
+
+    def read_manifest(self, directory: str) -> Dict[str, Dict[str, int]]:
+        """Part name -> {"rows", "pruned_before"}, entries of missing parts dropped"""
+        try:
+            with open(os.path.join(directory, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return {name: entry for name, entry in manifest.items()
+                if os.path.exists(os.path.join(directory, name))}
+
+    def _write_manifest(self, directory: str, manifest: Dict[str, Dict[str, int]]):
+        path = os.path.join(directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _remove_part(path: str):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    # ---------- Writing ----------
+    def archive_day(self, store: SensorStore, day_start_ms: int, chunk_size=50000) -> int:
+        """Archive every reading of one UTC day, one part per zone; returns rows archived
+
+        Parts written since the day was last pruned mirror rows still in
+        the store and are replaced by the new part. A zone is skipped when
+        its one such part already holds as many rows as the store.
+        """
+        day_end_ms = day_start_ms + DAY_MS
+        total = 0
+        for zone, count in sorted(store.zone_counts(day_start_ms, day_end_ms).items()):
+            directory = self.part_dir(day_name(day_start_ms), zone)
+            os.makedirs(directory, exist_ok=True)
+            manifest = self.read_manifest(directory)
+            # A prune reaching past this day after a part was written deleted that part's rows
+            replaced = [name for name, entry in manifest.items()
+                        if store.pruned_before <= entry["pruned_before"] or store.pruned_before < day_end_ms]
+            total += count
+            if len(replaced) == 1 and manifest[replaced[0]]["rows"] == count:
+                continue
+            path = self._next_part(directory)
+            writer = PartWriter(path, self.fmt, count)
+            try:
+                for rows in store.iter_chunks(day_start_ms, day_end_ms, SENSOR_FIELDS, zone, chunk_size):
+                    writer.write(to_columns(rows))
+                if writer.written != count:
+                    raise RuntimeError(f"Zone {zone} changed while archiving {day_name(day_start_ms)}")
+                # Listed before it appears, so a crash never leaves a part the manifest does not know
+                manifest[os.path.basename(path)] = {"rows": count, "pruned_before": store.pruned_before}
+                self._write_manifest(directory, manifest)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.close()
+            for name in replaced:
+                self._remove_part(os.path.join(directory, name))
+                del manifest[name]
+            self._write_manifest(directory, manifest)
+        return total
+
+    def archive(self, store: SensorStore, before, prune=False, chunk_size=50000) -> Dict[str, int]:
+        """Archive whole UTC days older than `before`, optionally deleting them from the store
+
+        Safe to repeat: days already archived are skipped or replaced, see
+        archive_day(). Rows are only deleted when the store still holds
+        exactly the number of rows that were archived.
+        """
+        stats = {"days": 0, "rows": 0, "pruned": 0}
+        store.reload_partitions()
+        bounds = store.bounds()
+        if bounds is None:
+            return stats
+        first_day = day_floor(bounds[0])
+        cutoff = day_floor(to_epoch_ms(before))
+        for day_start in range(first_day, cutoff, DAY_MS):
+            rows = self.archive_day(store, day_start, chunk_size)
+            if rows:
+                stats["days"] += 1
+                stats["rows"] += rows
+        if prune and first_day < cutoff:
+            stats["pruned"] = store.delete_range(first_day, cutoff, expected=stats["rows"])
+        return stats
+
+    # ---------- Reading ----------
+    def parts(self, start=None, end=None, zone=None) -> Iterator[Tuple[str, str, str]]:
+        """(day, zone, path) of every part overlapping [start, end), oldest day first"""
+        if not os.path.isdir(self.root):
+            return
+        first = day_name(day_floor(to_epoch_ms(start))) if start is not None else None
+        last = day_name(to_epoch_ms(end) - 1) if end is not None else None
+        for day_entry in sorted(os.listdir(self.root)):
+            if not day_entry.startswith("day="):
+                continue
+            day = day_entry[4:]
+            if (first and day < first) or (last and day > last):
+                continue
+            for zone_entry in sorted(os.listdir(os.path.join(self.root, day_entry))):
+                part_zone = unquote(zone_entry[5:])
+                if not zone_entry.startswith("zone=") or (zone is not None and part_zone != zone):
+                    continue
+                directory = os.path.join(self.root, day_entry, zone_entry)
+                for name in sorted(os.listdir(directory)):
+                    if name.startswith("part-") and not name.endswith(".tmp"):
+                        yield day, part_zone, os.path.join(directory, name)
+
+    def read_part(self, path: str, fields: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Columns of one part, memory-mapped where the format allows"""
+        names = ["timestamp"] + [f for f in (fields or SENSOR_FIELDS) if f != "timestamp"]
+        unknown = [f for f in names if f not in DTYPES]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if os.path.isdir(path):
+            return {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in names}
+        if pa is None:
+            raise ImportError(f"Reading {path} needs pyarrow")
+        if path.endswith(".arrow"):
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all().select(names)
+        else:
+            table = pq.read_table(path, columns=names, memory_map=True)
+        return {name: table.column(name).to_numpy() for name in names}
+
+    def iter_parts(self, start=None, end=None, fields=None, zone=None) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        """(zone, columns) per part, trimmed to [start, end), without concatenating"""
+        start_ms = to_epoch_ms(start) if start is not None else None
+        end_ms = to_epoch_ms(end) if end is not None else None
+        for day, part_zone, path in self.parts(start, end, zone):
+            columns = self.read_part(path, fields)
+            if start_ms is not None or end_ms is not None:
+                ts = columns["timestamp"]
+                low = np.searchsorted(ts, start_ms) if start_ms is not None else 0
+                high = np.searchsorted(ts, end_ms) if end_ms is not None else len(ts)
+                columns = {name: values[low:high] for name, values in columns.items()}
+            yield part_zone, columns
+
+    def load(self, start=None, end=None, fields=None, zone=None) -> Dict[str, np.ndarray]:
+        """All matching readings as one array per column plus a zone column"""
+        pieces: List[Dict[str, np.ndarray]] = []
+        zones: List[np.ndarray] = []
+        for part_zone, columns in self.iter_parts(start, end, fields, zone):
+            pieces.append(columns)
+            zones.append(np.full(len(columns["timestamp"]), part_zone, dtype=object))
+        names = ["timestamp"] + [f for f in (fields or SENSOR_FIELDS) if f != "timestamp"]
+        result = {name: np.concatenate([p[name] for p in pieces]) if pieces
+                  else np.empty(0, DTYPES[name]) for name in names}
+        result["zone"] = np.concatenate(zones) if zones else np.empty(0, dtype=object)
+        order = np.argsort(result["timestamp"], kind="stable")
+        return {name: values[order] for name, values in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old sensor readings to columnar files")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out", default=ARCHIVE_DIR, help="archive root directory")
+    parser.add_argument("--format", default=ARCHIVE_FORMAT, choices=("auto",) + tuple(EXTENSIONS))
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--before", help="archive days before this date (ISO-8601, UTC)")
+    group.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--prune", action="store_true", help="delete archived rows from the database")
+    parser.add_argument("--vacuum", action="store_true", help="shrink the database file after pruning")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.before:
+        before = datetime.fromisoformat(args.before)
+    else:
+        before = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+    archive = SensorArchive(args.out, args.format)
+    store = SensorStore(args.db, DB_PARTITION)
+    try:
+        stats = archive.archive(store, before, args.prune, args.chunk_size)
+        print(f"📦 Archived {stats['rows']} readings from {stats['days']} days "
+              f"to {args.out} ({archive.fmt}), pruned {stats['pruned']}")
+        if args.prune and args.vacuum and stats["pruned"]:
+            store.vacuum()
+            print(f"🧹 Vacuumed {args.db}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""Opens the sensor storage backend selected in config"""
+from config import DB_BACKEND, DB_PATH, DB_PARTITION, SEGMENT_DIR
+from .segment_log import SegmentStore
+from .sensor_store import SensorStore
+
+BACKENDS = ("sqlite", "segments")
+
+
+def default_path(backend=DB_BACKEND) -> str:
+    """DB_PATH for SQLite, SEGMENT_DIR for segment logs"""
+    return SEGMENT_DIR if backend == "segments" else DB_PATH
+
+
+def open_store(path=None, backend=DB_BACKEND, partition=DB_PARTITION):
+    """A SensorStore or SegmentStore, both answer the same queries"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    path = path or default_path(backend)
+    if backend == "segments":
+        return SegmentStore(path)
+    return SensorStore(path, partition)
@@ -0,0 +1,82 @@
+"""Batched writer for sensor readings"""
+import time
+from typing import Dict, Any, List, Tuple
+from monitoring import counter, gauge, histogram
+from .backends import open_store
+from .sensor_store import DEFAULT_ZONE
+
+rows_written = counter("db_rows_written_total", "Sensor rows written to the store")
+flush_seconds = histogram("db_flush_seconds", "Time to write one batch of rows")
+pending_rows = gauge("db_pending_rows", "Rows buffered for the next flush")
+
+
+class SensorDataWriter:
+    """Buffers sensor rows and writes them in one transaction per flush
+
+    - backend picks SQLite or append-only segment logs (storage.backends),
+      db_path is the database file or the segment directory
+    - The SQLite store runs in WAL mode so readers (web pages, visualizer)
+      never block the writer
+    - Rows are flushed with executemany once flush_rows rows are buffered
+      or flush_interval seconds have passed since the last flush
+    - close() flushes whatever is left, call it from the finally: block
+    """
+    def __init__(self, db_path, flush_rows=100, flush_interval=5.0, partition="month", backend="sqlite"):
+        self.store = open_store(db_path, backend, partition)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.buffer: List[Tuple] = []
+        self.last_flush = time.monotonic()
+        self.started = self.last_flush
+
+        # Sizing statistics
+        self.rows_written = 0
+        self.flush_count = 0
+        self.flush_time_total = 0.0
+        self.flush_time_max = 0.0
+        pending_rows.set_function(lambda: len(self.buffer))
+
+    def add(self, timestamp, humidity, drought_alert, light, ph, rain, co2, zone=DEFAULT_ZONE):
+        """Buffer one reading, flushing when a threshold is reached"""
+        self.buffer.append((timestamp, zone, humidity, drought_alert, light, ph, rain, co2))
+        if (len(self.buffer) >= self.flush_rows
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows in a single transaction"""
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return 0
+        rows, self.buffer = self.buffer, []
+        start = time.perf_counter()
+        self.store.insert_many(rows)
+        elapsed = time.perf_counter() - start
+        flush_seconds.observe(elapsed)
+        rows_written.inc(len(rows))
+
+        self.rows_written += len(rows)
+        self.flush_count += 1
+        self.flush_time_total += elapsed
+        self.flush_time_max = max(self.flush_time_max, elapsed)
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return throughput and flush latency figures"""
+        uptime = time.monotonic() - self.started
+        return {
+            "rows_written": self.rows_written,
+            "pending_rows": len(self.buffer),
+            "flushes": self.flush_count,
+            "rows_per_sec": round(self.rows_written / uptime, 1) if uptime > 0 else 0.0,
+            "avg_flush_ms": round(self.flush_time_total / self.flush_count * 1000, 3)
+            if self.flush_count else 0.0,
+            "max_flush_ms": round(self.flush_time_max * 1000, 3),
+        }
+
+    def close(self):
+        """Flush remaining rows and close the store"""
+        try:
+            self.flush()
+        finally:
+            self.store.close()
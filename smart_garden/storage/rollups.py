@@ -0,0 +1,214 @@
+"""Incrementally maintained 1-minute / 1-hour sensor aggregates"""
+from typing import Dict, Any, Iterable, List, Sequence
+from .timestamps import to_epoch_ms
+
+# Resolution name -> bucket width in milliseconds, finest first
+RESOLUTIONS = {
+    "1m": 60_000,
+    "1h": 3_600_000,
+}
+# Fields rolled up, with their column names in the partition tables
+ROLLUP_FIELDS = {
+    "humidity": "Humidity",
+    "light": "Light",
+    "ph": "PH",
+    "co2": "CO2",
+}
+
+
+class RollupManager:
+    """Keeps min/max/sum/count per (zone, bucket) for every resolution
+
+    - update() folds a batch of inserted rows into the rollup tables with
+      one upsert per touched bucket, inside the writer's transaction
+    - query() answers dashboard requests from the coarsest table needed to
+      stay within a point budget, falling back to raw rows for short ranges
+    """
+    def __init__(self, store, create=True):
+        self.store = store
+        self.conn = store.conn
+        # Read-only stores query whatever rollup tables exist
+        self.created = self._create_tables() if create else False
+
+    @staticmethod
+    def table(resolution: str) -> str:
+        return f"SensorRollup_{resolution}"
+
+    def _create_tables(self) -> bool:
+        """Create missing rollup tables, returning True if any were new"""
+        created = False
+        columns = ",\n".join(
+            f"{col}Min REAL, {col}Max REAL, {col}Sum REAL" for col in ROLLUP_FIELDS.values())
+        with self.conn:
+            for resolution in RESOLUTIONS:
+                name = self.table(resolution)
+                exists = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+                ).fetchone()
+                if exists:
+                    continue
+                self.conn.execute(f'''
+                    CREATE TABLE {name} (
+                        Zone TEXT NOT NULL,
+                        Bucket INTEGER NOT NULL,
+                        Count INTEGER NOT NULL,
+                        {columns},
+                        PRIMARY KEY (Zone, Bucket)
+                    )
+                ''')
+                self.conn.execute(f"CREATE INDEX idx_{name}_bucket ON {name} (Bucket)")
+                created = True
+        return created
+
+    # ---------- Maintenance ----------
+    def update(self, rows: Iterable[Sequence]):
+        """Fold stored rows (Ts, Zone, Humidity, DroughtAlert, Light, PH, Rain, CO2) into the rollups
+
+        Runs inside the caller's transaction.
+        """
+        rows = list(rows)
+        for resolution, step in RESOLUTIONS.items():
+            buckets: Dict[tuple, list] = {}
+            for ts, zone, humidity, _, light, ph, _, co2 in rows:
+                key = (zone, ts - ts % step)
+                values = (humidity, light, ph, co2)
+                agg = buckets.get(key)
+                if agg is None:
+                    buckets[key] = [1] + [v for value in values for v in (value, value, value)]
+                    continue
+                agg[0] += 1
+                for i, value in enumerate(values):
+                    base = 1 + i * 3
+                    if value < agg[base]:
+                        agg[base] = value
+                    if value > agg[base + 1]:
+                        agg[base + 1] = value
+                    agg[base + 2] += value
+            self._upsert(resolution, buckets)
+
+    def _upsert(self, resolution, buckets):
+        """Merge per-batch aggregates into the stored buckets"""
+        name = self.table(resolution)
+        cols = [f"{col}{part}" for col in ROLLUP_FIELDS.values() for part in ("Min", "Max", "Sum")]
+        merge = ", ".join(
+            [f"Count = Count + excluded.Count"]
+            + [f"{col}Min = min({col}Min, excluded.{col}Min), "
+               f"{col}Max = max({col}Max, excluded.{col}Max), "
+               f"{col}Sum = {col}Sum + excluded.{col}Sum" for col in ROLLUP_FIELDS.values()])
+        self.conn.executemany(f'''
+            INSERT INTO {name} (Zone, Bucket, Count, {", ".join(cols)})
+            VALUES ({", ".join("?" * (3 + len(cols)))})
+            ON CONFLICT (Zone, Bucket) DO UPDATE SET {merge}
+        ''', [(zone, bucket, *agg) for (zone, bucket), agg in buckets.items()])
+
+    def backfill(self, chunk_size=5000) -> int:
+        """Build rollups from rows already stored in the partitions"""
+        total = 0
+        with self.conn:
+            for name in self.store.partitions():
+                cursor = self.conn.execute(
+                    f"SELECT Ts, Zone, Humidity, DroughtAlert, Light, PH, Rain, CO2 FROM {name}")
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    self.update(rows)
+                    total += len(rows)
+        return total
+
+    # ---------- Queries ----------
+    def pick_resolution(self, start_ms, end_ms, max_points, zone=None) -> str:
+        """Return "raw" or the finest rollup whose point count fits the budget
+
+        Ranges reaching before the store's pruned_before watermark never get
+        "raw", their raw rows are gone while the rollups still count them.
+        """
+        if start_ms >= self.store.pruned_before:
+            # The bucket straddling start counts too, as in count()
+            if self.count(start_ms, end_ms, zone) <= max_points:
+                return "raw"
+        for resolution, step in RESOLUTIONS.items():
+            if (end_ms - start_ms) / step <= max_points:
+                return resolution
+        return list(RESOLUTIONS)[-1]
+
+    def _bucket_sum(self, resolution, start_ms, end_ms, zone=None) -> int:
+        """Count raw rows in the range using the rollup counts"""
+        zone_clause = " AND Zone = ?" if zone else ""
+        params = [start_ms, end_ms] + ([zone] if zone else [])
+        row = self.conn.execute(
+            f"SELECT SUM(Count) FROM {self.table(resolution)} "
+            f"WHERE Bucket >= ? AND Bucket < ?{zone_clause}", params).fetchone()
+        return row[0] or 0
+
+    def count(self, start, end, zone=None) -> int:
+        """Number of raw rows in the 1-minute buckets overlapping [start, end)
+
+        Rows are never updated in place, so this changes whenever data in
+        the range changes and works as a cheap version number. Pruning
+        raw rows keeps their rollups, so callers also key on the store's
+        pruned_before watermark.
+        """
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        step = RESOLUTIONS["1m"]
+        return self._bucket_sum("1m", start_ms - start_ms % step, end_ms, zone)
+
+    def query(self, start, end, fields=None, max_points=500, zone=None, resolution=None) -> Dict[str, Any]:
+        """Return aggregated points for [start, end) within a point budget
+
+        Each point has timestamp, count and <field>_min/_max/_mean keys.
+        Raw rows are returned in the same shape with count 1. Passing a
+        resolution ("raw" or a RESOLUTIONS key) skips the budget check.
+        """
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        fields = list(fields) if fields else list(ROLLUP_FIELDS)
+        unknown = [f for f in fields if f not in ROLLUP_FIELDS]
+        if unknown:
+            raise ValueError(f"Fields without rollups: {', '.join(unknown)}")
+
+        if resolution is None:
+            resolution = self.pick_resolution(start_ms, end_ms, max_points, zone)
+        elif resolution != "raw" and resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        if resolution == "raw":
+            points = [self._raw_point(record, fields)
+                      for record in self.store.iter_range(start_ms, end_ms, fields, zone)]
+            return {"resolution": "raw", "step_ms": None, "points": points}
+
+        step = RESOLUTIONS[resolution]
+        # Buckets are aligned to step, include the one straddling start
+        return {
+            "resolution": resolution,
+            "step_ms": step,
+            "points": self._rollup_points(resolution, start_ms - start_ms % step, end_ms, fields, zone),
+        }
+
+    @staticmethod
+    def _raw_point(record, fields) -> Dict[str, Any]:
+        point = {"timestamp": record["timestamp"], "count": 1}
+        for field in fields:
+            value = record[field]
+            point[f"{field}_min"] = point[f"{field}_max"] = point[f"{field}_mean"] = value
+        return point
+
+    def _rollup_points(self, resolution, start_ms, end_ms, fields, zone) -> List[Dict[str, Any]]:
+        """Combine zone buckets and compute means"""
+        selects = ", ".join(
+            f"MIN({ROLLUP_FIELDS[f]}Min), MAX({ROLLUP_FIELDS[f]}Max), SUM({ROLLUP_FIELDS[f]}Sum)"
+            for f in fields)
+        zone_clause = " AND Zone = ?" if zone else ""
+        params = [start_ms, end_ms] + ([zone] if zone else [])
+        points = []
+        for row in self.conn.execute(
+                f"SELECT Bucket, SUM(Count), {selects} FROM {self.table(resolution)} "
+                f"WHERE Bucket >= ? AND Bucket < ?{zone_clause} GROUP BY Bucket ORDER BY Bucket",
+                params):
+            bucket, count = row[0], row[1]
+            point = {"timestamp": bucket, "count": count}
+            for i, field in enumerate(fields):
+                low, high, total = row[2 + i * 3: 5 + i * 3]
+                point[f"{field}_min"] = low
+                point[f"{field}_max"] = high
+                point[f"{field}_mean"] = round(total / count, 2)
+            points.append(point)
+        return points
@@ -0,0 +1,470 @@
+"""Append-only segment files for sensor readings, read through mmap
+
+An alternative to SensorStore for high ingest rates: a write appends
+fixed-width binary records to the zone's current segment file, with no
+SQL parsing or B-tree maintenance per row. Layout under the root
+directory:
+
+    <zone>/<first ts>-<seq>.seg   RECORD structs, oldest first
+    <zone>/<first ts>-<seq>.idx   (timestamp, record number) every INDEX_STRIDE records
+
+Readers map segments with mmap and view them with numpy.frombuffer, so
+range scans slice the page cache instead of copying rows. The query
+methods mirror SensorStore, which lets SensorApi and SensorDataWriter
+use either backend (see storage.backends).
+"""
+import mmap
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote
+import numpy as np
+from .rollups import RESOLUTIONS, ROLLUP_FIELDS
+from .sensor_store import DEFAULT_ZONE, SENSOR_FIELDS, BOOL_FIELDS
+from .timestamps import to_epoch_ms
+
+RECORD = np.dtype([
+    ("timestamp", "<i8"),
+    ("humidity", "<f8"),
+    ("drought_alert", "u1"),
+    ("light", "<f8"),
+    ("ph", "<f8"),
+    ("rain", "u1"),
+    ("co2", "<f8"),
+])
+INDEX_ENTRY = np.dtype([("timestamp", "<i8"), ("record", "<i8")])
+INDEX_STRIDE = 1024
+SEGMENT_RECORDS = 1 << 20  # About 42 MB per segment
+ROLLUP_CHUNK = 1 << 16     # Records reduced at a time by SegmentRollups
+
+
+def _columns(fields: Optional[Sequence[str]]) -> List[str]:
+    """Validate requested fields, always including the timestamp"""
+    fields = list(fields) if fields else list(SENSOR_FIELDS)
+    unknown = [f for f in fields if f not in RECORD.names]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if "timestamp" not in fields:
+        fields.insert(0, "timestamp")
+    return fields
+
+
+def _to_record(fields, row) -> Dict[str, Any]:
+    record = dict(zip(fields, row))
+    for name in BOOL_FIELDS:
+        if name in record:
+            record[name] = bool(record[name])
+    return record
+
+
+def _ceil(ts_ms: int, step: int) -> int:
+    return ts_ms + -ts_ms % step
+
+
+def _sort_key(name: str) -> Tuple[int, int]:
+    first_ts, _, seq = name[:-4].partition("-")
+    return int(first_ts), int(seq)
+
+
+class Segment:
+    """One segment file mapped read-only, remapped when it has grown"""
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path[:-4] + ".idx"
+        self.size = 0
+        self.records = np.empty(0, RECORD)
+        self.index = np.empty(0, INDEX_ENTRY)
+        self.refresh()
+
+    def refresh(self):
+        size = os.path.getsize(self.path)
+        # A record the writer is still appending is not visible yet
+        size -= size % RECORD.itemsize
+        if size == self.size:
+            return
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        # The previous map is released once no returned array views it
+        self.records = np.frombuffer(mapped, RECORD)
+        self.size = size
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        index = np.frombuffer(data[:len(data) - len(data) % INDEX_ENTRY.itemsize], INDEX_ENTRY)
+        self.index = index[index["record"] < len(self.records)]
+
+    @property
+    def first(self) -> int:
+        return int(self.records["timestamp"][0])
+
+    @property
+    def last(self) -> int:
+        return int(self.records["timestamp"][-1])
+
+    def position(self, ts_ms: int) -> int:
+        """Index of the first record with timestamp >= ts_ms"""
+        timestamps = self.records["timestamp"]
+        low, high = 0, len(timestamps)
+        # The sparse index narrows the binary search to one stride of records
+        i = int(np.searchsorted(self.index["timestamp"], ts_ms))
+        if i > 0:
+            low = int(self.index["record"][i - 1])
+        if i < len(self.index):
+            high = int(self.index["record"][i])
+        return low + int(np.searchsorted(timestamps[low:high], ts_ms))
+
+    def slice(self, start_ms: Optional[int], end_ms: Optional[int]) -> np.ndarray:
+        low = self.position(start_ms) if start_ms is not None else 0
+        high = self.position(end_ms) if end_ms is not None else len(self.records)
+        return self.records[low:high]
+
+
+class ZoneAppender:
+    """The segment a zone is currently writing to
+
+    Records older than the segment's last one go to a second appender
+    for late readings, created on first use, so an out-of-order batch
+    does not start a new segment. Only late readings that are out of
+    order among themselves rotate the late segment.
+    """
+    def __init__(self, directory: str, max_records: int):
+        self.directory = directory
+        self.max_records = max_records
+        self.file = None
+        self.index_file = None
+        self.count = 0
+        self.last_ts = None
+        self.late: Optional["ZoneAppender"] = None
+
+    def _rotate(self, first_ts: int):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        seq = sum(1 for name in os.listdir(self.directory) if name.endswith(".seg"))
+        base = os.path.join(self.directory, f"{first_ts:013d}-{seq:04d}")
+        # Index first: a reader that finds the .seg can always open its .idx
+        self.index_file = open(base + ".idx", "ab", buffering=0)
+        self.file = open(base + ".seg", "ab", buffering=0)
+        self.count = 0
+
+    def append(self, records: np.ndarray):
+        """Append records sorted by timestamp, the late ones to the late segment"""
+        if self.file is not None and int(records["timestamp"][0]) < self.last_ts:
+            split = int(np.searchsorted(records["timestamp"], self.last_ts))
+            if self.late is None:
+                self.late = ZoneAppender(self.directory, self.max_records)
+            self.late._write(records[:split])
+            records = records[split:]
+            if not len(records):
+                return
+        self._write(records)
+
+    def _write(self, records: np.ndarray):
+        """Write sorted records to the segment
+
+        Starts a new segment when the current one is full or the records
+        are older than its last one, so every segment stays sorted.
+        """
+        first_ts = int(records["timestamp"][0])
+        if self.file is None or self.count >= self.max_records or first_ts < self.last_ts:
+            self._rotate(first_ts)
+        positions = np.arange(-self.count % INDEX_STRIDE, len(records), INDEX_STRIDE)
+        entries = np.empty(len(positions), INDEX_ENTRY)
+        entries["timestamp"] = records["timestamp"][positions]
+        entries["record"] = positions + self.count
+        self.file.write(records.tobytes())
+        self.index_file.write(entries.tobytes())
+        self.count += len(records)
+        self.last_ts = int(records["timestamp"][-1])
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.index_file.close()
+            self.file = self.index_file = None
+        if self.late is not None:
+            self.late.close()
+            self.late = None
+
+
+class SegmentStore:
+    """Stores readings as per-zone append-only segments under root
+
+    - insert_many() takes the same rows as SensorStore.insert_many();
+      each call is one write() per zone touched
+    - A process only appends to segments it created, a restarted writer
+      starts new ones, so there is no recovery step on open
+    - Readers see appended records after reload_partitions() (SensorApi
+      calls it per request); the writing instance sees its own at once
+    - Downsampled queries aggregate the mapped records on the fly, see
+      SegmentRollups
+    """
+    def __init__(self, root, max_records=SEGMENT_RECORDS):
+        self.root = root
+        self.max_records = max_records
+        os.makedirs(root, exist_ok=True)
+        self.segments: Dict[str, List[Segment]] = {}
+        self.appenders: Dict[str, ZoneAppender] = {}
+        self.stale = set()
+        # Segments are never pruned, kept for SensorApi's ETags like SensorStore's
+        self.pruned_before = 0
+        self.rollups = SegmentRollups(self)
+        self.reload_partitions()
+
+    def zone_dir(self, zone: str) -> str:
+        return os.path.join(self.root, quote(zone, safe=""))
+
+    def _scan_zone(self, zone: str):
+        directory = self.zone_dir(zone)
+        known = {segment.path: segment for segment in self.segments.get(zone, [])}
+        segments = []
+        for name in sorted((n for n in os.listdir(directory) if n.endswith(".seg")), key=_sort_key):
+            path = os.path.join(directory, name)
+            segment = known.get(path)
+            if segment is None:
+                segment = Segment(path)
+            else:
+                segment.refresh()
+            segments.append(segment)
+        self.segments[zone] = segments
+
+    def reload_partitions(self):
+        """Pick up zones, segments and records appended by other processes"""
+        for entry in os.scandir(self.root):
+            if entry.is_dir():
+                self._scan_zone(unquote(entry.name))
+        self.stale.clear()
+
+    def _sync(self):
+        for zone in self.stale:
+            self._scan_zone(zone)
+        self.stale.clear()
+
+    # ---------- Writes ----------
+    def insert_many(self, rows: Sequence[Sequence]):
+        """Append rows of (timestamp, zone, humidity, drought_alert, light, ph, rain, co2)
+
+        Timestamps may be ISO-8601 strings, datetimes or epoch-ms ints.
+        """
+        by_zone: Dict[str, list] = {}
+        for ts, zone, humidity, drought_alert, light, ph, rain, co2 in rows:
+            by_zone.setdefault(zone or DEFAULT_ZONE, []).append(
+                (to_epoch_ms(ts), humidity, int(bool(drought_alert)), light, ph, int(bool(rain)), co2))
+        for zone, batch in by_zone.items():
+            records = np.array(batch, dtype=RECORD)
+            if np.any(records["timestamp"][1:] < records["timestamp"][:-1]):
+                records = records[np.argsort(records["timestamp"], kind="stable")]
+            appender = self.appenders.get(zone)
+            if appender is None:
+                appender = self.appenders[zone] = ZoneAppender(self.zone_dir(zone), self.max_records)
+            appender.append(records)
+            self.stale.add(zone)
+
+    # ---------- Queries ----------
+    def slices(self, start_ms=None, end_ms=None, zone=None) -> List[np.ndarray]:
+        """Zero-copy views of the records in [start_ms, end_ms), one per segment"""
+        self._sync()
+        zones = [zone] if zone else list(self.segments)
+        views = []
+        for name in zones:
+            for segment in self.segments.get(name, []):
+                if not len(segment.records):
+                    continue
+                if (end_ms is not None and segment.first >= end_ms) or \
+                        (start_ms is not None and segment.last < start_ms):
+                    continue
+                view = segment.slice(start_ms, end_ms)
+                if len(view):
+                    views.append(view)
+        return views
+
+    @staticmethod
+    def _merged(views: List[np.ndarray], chunk_size: int) -> Iterator[np.ndarray]:
+        """Chunks of the views' records in timestamp order"""
+        views = sorted(views, key=lambda v: v["timestamp"][0])
+        if all(a["timestamp"][-1] <= b["timestamp"][0] for a, b in zip(views, views[1:])):
+            # Segments of one zone follow each other, slices of the maps need no copy
+            for view in views:
+                for i in range(0, len(view), chunk_size):
+                    yield view[i:i + chunk_size]
+            return
+        cursors = [0] * len(views)
+        while True:
+            live = [i for i, view in enumerate(views) if cursors[i] < len(view)]
+            if not live:
+                return
+            # Emit everything up to the earliest timestamp ending a chunk of some view
+            bound = min(views[i]["timestamp"][min(cursors[i] + chunk_size, len(views[i])) - 1]
+                        for i in live)
+            parts = []
+            for i in live:
+                stop = cursors[i] + int(np.searchsorted(
+                    views[i]["timestamp"][cursors[i]:], bound, side="right"))
+                parts.append(views[i][cursors[i]:stop])
+                cursors[i] = stop
+            chunk = np.concatenate(parts)
+            yield chunk[np.argsort(chunk["timestamp"], kind="stable")]
+
+    def iter_arrays(self, start, end, fields=None, zone=None, chunk_size=5000) -> Iterator[np.ndarray]:
+        """Yield structured arrays of up to chunk_size records per view, oldest first
+
+        Each array has a timestamp column followed by fields. Where the
+        range comes from one segment at a time they are views of the map.
+        """
+        names = _columns(fields)
+        for chunk in self._merged(self.slices(to_epoch_ms(start), to_epoch_ms(end), zone), chunk_size):
+            yield chunk[names]
+
+    def iter_chunks(self, start, end, fields=None, zone=None, chunk_size=5000):
+        """Yield lists of raw row tuples in [start, end), like SensorStore.iter_chunks"""
+        for chunk in self.iter_arrays(start, end, fields, zone, chunk_size):
+            yield chunk.tolist()
+
+    def iter_range(self, start, end, fields=None, zone=None, chunk_size=5000):
+        fields = _columns(fields)
+        for rows in self.iter_chunks(start, end, fields, zone, chunk_size):
+            for row in rows:
+                yield _to_record(fields, row)
+
+    def range(self, start, end, fields=None, zone=None) -> List[Dict[str, Any]]:
+        """Return readings with start <= timestamp < end, oldest first"""
+        return list(self.iter_range(start, end, fields, zone))
+
+    def latest(self, n=1, fields=None, zone=None) -> List[Dict[str, Any]]:
+        """Return the n most recent readings, oldest first"""
+        self._sync()
+        fields = _columns(fields)
+        if n <= 0:
+            return []
+        # Segments may overlap in time (late rows, restarts), so each one offers its newest n
+        tails = [segment.records[-n:]
+                 for name in ([zone] if zone else list(self.segments))
+                 for segment in self.segments.get(name, []) if len(segment.records)]
+        if not tails:
+            return []
+        records = np.concatenate(tails)
+        records = records[np.argsort(records["timestamp"], kind="stable")][-n:]
+        return [_to_record(fields, row) for row in records[fields].tolist()]
+
+    def bounds(self, zone=None) -> Optional[Tuple[int, int]]:
+        """(oldest, newest) stored timestamp, None if there are no readings"""
+        views = self.slices(zone=zone)
+        if not views:
+            return None
+        return (min(int(v["timestamp"][0]) for v in views),
+                max(int(v["timestamp"][-1]) for v in views))
+
+    def zone_counts(self, start, end) -> Dict[str, int]:
+        """Number of readings per zone in [start, end)"""
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        self._sync()
+        counts = {}
+        for zone in self.segments:
+            count = sum(len(v) for v in self.slices(start_ms, end_ms, zone))
+            if count:
+                counts[zone] = count
+        return counts
+
+    def count(self, start_ms, end_ms, zone=None) -> int:
+        return sum(len(v) for v in self.slices(start_ms, end_ms, zone))
+
+    def downsampled(self, start, end, fields=None, max_points=500, zone=None,
+                    resolution=None) -> Dict[str, Any]:
+        """Return min/max/mean points for [start, end), aggregated from the mapped records"""
+        return self.rollups.query(start, end, fields, max_points, zone, resolution)
+
+    def close(self):
+        for appender in self.appenders.values():
+            appender.close()
+        self.appenders.clear()
+
+
+class SegmentRollups:
+    """RollupManager's query interface, computed from the segments on demand
+
+    Nothing is maintained at write time; a query reduces the mapped
+    records of its range with NumPy, grouped by bucket, one segment
+    slice of at most ROLLUP_CHUNK records at a time.
+    """
+    def __init__(self, store: SegmentStore):
+        self.store = store
+
+    def count(self, start, end, zone=None) -> int:
+        """Rows in the 1-minute buckets overlapping [start, end), used as a version number"""
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        step = RESOLUTIONS["1m"]
+        return self.store.count(start_ms - start_ms % step, _ceil(end_ms, step), zone)
+
+    def pick_resolution(self, start_ms, end_ms, max_points, zone=None) -> str:
+        """Return "raw" or the finest resolution whose point count fits the budget"""
+        # Counted in whole minutes, as RollupManager does from its 1-minute buckets
+        if self.count(start_ms, end_ms, zone) <= max_points:
+            return "raw"
+        for resolution, step in RESOLUTIONS.items():
+            if (end_ms - start_ms) / step <= max_points:
+                return resolution
+        return list(RESOLUTIONS)[-1]
+
+    def query(self, start, end, fields=None, max_points=500, zone=None, resolution=None) -> Dict[str, Any]:
+        """Same result shape as RollupManager.query"""
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        fields = list(fields) if fields else list(ROLLUP_FIELDS)
+        unknown = [f for f in fields if f not in ROLLUP_FIELDS]
+        if unknown:
+            raise ValueError(f"Fields without rollups: {', '.join(unknown)}")
+
+        if resolution is None:
+            resolution = self.pick_resolution(start_ms, end_ms, max_points, zone)
+        elif resolution != "raw" and resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        if resolution == "raw":
+            points = []
+            for record in self.store.iter_range(start_ms, end_ms, fields, zone):
+                point = {"timestamp": record["timestamp"], "count": 1}
+                for field in fields:
+                    point[f"{field}_min"] = point[f"{field}_max"] = point[f"{field}_mean"] = record[field]
+                points.append(point)
+            return {"resolution": "raw", "step_ms": None, "points": points}
+
+        step = RESOLUTIONS[resolution]
+        # Whole buckets, including the ones straddling start and end
+        return {
+            "resolution": resolution,
+            "step_ms": step,
+            "points": self._points(start_ms - start_ms % step, _ceil(end_ms, step), step, fields, zone),
+        }
+
+    def _points(self, start_ms, end_ms, step, fields, zone) -> List[Dict[str, Any]]:
+        # bucket -> [count, then min, max, sum per field], merged across chunks and segments
+        totals: Dict[int, list] = {}
+        for view in self.store.slices(start_ms, end_ms, zone):
+            for offset in range(0, len(view), ROLLUP_CHUNK):
+                chunk = view[offset:offset + ROLLUP_CHUNK]
+                timestamps = chunk["timestamp"]
+                buckets = timestamps - timestamps % step
+                # Segments are sorted, so each bucket is one run of records
+                starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+                stats = [buckets[starts].tolist(), np.diff(np.append(starts, len(buckets))).tolist()]
+                for field in fields:
+                    values = chunk[field]
+                    stats += [np.minimum.reduceat(values, starts).tolist(),
+                              np.maximum.reduceat(values, starts).tolist(),
+                              np.add.reduceat(values, starts).tolist()]
+                for bucket, *agg in zip(*stats):
+                    current = totals.get(bucket)
+                    if current is None:
+                        totals[bucket] = agg
+                        continue
+                    current[0] += agg[0]
+                    for base in range(1, len(agg), 3):
+                        current[base] = min(current[base], agg[base])
+                        current[base + 1] = max(current[base + 1], agg[base + 1])
+                        current[base + 2] += agg[base + 2]
+        points = []
+        for bucket in sorted(totals):
+            count, *agg = totals[bucket]
+            point = {"timestamp": bucket, "count": count}
+            for i, field in enumerate(fields):
+                low, high, total = agg[3 * i:3 * i + 3]
+                point[f"{field}_min"] = low
+                point[f"{field}_max"] = high
+                point[f"{field}_mean"] = round(total / count, 2)
+            points.append(point)
+        return points
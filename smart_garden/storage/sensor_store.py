@@ -0,0 +1,339 @@
+"""Time-partitioned SQLite storage for sensor readings"""
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+from .timestamps import to_epoch_ms, from_epoch_ms
+from .rollups import RollupManager
+
+DEFAULT_ZONE = "default"
+SCHEMA_VERSION = 2
+
+# Payload field name -> column name
+FIELDS = {
+    "timestamp": "Ts",
+    "zone": "Zone",
+    "humidity": "Humidity",
+    "drought_alert": "DroughtAlert",
+    "light": "Light",
+    "ph": "PH",
+    "rain": "Rain",
+    "co2": "CO2",
+}
+SENSOR_FIELDS = ("humidity", "drought_alert", "light", "ph", "rain", "co2")
+BOOL_FIELDS = ("drought_alert", "rain")
+
+PARTITION_FORMATS = {
+    "day": "%Y%m%d",
+    "month": "%Y%m",
+}
+
+
+class SensorStore:
+    """Stores readings in per-day or per-month tables indexed by epoch-ms timestamp
+
+    - Each partition is a table SensorData_<YYYYMM> or SensorData_<YYYYMMDD>
+    - SensorPartitions lists every partition with its time bounds so range
+      queries only touch the tables that overlap the requested window
+    - Rows carry a Zone column so several gardens can share one file
+    - 1-minute and 1-hour rollups are updated in the same transaction as
+      every insert, see storage.rollups
+    - pruned_before: raw rows older than this were deleted by
+      delete_range(), only their rollups remain (0 if nothing was pruned)
+    - readonly=True opens an existing store without touching it: no
+      journal mode change, table creation, rollup backfill or migration.
+      Pass a read-only conn, e.g. connect("file:<path>?mode=ro", uri=True)
+    """
+    def __init__(self, db_path, partition="month", conn=None, readonly=False):
+        self.conn = conn or sqlite3.connect(db_path, check_same_thread=False)
+        self.readonly = readonly
+        if not readonly:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL only fsyncs at checkpoints, still safe against app crashes
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_catalog(partition)
+        elif self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'SensorMeta'").fetchone() is None:
+            raise ValueError(f"{db_path} is not a partitioned sensor store, open it writable once to migrate it")
+        self.partition = self.conn.execute(
+            "SELECT Value FROM SensorMeta WHERE Key = 'partition'").fetchone()[0]
+        self.reload_partitions()
+        self.rollups = RollupManager(self, create=not readonly)
+        if self.rollups.created and self._partitions:
+            self.rollups.backfill()
+        self.migrated_rows = self.migrate_legacy() if not readonly and self._has_legacy_table() else 0
+
+    def _create_catalog(self, partition):
+        """Create the metadata and partition catalog tables"""
+        if partition not in PARTITION_FORMATS:
+            raise ValueError(f"Unknown partition granularity: {partition}")
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS SensorMeta (
+                    Key TEXT PRIMARY KEY,
+                    Value TEXT NOT NULL
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS SensorPartitions (
+                    Name TEXT PRIMARY KEY,
+                    StartTs INTEGER NOT NULL,
+                    EndTs INTEGER NOT NULL
+                )
+            ''')
+            # The first granularity wins, mixing them would overlap partitions
+            self.conn.execute(
+                "INSERT OR IGNORE INTO SensorMeta (Key, Value) VALUES ('partition', ?)",
+                (partition,))
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # ---------- Partitions ----------
+    def partition_bounds(self, ts_ms: int):
+        """Return (name, start_ms, end_ms) of the partition holding ts_ms"""
+        moment = from_epoch_ms(ts_ms)
+        if self.partition == "day":
+            start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+            end = datetime.fromordinal(start.toordinal() + 1).replace(tzinfo=timezone.utc)
+        else:
+            start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            if start.month == 12:
+                end = start.replace(year=start.year + 1, month=1)
+            else:
+                end = start.replace(month=start.month + 1)
+        name = "SensorData_" + start.strftime(PARTITION_FORMATS[self.partition])
+        return name, to_epoch_ms(start), to_epoch_ms(end)
+
+    def _ensure_partition(self, ts_ms: int) -> str:
+        """Create the partition table for ts_ms if it does not exist yet"""
+        name, start, end = self.partition_bounds(ts_ms)
+        if name in self._partitions:
+            return name
+        self.conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                Ts INTEGER NOT NULL,
+                Zone TEXT NOT NULL DEFAULT '{DEFAULT_ZONE}',
+                Humidity REAL NOT NULL,
+                DroughtAlert INTEGER NOT NULL,
+                Light REAL NOT NULL,
+                PH REAL NOT NULL,
+                Rain INTEGER NOT NULL,
+                CO2 REAL NOT NULL
+            )
+        ''')
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_ts ON {name} (Ts)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_zone_ts ON {name} (Zone, Ts)")
+        self.conn.execute(
+            "INSERT OR IGNORE INTO SensorPartitions (Name, StartTs, EndTs) VALUES (?, ?, ?)",
+            (name, start, end))
+        self._partitions[name] = (start, end)
+        return name
+
+    def reload_partitions(self):
+        """Re-read the partition catalog, picks up tables another process created or pruned"""
+        self._partitions = {
+            name: (start, end) for name, start, end in self.conn.execute(
+                "SELECT Name, StartTs, EndTs FROM SensorPartitions")
+        }
+        row = self.conn.execute("SELECT Value FROM SensorMeta WHERE Key = 'pruned_before'").fetchone()
+        self.pruned_before = int(row[0]) if row else 0
+
+    def partitions(self, start_ms=None, end_ms=None) -> List[str]:
+        """Return partition names overlapping [start_ms, end_ms), oldest first"""
+        return [
+            name for name, (start, end) in sorted(self._partitions.items(), key=lambda p: p[1][0])
+            if (end_ms is None or start < end_ms) and (start_ms is None or end > start_ms)
+        ]
+
+    # ---------- Writes ----------
+    def insert_many(self, rows: Iterable[Sequence]):
+        """Insert rows of (timestamp, zone, humidity, drought_alert, light, ph, rain, co2)
+
+        Timestamps may be ISO-8601 strings, datetimes or epoch-ms ints.
+        All rows are written in one transaction.
+        """
+        with self.conn:
+            self._insert_rows(rows)
+
+    def _insert_rows(self, rows: Iterable[Sequence]):
+        """Group rows by partition and insert them inside the caller's transaction"""
+        grouped: Dict[str, List[tuple]] = {}
+        normalized = []
+        for ts, zone, humidity, drought_alert, light, ph, rain, co2 in rows:
+            ts_ms = to_epoch_ms(ts)
+            name = self._ensure_partition(ts_ms)
+            row = (ts_ms, zone or DEFAULT_ZONE, humidity, int(bool(drought_alert)),
+                   light, ph, int(bool(rain)), co2)
+            grouped.setdefault(name, []).append(row)
+            normalized.append(row)
+        self.rollups.update(normalized)
+        for name, batch in grouped.items():
+            self.conn.executemany(f'''
+                INSERT INTO {name} (Ts, Zone, Humidity, DroughtAlert, Light, PH, Rain, CO2)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+
+    # ---------- Queries ----------
+    def _columns(self, fields: Optional[Sequence[str]]) -> List[str]:
+        """Validate requested fields, always including the timestamp"""
+        fields = list(fields) if fields else list(SENSOR_FIELDS)
+        unknown = [f for f in fields if f not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if "timestamp" not in fields:
+            fields.insert(0, "timestamp")
+        return fields
+
+    @staticmethod
+    def _to_record(fields, row) -> Dict[str, Any]:
+        """Build a payload-style dict from a result row"""
+        record = dict(zip(fields, row))
+        for name in BOOL_FIELDS:
+            if name in record:
+                record[name] = bool(record[name])
+        return record
+
+    def range(self, start, end, fields=None, zone=None) -> List[Dict[str, Any]]:
+        """Return readings with start <= timestamp < end, oldest first
+
+        Timestamps in the result are epoch milliseconds.
+        """
+        return list(self.iter_range(start, end, fields, zone))
+
+    def iter_range(self, start, end, fields=None, zone=None, chunk_size=5000):
+        """Yield readings in [start, end) partition by partition, oldest first"""
+        fields = self._columns(fields)
+        for rows in self.iter_chunks(start, end, fields, zone, chunk_size):
+            for row in rows:
+                yield self._to_record(fields, row)
+
+    def iter_chunks(self, start, end, fields=None, zone=None, chunk_size=5000):
+        """Yield lists of up to chunk_size raw row tuples in [start, end), oldest first
+
+        Columns are timestamp followed by fields. Meant for consumers that
+        convert a whole chunk at once (e.g. to NumPy) and do not need a
+        dict per row; memory stays bounded by chunk_size.
+        """
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        columns = ", ".join(FIELDS[f] for f in self._columns(fields))
+        zone_clause = " AND Zone = ?" if zone else ""
+        for name in self.partitions(start_ms, end_ms):
+            params = [start_ms, end_ms] + ([zone] if zone else [])
+            cursor = self.conn.execute(
+                f"SELECT {columns} FROM {name} WHERE Ts >= ? AND Ts < ?{zone_clause} ORDER BY Ts",
+                params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def bounds(self, zone=None) -> Optional[Tuple[int, int]]:
+        """(oldest, newest) stored timestamp, None if there are no readings"""
+        zone_clause = " WHERE Zone = ?" if zone else ""
+        params = [zone] if zone else []
+        lows, highs = [], []
+        for name in self.partitions():
+            low, high = self.conn.execute(
+                f"SELECT MIN(Ts), MAX(Ts) FROM {name}{zone_clause}", params).fetchone()
+            if low is not None:
+                lows.append(low)
+                highs.append(high)
+        return (min(lows), max(highs)) if lows else None
+
+    def zone_counts(self, start, end) -> Dict[str, int]:
+        """Number of readings per zone in [start, end)"""
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        counts: Dict[str, int] = {}
+        for name in self.partitions(start_ms, end_ms):
+            for zone, count in self.conn.execute(
+                    f"SELECT Zone, COUNT(*) FROM {name} WHERE Ts >= ? AND Ts < ? GROUP BY Zone",
+                    (start_ms, end_ms)):
+                counts[zone] = counts.get(zone, 0) + count
+        return counts
+
+    def latest(self, n=1, fields=None, zone=None) -> List[Dict[str, Any]]:
+        """Return the n most recent readings, oldest first"""
+        fields = self._columns(fields)
+        columns = ", ".join(FIELDS[f] for f in fields)
+        zone_clause = " WHERE Zone = ?" if zone else ""
+        rows = []
+        for name in reversed(self.partitions()):
+            params = ([zone] if zone else []) + [n - len(rows)]
+            rows.extend(self.conn.execute(
+                f"SELECT {columns} FROM {name}{zone_clause} ORDER BY Ts DESC LIMIT ?",
+                params).fetchall())
+            if len(rows) >= n:
+                break
+        return [self._to_record(fields, row) for row in reversed(rows)]
+
+    def downsampled(self, start, end, fields=None, max_points=500, zone=None,
+                    resolution=None) -> Dict[str, Any]:
+        """Return min/max/mean points for [start, end) from the best-fitting rollup"""
+        return self.rollups.query(start, end, fields, max_points, zone, resolution)
+
+    # ---------- Retention ----------
+    def delete_range(self, start, end, expected=None) -> int:
+        """Delete raw readings in [start, end), rollups are kept
+
+        Partitions lying entirely inside the range are dropped instead of
+        emptied. With expected set, nothing is deleted unless exactly that
+        many rows are in the range, e.g. the number just archived. end
+        becomes the pruned_before watermark if it is later than the
+        current one, so queries stop expecting raw rows before it.
+        """
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        with self.conn:
+            if expected is not None:
+                found = sum(self.zone_counts(start_ms, end_ms).values())
+                if found != expected:
+                    raise RuntimeError(f"Expected {expected} rows in range, found {found}")
+            deleted = 0
+            for name in self.partitions(start_ms, end_ms):
+                part_start, part_end = self._partitions[name]
+                if start_ms <= part_start and part_end <= end_ms:
+                    deleted += self.conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                    self.conn.execute(f"DROP TABLE {name}")
+                    self.conn.execute("DELETE FROM SensorPartitions WHERE Name = ?", (name,))
+                    del self._partitions[name]
+                else:
+                    deleted += self.conn.execute(
+                        f"DELETE FROM {name} WHERE Ts >= ? AND Ts < ?", (start_ms, end_ms)).rowcount
+            row = self.conn.execute("SELECT Value FROM SensorMeta WHERE Key = 'pruned_before'").fetchone()
+            self.pruned_before = max(int(row[0]) if row else 0, end_ms)
+            self.conn.execute("INSERT OR REPLACE INTO SensorMeta (Key, Value) VALUES ('pruned_before', ?)",
+                              (str(self.pruned_before),))
+        return deleted
+
+    def vacuum(self):
+        """Give the space of deleted rows back to the file system"""
+        self.conn.execute("VACUUM")
+
+    # ---------- Migration ----------
+    def _has_legacy_table(self) -> bool:
+        """Check for the flat SensorData table with TEXT timestamps"""
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'SensorData'"
+        ).fetchone() is not None
+
+    def migrate_legacy(self, chunk_size=5000) -> int:
+        """Move rows from the flat SensorData table into partitions
+
+        Runs in a single transaction, so an interrupted migration leaves
+        the legacy table untouched.
+        """
+        migrated = 0
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT Timestamp, Humidity, DroughtAlert, Light, PH, Rain, CO2 FROM SensorData ORDER BY ID")
+        with self.conn:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                self._insert_rows((ts, DEFAULT_ZONE) + tuple(rest) for ts, *rest in rows)
+                migrated += len(rows)
+            self.conn.execute("DROP TABLE SensorData")
+        return migrated
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
@@ -0,0 +1,18 @@
+"""Timestamp conversion helpers shared by the storage backends"""
+from datetime import datetime, timezone
+
+
+def to_epoch_ms(value) -> int:
+    """Convert an ISO-8601 string, datetime or epoch-ms int to epoch milliseconds"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+
+def from_epoch_ms(ts_ms: int) -> datetime:
+    """Convert epoch milliseconds to an aware UTC datetime"""
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
@@ -0,0 +1,42 @@
+import time
+from controllers.actuator_scheduler import ActuatorScheduler
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_reactivation_during_expiry_keeps_the_actuator_on():
+    events = []
+    scheduler = ActuatorScheduler(lambda a: events.append(("off", a)), on_start=lambda a: events.append(("on", a)))
+    assert scheduler.activate("pump", 0.05) is True
+    with scheduler.switching:
+        # The worker pops the deadline, then waits for the lock before publishing OFF
+        assert wait_for(lambda: not scheduler.is_active("pump"))
+        assert scheduler.activate("pump", 10) is True
+    time.sleep(0.05)
+    assert events == [("on", "pump"), ("on", "pump")]
+    assert scheduler.is_active("pump")
+    scheduler.stop()
+    assert events[-1] == ("off", "pump")
+
+
+def test_activate_reports_whether_the_window_moved():
+    scheduler = ActuatorScheduler(lambda a: None)
+    assert scheduler.activate("light", 10) is True
+    assert scheduler.activate("light", 20) is False
+    assert scheduler.activate("light", 5) is None
+    scheduler.stop(switch_off=False)
+
+
+def test_expired_actuator_is_switched_off_once():
+    events = []
+    scheduler = ActuatorScheduler(events.append)
+    scheduler.activate("pump", 0.01)
+    assert wait_for(lambda: events == ["pump"])
+    assert not scheduler.is_active("pump")
+    scheduler.stop()
+    assert events == ["pump"]
@@ -0,0 +1,25 @@
+from collections import Counter
+from benchmarks.anomaly_bench import simulator_readings
+from config import ANOMALY_FIELDS
+from controllers.anomaly_detector import AnomalyDetector
+
+
+def test_simulator_output_is_rarely_flagged():
+    detector = AnomalyDetector(ANOMALY_FIELDS)
+    readings = simulator_readings(18000, 10, seed=1)
+    kinds = Counter(flag["field"] for reading in readings for flag in detector.check(reading))
+    assert kinds["humidity"] == 0
+    assert sum(kinds.values()) / len(readings) < 0.001
+
+
+def test_stuck_probe_stays_untrusted_for_the_whole_run():
+    detector = AnomalyDetector({"ph": {"min": 0, "max": 14, "max_rate": None, "stuck": 5}})
+    kinds, ongoing = [], []
+    for i in range(12):
+        value = 6.5 if i < 10 else 6.5 + i / 10
+        flags = detector.check({"zone": "bed", "ph": value})
+        kinds.append(flags[0]["kind"] if flags else None)
+        ongoing.append(flags[0]["ongoing"] if flags else None)
+    # Readings 0-4 build the run, 5-9 repeat the value at least 5 times
+    assert kinds == [None] * 5 + ["stuck"] * 5 + [None, None]
+    assert ongoing[5:10] == [False, True, True, True, True]
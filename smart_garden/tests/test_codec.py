@@ -0,0 +1,10 @@
+from datetime import datetime, timezone
+from messaging.codec import FORMAT_BINARY, decode_payload, encode_payload
+
+
+def test_naive_timestamps_are_utc_in_binary_payloads():
+    naive = datetime(2024, 5, 1, 12, 30)
+    raw = encode_payload({"timestamp": naive, "humidity": 41.5}, FORMAT_BINARY)
+    decoded = decode_payload(raw)
+    assert decoded["timestamp"] == naive.replace(tzinfo=timezone.utc)
+    assert decoded["humidity"] == 41.5
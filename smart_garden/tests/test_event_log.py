@@ -0,0 +1,17 @@
+from monitoring import EventLog
+
+
+def test_repeats_of_an_event_key_are_suppressed(caplog):
+    log = EventLog("test.events", interval=60)
+    for value in range(1000):
+        log.info("⚡ Rule fired", key=("bed", "low_humidity"), value=value)
+    assert len(caplog.records) == 1
+    assert len(log.last) == 1
+
+
+def test_tracked_keys_are_capped():
+    log = EventLog("test.keys", interval=60, max_keys=100)
+    for value in range(1000):
+        log.info("⚡ Rule fired", key=value)
+    assert len(log.last) <= 100
+    assert ("⚡ Rule fired", 999) in log.last
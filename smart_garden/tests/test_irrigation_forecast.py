@@ -0,0 +1,36 @@
+import random
+from datetime import datetime, timedelta, timezone
+from controllers.irrigation_forecast import IrrigationForecaster
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+THRESHOLD = 30
+
+
+def run(humidity, rain_rate=0.0, seed=0, readings=1800):
+    """Feed readings every 2s, return (reading number, humidity) of each forecast command"""
+    rng = random.Random(seed)
+    forecaster = IrrigationForecaster(threshold=THRESHOLD)
+    commands = []
+    for i in range(readings):
+        value = humidity(i, rng)
+        reading = {"timestamp": START + timedelta(seconds=2 * i), "zone": "bed",
+                   "humidity": round(value, 1), "rain": rng.random() < rain_rate}
+        for _, command in forecaster.evaluate(reading, now=2 * i):
+            assert command["action"] == "water"
+            commands.append((i, value))
+    return commands
+
+
+def test_stationary_noise_never_waters():
+    # What the simulators produce: a fresh draw from 20-80% every reading
+    for seed in range(5):
+        for rain_rate in (0.0, 0.1):
+            assert run(lambda i, rng: rng.uniform(20, 80), rain_rate, seed) == []
+
+
+def test_drying_trend_waters_before_the_threshold():
+    # 20%/h from 70% with sensor noise, crosses 30% after two hours
+    commands = run(lambda i, rng: 70 - 20 / 3600 * 2 * i + rng.gauss(0, 1), readings=3600)
+    assert commands
+    _, humidity = commands[0]
+    assert THRESHOLD < humidity < THRESHOLD + 5
@@ -0,0 +1,11 @@
+import socket
+from monitoring import serve_metrics
+
+
+def test_taken_port_is_logged_not_raised(caplog):
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+        assert serve_metrics(port, host="127.0.0.1") is None
+    assert "Metrics endpoint not started" in caplog.text
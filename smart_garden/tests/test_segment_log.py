@@ -0,0 +1,86 @@
+import os
+import random
+from storage.rollups import RESOLUTIONS
+from storage.segment_log import SegmentStore
+
+START_MS = 1_700_000_000_000
+
+
+def rows(timestamps, zone="bed"):
+    return [(ts, zone, float(ts % 97), ts % 2 == 0, float(ts % 1000), 6.5, False, 400.0)
+            for ts in timestamps]
+
+
+def segment_files(root, zone="bed"):
+    return sorted(name for name in os.listdir(os.path.join(root, zone)) if name.endswith(".seg"))
+
+
+def timestamps(store, start=START_MS, end=START_MS + 10**9, zone=None):
+    return [record["timestamp"] for record in store.range(start, end, ["timestamp"], zone)]
+
+
+def test_appended_rows_survive_a_reopen(tmp_path):
+    root = str(tmp_path)
+    store = SegmentStore(root)
+    store.insert_many(rows(range(START_MS, START_MS + 100_000, 1000)))
+    store.close()
+
+    reopened = SegmentStore(root)
+    assert timestamps(reopened) == list(range(START_MS, START_MS + 100_000, 1000))
+    # A restarted writer starts a segment of its own
+    reopened.insert_many(rows(range(START_MS + 100_000, START_MS + 150_000, 1000)))
+    assert len(segment_files(root)) == 2
+    assert timestamps(reopened) == list(range(START_MS, START_MS + 150_000, 1000))
+    assert reopened.latest(1)[0]["timestamp"] == START_MS + 149_000
+    reopened.close()
+
+
+def test_full_segments_rotate_and_ranges_span_them(tmp_path):
+    store = SegmentStore(str(tmp_path), max_records=100)
+    for batch in range(7):
+        store.insert_many(rows(range(START_MS + batch * 50_000, START_MS + (batch + 1) * 50_000, 1000)))
+    assert len(segment_files(str(tmp_path))) == 4
+    start, end = START_MS + 73_000, START_MS + 281_000
+    assert timestamps(store, start, end) == list(range(start, end, 1000))
+    assert store.zone_counts(start, end) == {"bed": 208}
+    store.close()
+
+
+def test_out_of_order_batches_use_one_late_segment(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    expected = []
+    for batch in range(20):
+        current = range(START_MS + 1_000_000 + batch * 10_000, START_MS + 1_000_000 + (batch + 1) * 10_000, 1000)
+        # Each batch also carries readings that arrived late, older than the segment's last one
+        late = range(START_MS + batch * 10_000, START_MS + batch * 10_000 + 3000, 1000)
+        mixed = rows(list(current) + list(late))
+        random.Random(batch).shuffle(mixed)
+        store.insert_many(mixed)
+        expected += list(current) + list(late)
+    assert len(segment_files(str(tmp_path))) == 2
+    assert timestamps(store) == sorted(expected)
+    assert store.latest(3, ["timestamp"]) == [{"timestamp": ts} for ts in sorted(expected)[-3:]]
+    store.close()
+
+
+def test_rollups_match_the_raw_rows(tmp_path):
+    store = SegmentStore(str(tmp_path), max_records=500)
+    stamps = [START_MS + i * 7_000 for i in range(3000)]
+    random.Random(0).shuffle(stamps)
+    for i in range(0, len(stamps), 250):
+        store.insert_many(rows(sorted(stamps[i:i + 250])) + rows(sorted(stamps[i:i + 250]), zone="pot"))
+    start, end = START_MS + 30_000, START_MS + 15_000_000
+    step = RESOLUTIONS["1m"]
+    result = store.downsampled(start, end, ["humidity"], zone="bed", resolution="1m")
+    buckets = {}
+    for ts in stamps:
+        bucket = ts - ts % step
+        if start - start % step <= bucket < end:
+            buckets.setdefault(bucket, []).append(float(ts % 97))
+    assert [p["timestamp"] for p in result["points"]] == sorted(buckets)
+    for point in result["points"]:
+        values = buckets[point["timestamp"]]
+        assert point["count"] == len(values)
+        assert (point["humidity_min"], point["humidity_max"]) == (min(values), max(values))
+        assert point["humidity_mean"] == round(sum(values) / len(values), 2)
+    store.close()
@@ -0,0 +1,95 @@
+import sqlite3
+import pytest
+from storage.sensor_store import SensorStore
+from web.api import SensorApi
+
+DAY_MS = 86_400_000
+START_MS = 1_700_000_000_000 - 1_700_000_000_000 % DAY_MS
+
+
+def fill(store, days, per_day=100):
+    step = DAY_MS // per_day
+    store.insert_many((START_MS + i * step, "bed", 50.0, False, 300.0, 6.5, False, 400.0)
+                      for i in range(days * per_day))
+
+
+def test_pruned_history_falls_back_to_rollups(tmp_path):
+    store = SensorStore(str(tmp_path / "garden.db"))
+    fill(store, 2)
+    api = SensorApi(store, max_points=500)
+    before = api.history_etag(START_MS, START_MS + 2 * DAY_MS)
+    assert api.history(START_MS, START_MS + 2 * DAY_MS)["resolution"] == "raw"
+
+    assert store.delete_range(START_MS, START_MS + DAY_MS, expected=100) == 100
+    result = api.history(START_MS, START_MS + 2 * DAY_MS)
+    assert result["resolution"] != "raw"
+    assert sum(result["columns"]["count"]) == 200
+    assert api.history_etag(START_MS, START_MS + 2 * DAY_MS) != before
+    # Ranges after the watermark still get raw rows
+    assert api.history(START_MS + DAY_MS, START_MS + 2 * DAY_MS)["resolution"] == "raw"
+
+
+def test_prune_watermark_is_seen_by_other_connections(tmp_path):
+    path = str(tmp_path / "garden.db")
+    store = SensorStore(path)
+    fill(store, 2)
+    reader = SensorStore(path)
+    store.delete_range(START_MS, START_MS + DAY_MS)
+    reader.reload_partitions()
+    assert reader.pruned_before == START_MS + DAY_MS
+
+
+def test_readonly_store_leaves_the_file_untouched(tmp_path):
+    path = tmp_path / "garden.db"
+    store = SensorStore(str(path))
+    fill(store, 1)
+    store.close()
+    for suffix in ("-wal", "-shm"):
+        assert not (tmp_path / f"garden.db{suffix}").exists()
+    before = path.read_bytes()
+
+    conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+    reader = SensorStore(str(path), conn=conn, readonly=True)
+    assert reader.bounds() == (START_MS, START_MS + 99 * DAY_MS // 100)
+    assert sum(len(rows) for rows in reader.iter_chunks(START_MS, START_MS + DAY_MS)) == 100
+    with pytest.raises(sqlite3.OperationalError):
+        reader.insert_many([(START_MS, "bed", 50.0, False, 300.0, 6.5, False, 400.0)])
+    reader.close()
+    assert path.read_bytes() == before
+
+
+def test_readonly_store_refuses_a_legacy_database(tmp_path):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE SensorData (ID INTEGER PRIMARY KEY, Timestamp TEXT)")
+    conn.close()
+    with pytest.raises(ValueError):
+        SensorStore(str(path), conn=sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True), readonly=True)
+    with sqlite3.connect(path) as conn:
+        assert [name for name, in conn.execute("SELECT name FROM sqlite_master")] == ["SensorData"]
+    conn.close()
+
+
+def test_raw_history_is_refused_over_the_point_budget(tmp_path):
+    store = SensorStore(str(tmp_path / "garden.db"))
+    fill(store, 2)
+    api = SensorApi(store, max_points=150, point_limit=1000)
+    assert api.history(START_MS, START_MS + DAY_MS, step="raw")["length"] == 100
+    with pytest.raises(ValueError):
+        api.history_etag(START_MS, START_MS + 2 * DAY_MS, step="raw")
+    with pytest.raises(ValueError):
+        api.history(START_MS, START_MS + 2 * DAY_MS, step="raw")
+    # A bigger budget can be asked for, up to point_limit
+    assert api.history(START_MS, START_MS + 2 * DAY_MS, step="raw", max_points=200)["length"] == 200
+    assert api.point_budget(10**9) == 1000
+
+
+def test_auto_resolution_counts_the_bucket_straddling_start(tmp_path):
+    store = SensorStore(str(tmp_path / "garden.db"))
+    # 100 readings in the first second of a minute, 50 more later on
+    store.insert_many([(START_MS + i, "bed", 50.0, False, 300.0, 6.5, False, 400.0) for i in range(100)]
+                      + [(START_MS + 60_000 + i, "bed", 50.0, False, 300.0, 6.5, False, 400.0)
+                         for i in range(50)])
+    # Starting mid-minute, the budget must still count the whole first bucket
+    assert store.rollups.pick_resolution(START_MS + 50, START_MS + 120_000, 100) == "1m"
+    assert store.rollups.pick_resolution(START_MS + 50, START_MS + 120_000, 150) == "raw"
@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("werkzeug")
+from web.users import UserStore
+
+
+def test_unknown_names_are_not_cached(tmp_path):
+    users = UserStore(str(tmp_path / "users.db"), hash_workers=1)
+    try:
+        for i in range(1000):
+            assert not users.exists(f"guess-{i}")
+        assert users.cache == {}
+        assert users.create("alice", "secret")
+        assert users.verify("alice", "secret")
+        assert users.delete("alice")
+        assert not users.exists("alice")
+        assert users.cache == {}
+    finally:
+        users.close()
@@ -0,0 +1,8 @@
+from .ring_buffer import RingBuffer
+from .decimation import MinMaxDecimator, decimate, envelope
+from .monitor_renderer import MonitorRenderer, mask_runs, span_verts
+from .replay import HistoryReplay, SqliteHistory, CsvHistory, open_history
+
+__all__ = ['RingBuffer', 'MinMaxDecimator', 'decimate', 'envelope',
+           'MonitorRenderer', 'mask_runs', 'span_verts',
+           'HistoryReplay', 'SqliteHistory', 'CsvHistory', 'open_history']
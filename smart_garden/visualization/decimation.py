@@ -0,0 +1,74 @@
+"""Min/max-per-pixel decimation of long sensor histories"""
+from typing import Dict, Iterable, Sequence
+import numpy as np
+
+
+class MinMaxDecimator:
+    """Folds chunks of readings into per-bin min/max without keeping the rows
+
+    The range [start_ms, end_ms) is split into `bins` equal buckets, one
+    per horizontal pixel. Drawing each bucket's min and max as a vertical
+    segment gives the same picture as plotting every row, so memory and
+    drawing cost depend on the plot width, not on the number of rows.
+    Flag fields keep whether any reading in the bucket was set.
+    """
+    def __init__(self, start_ms: int, end_ms: int, bins: int,
+                 fields: Sequence[str], flags: Sequence[str] = ()):
+        self.start = start_ms
+        self.end = end_ms
+        self.bins = max(1, int(bins))
+        self.fields = list(fields)
+        self.flags = list(flags)
+        self.count = np.zeros(self.bins, np.int64)
+        self.low = {field: np.full(self.bins, np.inf) for field in self.fields}
+        self.high = {field: np.full(self.bins, -np.inf) for field in self.fields}
+        self.any = {flag: np.zeros(self.bins, bool) for flag in self.flags}
+        self.rows = 0
+
+    def add(self, chunk: Dict[str, np.ndarray]):
+        """Fold one chunk of columns (ts in epoch ms plus the fields) in"""
+        ts = np.asarray(chunk["ts"], np.int64)
+        keep = (ts >= self.start) & (ts < self.end)
+        if not keep.all():
+            ts = ts[keep]
+            chunk = {name: np.asarray(values)[keep] for name, values in chunk.items()}
+        if not len(ts):
+            return
+        index = (ts - self.start) * self.bins // (self.end - self.start)
+        np.add.at(self.count, index, 1)
+        for field in self.fields:
+            values = np.asarray(chunk[field], np.float64)
+            np.minimum.at(self.low[field], index, values)
+            np.maximum.at(self.high[field], index, values)
+        for flag in self.flags:
+            np.logical_or.at(self.any[flag], index, np.asarray(chunk[flag], bool))
+        self.rows += len(ts)
+
+    def result(self) -> Dict[str, np.ndarray]:
+        """Non-empty buckets: ts (bucket centre, epoch ms), count, <field>_min/_max, flags"""
+        hit = np.flatnonzero(self.count)
+        width = (self.end - self.start) / self.bins
+        result = {
+            "ts": self.start + (hit + 0.5) * width,
+            "count": self.count[hit],
+        }
+        for field in self.fields:
+            result[f"{field}_min"] = self.low[field][hit]
+            result[f"{field}_max"] = self.high[field][hit]
+        for flag in self.flags:
+            result[flag] = self.any[flag][hit]
+        return result
+
+
+def decimate(chunks: Iterable[Dict[str, np.ndarray]], start_ms, end_ms, bins,
+             fields: Sequence[str], flags: Sequence[str] = ()) -> Dict[str, np.ndarray]:
+    """Stream chunks through a MinMaxDecimator and return its result"""
+    decimator = MinMaxDecimator(start_ms, end_ms, bins, fields, flags)
+    for chunk in chunks:
+        decimator.add(chunk)
+    return decimator.result()
+
+
+def envelope(ts: np.ndarray, low: np.ndarray, high: np.ndarray):
+    """Interleave min and max so one line draws a vertical segment per bucket"""
+    return np.repeat(ts, 2), np.column_stack((low, high)).ravel()
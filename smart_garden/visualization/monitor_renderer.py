@@ -0,0 +1,153 @@
+"""Blitting renderer for the live humidity / light monitor"""
+from typing import Dict, Optional, Tuple
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+from matplotlib.dates import DateFormatter
+from matplotlib.patches import Patch
+
+SECONDS_PER_DAY = 86400.0
+
+
+def mask_runs(mask: np.ndarray) -> np.ndarray:
+    """(start, stop) index pairs of the True runs in a boolean array"""
+    padded = np.concatenate(([False], mask, [False]))
+    return np.flatnonzero(padded[1:] != padded[:-1]).reshape(-1, 2)
+
+
+def span_verts(ts: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """One rectangle per run of flagged samples, in (data x, axes y) coordinates
+
+    Sample i covers ts[i] to ts[i + 1] like the old per-sample axvspan, so
+    a run of n samples becomes a single patch instead of n.
+    """
+    runs = mask_runs(mask)
+    if not len(runs):
+        return np.empty((0, 4, 2))
+    x0 = ts[runs[:, 0]]
+    x1 = ts[np.minimum(runs[:, 1], len(ts) - 1)]
+    verts = np.empty((len(runs), 4, 2))
+    verts[:, :, 0] = np.stack([x0, x0, x1, x1], axis=1)
+    verts[:, :, 1] = (0, 1, 1, 0)
+    return verts
+
+
+class MonitorRenderer:
+    """Draws humidity and light from a RingBuffer, creating every artist once
+
+    Each tick only replaces line data and span vertices and blits the
+    animated artists onto a cached background. The x-limits are moved
+    ahead in steps, so the full figure (ticks, labels, grid) is only
+    redrawn when the newest sample runs past the right edge.
+
+    The buffer needs columns ts (matplotlib date numbers), humidity,
+    light, drought_alert and daytime. With follow=False the x-limits are
+    left to the caller, e.g. for replaying a fixed range.
+    """
+    def __init__(self, buffer, window_seconds: float, drought_threshold=30, headroom=0.05, follow=True):
+        self.buffer = buffer
+        self.follow = follow
+        self.window = window_seconds / SECONDS_PER_DAY
+        self.headroom = headroom
+        self.xlim: Optional[Tuple[float, float]] = None
+        self.background = None
+
+        plt.style.use('ggplot')
+        self.fig, (self.ax_humidity, self.ax_light) = plt.subplots(2, 1, figsize=(12, 8))
+        self.canvas = self.fig.canvas
+
+        # --- Plot 1: Humidity with drought alerts ---
+        ax = self.ax_humidity
+        self.humidity_line, = ax.plot([], [], 'b-', linewidth=2, label='Humidity', animated=True)
+        ax.axhline(y=drought_threshold, color='r', linestyle='--', label='Drought Threshold')
+        self.drought_spans = self._spans(ax, color='red', alpha=0.3)
+        ax.set_title(f'Garden Humidity Monitoring (Drought Alert when <{drought_threshold}%)')
+        ax.set_ylabel('Humidity (%)')
+        ax.set_ylim(0, 100)
+        ax.legend(handles=[
+            Patch(facecolor='red', alpha=0.3, label='Drought Alert'),
+            Patch(facecolor='none', edgecolor='r', linestyle='--', label='Threshold')
+        ], loc='upper right')
+
+        # --- Plot 2: Light Levels with Day/Night indication ---
+        ax = self.ax_light
+        self.day_spans = self._spans(ax, color='yellow', alpha=0.1)
+        self.night_spans = self._spans(ax, color='blue', alpha=0.1)
+        self.light_line, = ax.plot([], [], color='orange', linewidth=2, label='Light Level', animated=True)
+        ax.set_title('Light Level Monitoring (Day/Night Cycle)')
+        ax.set_ylabel('Light (lux)')
+        ax.set_ylim(-50, 1100)  # Slightly below 0 to see markers clearly
+        ax.legend(handles=[
+            Patch(facecolor='yellow', alpha=0.1, label='Daytime (6:00-18:00)'),
+            Patch(facecolor='blue', alpha=0.1, label='Nighttime')
+        ], loc='upper right')
+
+        date_form = DateFormatter("%H:%M:%S")
+        for ax in (self.ax_humidity, self.ax_light):
+            ax.grid(True, alpha=0.3)
+            ax.xaxis.set_major_formatter(date_form)
+            ax.tick_params(axis='x', rotation=45)
+        self.fig.tight_layout()
+
+        self.artists = [self.drought_spans, self.humidity_line,
+                        self.day_spans, self.night_spans, self.light_line]
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.timer = None
+
+    @staticmethod
+    def _spans(ax, **style) -> PolyCollection:
+        spans = PolyCollection([], transform=ax.get_xaxis_transform(), animated=True,
+                               linewidth=0, **style)
+        ax.add_collection(spans, autolim=False)
+        return spans
+
+    def on_draw(self, event):
+        """Full redraws wipe the animated artists, cache the background and redraw them"""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def _move_xlim(self, ts: np.ndarray) -> bool:
+        """Jump the x-limits ahead when the newest sample leaves them"""
+        newest = ts[-1]
+        if self.xlim is not None and self.xlim[0] <= newest <= self.xlim[1]:
+            return False
+        span = min(max(newest - ts[0], 1 / SECONDS_PER_DAY), self.window)
+        right = newest + max(span * self.headroom, 10 / SECONDS_PER_DAY)
+        self.xlim = (max(ts[0], right - self.window), right)
+        for ax in (self.ax_humidity, self.ax_light):
+            ax.set_xlim(*self.xlim)
+        return True
+
+    def set_data(self, data: Dict[str, np.ndarray]):
+        """Point the artists at new data without drawing"""
+        ts = data["ts"]
+        self.humidity_line.set_data(ts, data["humidity"])
+        self.light_line.set_data(ts, data["light"])
+        daytime = data["daytime"]
+        self.drought_spans.set_verts(span_verts(ts, data["drought_alert"]))
+        self.day_spans.set_verts(span_verts(ts, daytime))
+        self.night_spans.set_verts(span_verts(ts, ~daytime))
+
+    def update(self):
+        data: Dict[str, np.ndarray] = self.buffer.snapshot()
+        ts = data["ts"]
+        if not len(ts):
+            return
+        self.set_data(data)
+        moved = self.follow and self._move_xlim(ts)
+        if moved or self.background is None:
+            # on_draw recaptures the background with the new axes
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
+    def start(self, interval=1000):
+        """Refresh every `interval` ms from the GUI event loop"""
+        self.timer = self.canvas.new_timer(interval=interval)
+        self.timer.add_callback(self.update)
+        self.timer.start()
@@ -0,0 +1,178 @@
+"""Offline replay of stored sensor history through the monitor renderer"""
+import csv
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+from matplotlib.dates import date2num, num2date
+from storage import SensorStore
+from storage.timestamps import to_epoch_ms
+from .decimation import MinMaxDecimator, envelope
+
+REPLAY_FIELDS = ("humidity", "light")
+REPLAY_FLAGS = ("drought_alert",)
+MS_PER_HOUR = 3_600_000
+
+
+def parse_timestamp(value: str) -> int:
+    """Epoch milliseconds or ISO-8601 to epoch milliseconds"""
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else to_epoch_ms(value)
+
+
+class SqliteHistory:
+    """Streams readings from a SensorStore database in NumPy chunks
+
+    The database is opened read-only, replaying never migrates or writes it.
+    """
+    def __init__(self, db_path, zone=None, chunk_size=50_000):
+        conn = sqlite3.connect(f"{Path(db_path).absolute().as_uri()}?mode=ro", uri=True)
+        self.store = SensorStore(db_path, conn=conn, readonly=True)
+        self.zone = zone
+        self.chunk_size = chunk_size
+
+    def bounds(self) -> Optional[Tuple[int, int]]:
+        return self.store.bounds(self.zone)
+
+    def chunks(self, start_ms, end_ms) -> Iterator[Dict[str, np.ndarray]]:
+        fields = ["timestamp", *REPLAY_FIELDS, *REPLAY_FLAGS]
+        for rows in self.store.iter_chunks(start_ms, end_ms, fields, self.zone, self.chunk_size):
+            columns = np.array(rows, np.float64).T
+            yield dict(zip(["ts", *REPLAY_FIELDS, *REPLAY_FLAGS], columns))
+
+
+class CsvHistory:
+    """Streams readings from a CSV export with a header row
+
+    Needs timestamp (epoch ms or ISO-8601), humidity, light and
+    drought_alert columns; an optional zone column is filtered on.
+    """
+    def __init__(self, path, zone=None, chunk_size=50_000):
+        self.path = path
+        self.zone = zone
+        self.chunk_size = chunk_size
+
+    def _rows(self):
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if self.zone and row.get("zone", self.zone) != self.zone:
+                    continue
+                yield (parse_timestamp(row["timestamp"]),
+                       float(row["humidity"]),
+                       float(row["light"]),
+                       row["drought_alert"].strip().lower() in ("1", "true", "yes"))
+
+    def bounds(self) -> Optional[Tuple[int, int]]:
+        low = high = None
+        for ts, *_ in self._rows():
+            low = ts if low is None else min(low, ts)
+            high = ts if high is None else max(high, ts)
+        return None if low is None else (low, high)
+
+    def chunks(self, start_ms, end_ms) -> Iterator[Dict[str, np.ndarray]]:
+        rows = []
+        for row in self._rows():
+            if start_ms <= row[0] < end_ms:
+                rows.append(row)
+            if len(rows) >= self.chunk_size:
+                yield self._columns(rows)
+                rows = []
+        if rows:
+            yield self._columns(rows)
+
+    @staticmethod
+    def _columns(rows) -> Dict[str, np.ndarray]:
+        columns = np.array(rows, np.float64).T
+        return dict(zip(["ts", *REPLAY_FIELDS, *REPLAY_FLAGS], columns))
+
+
+def open_history(path, zone=None):
+    """Pick the reader from the file extension, SQLite unless it is .csv"""
+    if str(path).lower().endswith(".csv"):
+        return CsvHistory(path, zone)
+    return SqliteHistory(path, zone)
+
+
+def to_date_num(ts_ms: np.ndarray) -> np.ndarray:
+    return date2num(np.asarray(ts_ms, np.int64).astype("datetime64[ms]"))
+
+
+def from_date_num(value: float) -> int:
+    return int(num2date(value).timestamp() * 1000)
+
+
+class HistoryReplay:
+    """Buffer-like source for MonitorRenderer showing a decimated history
+
+    load() streams the requested range through a MinMaxDecimator with one
+    bucket per pixel of plot width, so only a few thousand points are
+    ever held or drawn however many rows the range has. attach() reloads
+    the visible range whenever the user zooms or pans, until individual
+    readings show up again.
+    """
+    def __init__(self, source, start_ms: int, end_ms: int):
+        self.source = source
+        self.start = start_ms
+        self.end = end_ms
+        self.renderer = None
+        self.loaded: Optional[Tuple[int, int]] = None
+        self.data = self._empty()
+        self.rows = 0
+
+    @staticmethod
+    def _empty() -> Dict[str, np.ndarray]:
+        empty = np.empty(0)
+        return {"ts": empty, "humidity": empty, "light": empty,
+                "drought_alert": empty.astype(bool), "daytime": empty.astype(bool)}
+
+    def load(self, start_ms: int, end_ms: int, bins: int):
+        self.loaded = (start_ms, end_ms)
+        decimator = MinMaxDecimator(start_ms, end_ms, bins, REPLAY_FIELDS, REPLAY_FLAGS)
+        for chunk in self.source.chunks(start_ms, end_ms):
+            decimator.add(chunk)
+        result = decimator.result()
+        self.rows = decimator.rows
+        if not len(result["ts"]):
+            self.data = self._empty()
+            return
+        ts, humidity = envelope(result["ts"], result["humidity_min"], result["humidity_max"])
+        _, light = envelope(result["ts"], result["light_min"], result["light_max"])
+        # Same 6:00-18:00 rule the live view applies to each reading's timestamp hour
+        hours = (result["ts"] // MS_PER_HOUR) % 24
+        self.data = {
+            "ts": to_date_num(ts),
+            "humidity": humidity,
+            "light": light,
+            "drought_alert": np.repeat(result["drought_alert"], 2),
+            "daytime": np.repeat((hours >= 6) & (hours < 18), 2),
+        }
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        return self.data
+
+    def _bins(self) -> int:
+        return int(self.renderer.ax_humidity.get_window_extent().width)
+
+    def attach(self, renderer):
+        """Show the full range on the renderer and follow its zoom"""
+        self.renderer = renderer
+        self.load(self.start, self.end, self._bins())
+        xlim = (float(to_date_num(self.start)), float(to_date_num(self.end)))
+        for ax in (renderer.ax_humidity, renderer.ax_light):
+            ax.set_xlim(*xlim)
+        renderer.update()
+        for ax in (renderer.ax_humidity, renderer.ax_light):
+            ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    def on_xlim_changed(self, ax):
+        """Re-decimate the new visible range before the pending redraw"""
+        low, high = ax.get_xlim()
+        visible = (from_date_num(low), from_date_num(high))
+        if visible == self.loaded:
+            return
+        self.load(*visible, self._bins())
+        # Keep both panels on the same range, their callback sees it loaded
+        for other in (self.renderer.ax_humidity, self.renderer.ax_light):
+            if other is not ax:
+                other.set_xlim(low, high)
+        self.renderer.set_data(self.data)
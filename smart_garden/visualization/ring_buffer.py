@@ -0,0 +1,44 @@
+"""Preallocated NumPy ring buffer for live sensor series"""
+import threading
+from typing import Dict
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity table of NumPy columns holding the newest samples
+
+    Every column is allocated once at twice the capacity and each value is
+    written at i and i + capacity, so the newest `capacity` samples are
+    always one contiguous slice. append() is O(1) and reading never has
+    to stitch the wrap-around back together.
+    """
+    def __init__(self, capacity: int, columns: Dict[str, np.dtype]):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(2 * capacity, dtype) for name, dtype in columns.items()}
+        self.next = 0
+        self.size = 0
+        # The MQTT thread appends while the GUI thread reads
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def append(self, **values):
+        """Add one sample, dropping the oldest once the buffer is full"""
+        with self.lock:
+            i = self.next
+            for name, column in self.columns.items():
+                column[i] = column[i + self.capacity] = values[name]
+            self.next = (i + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def clear(self):
+        with self.lock:
+            self.next = self.size = 0
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Copy of every column, oldest sample first"""
+        with self.lock:
+            start = (self.next - self.size) % self.capacity
+            return {name: column[start:start + self.size].copy()
+                    for name, column in self.columns.items()}
@@ -0,0 +1,4 @@
+from .live_updates import Broadcaster, changed_fields
+from .snapshots import SnapshotStore
+
+__all__ = ['Broadcaster', 'changed_fields', 'SnapshotStore']
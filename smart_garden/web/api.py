@@ -0,0 +1,144 @@
+"""Read-only JSON views of the sensor store for the dashboard REST API"""
+import hashlib
+import threading
+import time
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from storage.rollups import RESOLUTIONS, ROLLUP_FIELDS
+from storage.sensor_store import SENSOR_FIELDS
+from storage.timestamps import to_epoch_ms
+
+STEPS = ("auto", "raw") + tuple(RESOLUTIONS)
+DEFAULT_WINDOW_MS = 24 * 3_600_000
+
+
+def make_etag(*parts) -> str:
+    """Hash the values a response depends on into an ETag"""
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20]
+
+
+def parse_time(value: Optional[str]) -> Optional[int]:
+    """Accept epoch milliseconds or an ISO-8601 string, None stays None"""
+    if value is None or value == "":
+        return None
+    if value.lstrip("-").isdigit():
+        return int(value)
+    return to_epoch_ms(value)
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Split a comma separated field list, None means the default fields"""
+    if not value:
+        return None
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+def columnar(records: Sequence[Dict[str, Any]], keys: Sequence[str]) -> Dict[str, list]:
+    """Turn a list of row dicts into one array per key"""
+    return {key: [record[key] for record in records] for key in keys}
+
+
+class SensorApi:
+    """Answers /api/latest and /api/history from a SensorStore
+
+    ETags are computed from cheap lookups (the newest timestamp, or the
+    rollup row count of the requested range) before any rows are read,
+    so a poller whose data has not changed costs one indexed query.
+    History is returned column-wise: one array per field instead of one
+    object per row, which is well under half the JSON size. A request
+    never gets more than point_limit points, and step=raw is refused
+    when the range holds more rows than its point budget.
+    """
+    def __init__(self, store, max_points=500, point_limit=10_000):
+        self.store = store
+        self.max_points = max_points
+        self.point_limit = point_limit
+        # The store's connection is shared by the web server's threads
+        self.lock = threading.Lock()
+
+    def latest(self, fields=None, zone=None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Return (most recent reading or None, etag)"""
+        with self.lock:
+            self.store.reload_partitions()
+            records = self.store.latest(1, fields, zone)
+        record = records[-1] if records else None
+        etag = make_etag("latest", zone, fields, record and record["timestamp"])
+        return record, etag
+
+    def history_window(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        """Resolve missing bounds: up to now, covering the default window
+
+        An implicit start is aligned to the minute so the window and its
+        ETag only move once a minute.
+        """
+        end_ms = end if end is not None else int(time.time() * 1000)
+        if start is None:
+            start = end_ms - DEFAULT_WINDOW_MS
+            if end is None:
+                start -= start % RESOLUTIONS["1m"]
+        if start >= end_ms:
+            raise ValueError("from must be earlier than to")
+        return start, end_ms
+
+    def point_budget(self, max_points: Optional[int]) -> int:
+        """The requested number of points, defaulted and capped at point_limit"""
+        return min(max_points or self.max_points, self.point_limit)
+
+    @staticmethod
+    def check_raw(count: int, max_points: int):
+        """Refuse a raw range whose rollup row count is over the point budget"""
+        if count > max_points:
+            raise ValueError(f"{count} readings in range exceed the {max_points} point budget, "
+                             "use a shorter range or step=auto")
+
+    def history_etag(self, start, end, fields=None, step="auto", max_points=None, zone=None) -> str:
+        """ETag for a history request, without reading the rows"""
+        if step not in STEPS:
+            raise ValueError(f"step must be one of {', '.join(STEPS)}")
+        start_ms, end_ms = self.history_window(start, end)
+        max_points = self.point_budget(max_points)
+        with self.lock:
+            self.store.reload_partitions()
+            count = self.store.rollups.count(start_ms, end_ms, zone)
+            if step == "raw":
+                self.check_raw(count, max_points)
+            pruned_before = self.store.pruned_before
+        # An open-ended request is keyed on its start only, new rows bump count
+        return make_etag("history", start_ms, end, fields, step,
+                         max_points, zone, count, pruned_before)
+
+    def history(self, start, end, fields=None, step="auto", max_points=None, zone=None) -> Dict[str, Any]:
+        """Return readings or rollup points for a range in columnar form
+
+        step is "raw", a rollup resolution, or "auto" to pick the finest
+        one that fits max_points. Raises ValueError for a raw range with
+        more rows than max_points.
+        """
+        if step not in STEPS:
+            raise ValueError(f"step must be one of {', '.join(STEPS)}")
+        start_ms, end_ms = self.history_window(start, end)
+        max_points = self.point_budget(max_points)
+        with self.lock:
+            self.store.reload_partitions()
+            if step == "auto":
+                step = self.store.rollups.pick_resolution(start_ms, end_ms, max_points, zone)
+            elif step == "raw":
+                self.check_raw(self.store.rollups.count(start_ms, end_ms, zone), max_points)
+            if step == "raw":
+                records = self.store.range(start_ms, end_ms, fields, zone)
+                result = {"resolution": "raw", "step_ms": None, "points": records}
+                keys = ["timestamp"] + [f for f in fields or SENSOR_FIELDS if f != "timestamp"]
+            else:
+                result = self.store.downsampled(start_ms, end_ms, fields, max_points, zone, step)
+                fields = fields or list(ROLLUP_FIELDS)
+                keys = ["timestamp", "count"] + [f"{field}_{stat}" for field in fields
+                                                  for stat in ("min", "max", "mean")]
+        points = result["points"]
+        return {
+            "from": start_ms,
+            "to": end_ms,
+            "zone": zone,
+            "resolution": result["resolution"],
+            "step_ms": result["step_ms"],
+            "length": len(points),
+            "columns": columnar(points, keys),
+        }
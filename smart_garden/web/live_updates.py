@@ -0,0 +1,75 @@
+"""Server-Sent Events fan-out of sensor changes to dashboard clients"""
+import itertools
+import json
+import threading
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+
+def changed_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the entries of new whose value differs from old"""
+    return {key: value for key, value in new.items() if old.get(key) != value}
+
+
+class Broadcaster:
+    """Single broadcast buffer shared by every connected client
+
+    publish() serializes an update once and appends it to a bounded ring
+    of (sequence, data) pairs. Each client only remembers the last
+    sequence it sent and waits on one shared condition, so a publish
+    costs the same however many clients are connected. A client that
+    falls further behind than the ring gets a full snapshot instead.
+    """
+    def __init__(self, size=256):
+        self.events: deque = deque(maxlen=size)
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.clients = 0
+
+    def publish(self, changes: Dict[str, Any]):
+        """Send changed fields to every client"""
+        data = json.dumps(changes, default=str)
+        with self.condition:
+            self.seq += 1
+            self.events.append((self.seq, data))
+            self.condition.notify_all()
+
+    def events_after(self, seq: int, timeout: Optional[float]) -> Tuple[Optional[List[str]], int]:
+        """Wait for events newer than seq
+
+        Returns (events, latest_seq). events is empty on timeout and None
+        when the client missed events that already left the ring.
+        """
+        with self.condition:
+            if self.seq <= seq:
+                self.condition.wait(timeout)
+            latest = self.seq
+            missed = latest - seq
+            if missed <= 0:
+                return [], seq
+            if missed > len(self.events):
+                return None, latest
+            start = len(self.events) - missed
+            return [data for _, data in itertools.islice(self.events, start, None)], latest
+
+    def stream(self, snapshot: Callable[[], Dict[str, Any]], heartbeat=15.0):
+        """Generator of SSE frames: a full snapshot, then changed fields only"""
+        with self.condition:
+            seq = self.seq
+            self.clients += 1
+        try:
+            yield f"id: {seq}\ndata: {json.dumps(snapshot(), default=str)}\n\n"
+            while True:
+                events, latest = self.events_after(seq, heartbeat)
+                if events is None:
+                    events = [json.dumps(snapshot(), default=str)]
+                elif not events:
+                    # Comment line keeps proxies from closing idle streams
+                    # and surfaces disconnected clients as write errors
+                    yield ": keepalive\n\n"
+                    continue
+                seq = latest
+                yield "".join(f"data: {data}\n\n" for data in events[:-1]) + f"id: {seq}\ndata: {events[-1]}\n\n"
+        finally:
+            with self.condition:
+                self.clients -= 1
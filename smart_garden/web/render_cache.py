@@ -0,0 +1,139 @@
+"""Rendered-page cache shared across sessions, with pre-compressed bodies"""
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+from monitoring import counter
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Rendered into the cached page where each request's user header goes
+USER_HEADER_SLOT = "<!--user-header-->"
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+MAX_STORED_BLOCK = 0xFFFF
+
+cache_lookups = counter("web_render_cache_total", "Page render cache lookups", ("result",))
+
+
+def _deflate(data: bytes, level: int, final: bool) -> bytes:
+    """Raw deflate blocks that can be followed by more blocks unless final"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _stored_blocks(data: bytes) -> bytes:
+    """Uncompressed deflate blocks, free to build per request"""
+    out = bytearray()
+    for start in range(0, len(data), MAX_STORED_BLOCK):
+        chunk = data[start:start + MAX_STORED_BLOCK]
+        out += b"\x00" + struct.pack("<HH", len(chunk), len(chunk) ^ 0xFFFF) + chunk
+    return bytes(out)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Content codings of an Accept-Encoding header, minus those with q=0"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding.strip():
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CachedPage:
+    """One rendered version of a page, split around the user header slot
+
+    The gzip body is pre-compressed as two independent deflate runs, the
+    prefix ending on a sync flush; a request only adds the header as a
+    stored block plus the gzip trailer, so every user gets a valid
+    single-member gzip stream without compressing the page again.
+    """
+    __slots__ = ("version", "prefix", "suffix", "gzip_prefix", "gzip_suffix", "prefix_crc")
+
+    def __init__(self, version: Hashable, html: str, level: int):
+        self.version = version
+        prefix, _, suffix = html.partition(USER_HEADER_SLOT)
+        self.prefix = prefix.encode()
+        self.suffix = suffix.encode()
+        self.gzip_prefix = GZIP_HEADER + _deflate(self.prefix, level, final=False)
+        self.gzip_suffix = _deflate(self.suffix, level, final=True)
+        self.prefix_crc = zlib.crc32(self.prefix)
+
+    def body(self, header: bytes) -> bytes:
+        return self.prefix + header + self.suffix
+
+    def gzip(self, header: bytes) -> bytes:
+        crc = zlib.crc32(self.suffix, zlib.crc32(header, self.prefix_crc))
+        size = len(self.prefix) + len(header) + len(self.suffix)
+        return b"".join((self.gzip_prefix, _stored_blocks(header), self.gzip_suffix,
+                         struct.pack("<II", crc, size & 0xFFFFFFFF)))
+
+
+class RenderCache:
+    """Renders a page once per data version and serves it to every session
+
+    page(key, version, render) returns the cached render for a key (e.g.
+    a zone) while its version matches, calling render() otherwise.
+    render() must place USER_HEADER_SLOT where the per-user header goes.
+    respond() then fills in a request's header and picks gzip or brotli
+    from its Accept-Encoding. Brotli streams cannot be spliced, so those
+    bodies are cached per (key, version, header) in a small LRU.
+    """
+    def __init__(self, max_pages=64, gzip_level=6, brotli_quality=5, max_brotli=256):
+        self.pages: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+        self.brotli_bodies: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self.max_pages = max_pages
+        self.max_brotli = max_brotli
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.lock = threading.Lock()
+
+    def page(self, key: Hashable, version: Hashable, render: Callable[[], str]) -> CachedPage:
+        with self.lock:
+            page = self.pages.get(key)
+            if page is not None and page.version == version:
+                self.pages.move_to_end(key)
+                cache_lookups.labels("hit").inc()
+                return page
+        cache_lookups.labels("miss").inc()
+        # Rendered outside the lock, requests racing on a new version may each render it
+        page = CachedPage(version, render(), self.gzip_level)
+        with self.lock:
+            current = self.pages.get(key)
+            if current is None or current.version != version:
+                self.pages[key] = page
+                self.pages.move_to_end(key)
+                while len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+        return page
+
+    def respond(self, key: Hashable, page: CachedPage, header: str,
+                accept_encoding: str = "") -> Tuple[bytes, Optional[str]]:
+        """(body, Content-Encoding or None) for one request"""
+        header_bytes = header.encode()
+        encodings = accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in encodings:
+            return self._brotli(key, page, header_bytes), "br"
+        if "gzip" in encodings:
+            return page.gzip(header_bytes), "gzip"
+        return page.body(header_bytes), None
+
+    def _brotli(self, key, page: CachedPage, header: bytes) -> bytes:
+        cache_key = (key, page.version, header)
+        with self.lock:
+            body = self.brotli_bodies.get(cache_key)
+            if body is not None:
+                self.brotli_bodies.move_to_end(cache_key)
+                return body
+        body = brotli.compress(page.body(header), quality=self.brotli_quality)
+        with self.lock:
+            self.brotli_bodies[cache_key] = body
+            while len(self.brotli_bodies) > self.max_brotli:
+                self.brotli_bodies.popitem(last=False)
+        return body
@@ -0,0 +1,63 @@
+"""Immutable per-zone snapshots of live sensor state for the web apps"""
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Iterable, Mapping, Optional, Tuple
+
+Snapshot = Mapping[str, Any]
+
+
+class ZoneState:
+    """Latest snapshot of a zone plus the ring of recent ones, never mutated"""
+    __slots__ = ("latest", "history")
+
+    def __init__(self, latest: Snapshot, history: Tuple[Snapshot, ...]):
+        self.latest = latest
+        self.history = history
+
+
+class SnapshotStore:
+    """Copy-on-write live state shared between the MQTT thread and requests
+
+    update() builds a new read-only snapshot from the previous one, a new
+    history tuple and a new zone map, then swaps the single `zones`
+    reference. Readers grab that reference and only ever see complete
+    snapshots, without taking a lock. Writers are serialized by a lock
+    so two MQTT threads cannot lose each other's zones.
+    """
+    def __init__(self, history=60, initial: Optional[Dict[str, Any]] = None):
+        self.history_size = max(1, history)
+        self.initial = MappingProxyType(dict(initial or {}, version=0))
+        self.zones: Mapping[str, ZoneState] = MappingProxyType({})
+        self.write_lock = threading.Lock()
+
+    def latest(self, zone: str) -> Snapshot:
+        """Current snapshot of a zone, the initial values if it never reported"""
+        state = self.zones.get(zone)
+        return self.initial if state is None else state.latest
+
+    def recent(self, zone: str) -> Tuple[Snapshot, ...]:
+        """The last `history` snapshots of a zone, oldest first"""
+        state = self.zones.get(zone)
+        return () if state is None else state.history
+
+    def series(self, zone: str, field: str) -> list:
+        """Recent values of one field, e.g. for a sparkline"""
+        return [snapshot[field] for snapshot in self.recent(zone) if field in snapshot]
+
+    def zone_names(self) -> Iterable[str]:
+        return sorted(self.zones)
+
+    def update(self, zone: str, values: Dict[str, Any]) -> Snapshot:
+        """Publish a new snapshot for a zone built from the previous one"""
+        with self.write_lock:
+            zones = self.zones
+            previous = self.latest(zone)
+            record = dict(previous)
+            record.update(values)
+            record["version"] = previous["version"] + 1
+            snapshot = MappingProxyType(record)
+            history = (self.recent(zone) + (snapshot,))[-self.history_size:]
+            new_zones = dict(zones)
+            new_zones[zone] = ZoneState(snapshot, history)
+            self.zones = MappingProxyType(new_zones)
+        return snapshot
@@ -0,0 +1,169 @@
+"""SQLite-backed operator accounts for the login page"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class UserStoreBusy(Exception):
+    """Every password-hash worker is taken, the caller should retry later"""
+
+
+class UserStore:
+    """Username -> password hash, with a read cache and a hashing pool
+
+    - Users live in an indexed SQLite table; every write is one
+      transaction, so concurrent registrations cannot lose each other
+    - A legacy users.json is imported once, the file is left untouched
+    - Hashes of existing users are served from an in-memory cache. A
+      write replaces its own entry, and PRAGMA data_version drops the
+      whole cache when another process (or a second app worker)
+      committed a change. Unknown names are not cached, so guessing
+      them cannot grow it past the number of accounts
+    - Hashing and verification run on a pool of hash_workers threads
+      (pbkdf2 releases the GIL) with at most max_pending jobs queued;
+      beyond that UserStoreBusy is raised instead of piling up requests
+    """
+    def __init__(self, db_path, legacy_json=None, hash_workers=4, max_pending=32):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self.cache: Dict[str, str] = {}
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS Users (
+                    Username TEXT PRIMARY KEY,
+                    PasswordHash TEXT NOT NULL,
+                    CreatedAt INTEGER NOT NULL
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS UserMeta (
+                    Key TEXT PRIMARY KEY,
+                    Value TEXT NOT NULL
+                )
+            ''')
+        self.data_version = self._data_version()
+        self.imported = self.import_json(legacy_json) if legacy_json else 0
+
+        self.pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="password-hash")
+        self.slots = threading.BoundedSemaphore(hash_workers + max_pending)
+        # Unknown users are checked against this so they take as long as known ones
+        self.dummy_hash = generate_password_hash("not a password")
+
+    def _data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def import_json(self, path) -> int:
+        """Copy users from a users.json once, return how many were added"""
+        key = "imported:" + os.path.abspath(path)
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM UserMeta WHERE Key = ?", (key,)).fetchone():
+                return 0
+            users = {}
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    users = json.load(f)
+            now = int(time.time())
+            with self.conn:
+                before = self.conn.total_changes
+                # Accounts registered since the app switched over win over stale file entries
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO Users (Username, PasswordHash, CreatedAt) VALUES (?, ?, ?)",
+                    [(username, password_hash, now) for username, password_hash in users.items()])
+                added = self.conn.total_changes - before
+                self.conn.execute("INSERT OR IGNORE INTO UserMeta (Key, Value) VALUES (?, ?)", (key, str(now)))
+            self.cache.clear()
+            return added
+
+    # ---------- Lookups ----------
+    def password_hash(self, username: str) -> Optional[str]:
+        """The stored hash of a user, None if there is no such user"""
+        with self.lock:
+            version = self._data_version()
+            if version != self.data_version:
+                self.cache.clear()
+                self.data_version = version
+            if username in self.cache:
+                return self.cache[username]
+            row = self.conn.execute(
+                "SELECT PasswordHash FROM Users WHERE Username = ?", (username,)).fetchone()
+            if row is None:
+                # A primary key miss is cheap, caching it would let guessed names fill memory
+                return None
+            password_hash = self.cache[username] = row[0]
+            return password_hash
+
+    def exists(self, username: str) -> bool:
+        return self.password_hash(username) is not None
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM Users").fetchone()[0]
+
+    # ---------- Hashing ----------
+    def _run(self, function, *args):
+        """Run a hash function on the pool and wait for it"""
+        if not self.slots.acquire(blocking=False):
+            raise UserStoreBusy("Too many password checks in progress")
+        try:
+            future = self.pool.submit(function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+    def verify(self, username: str, password: str) -> bool:
+        """Check a login, in constant work whether or not the user exists"""
+        password_hash = self.password_hash(username)
+        matches = self._run(check_password_hash, password_hash or self.dummy_hash, password)
+        return matches and password_hash is not None
+
+    # ---------- Writes ----------
+    def create(self, username: str, password: str) -> bool:
+        """Register a user, False if the name is taken"""
+        if self.exists(username):
+            return False
+        password_hash = self._run(generate_password_hash, password)
+        with self.lock:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT INTO Users (Username, PasswordHash, CreatedAt) VALUES (?, ?, ?)",
+                        (username, password_hash, int(time.time())))
+            except sqlite3.IntegrityError:
+                # Registered by a concurrent request between the check and the insert
+                self.cache.pop(username, None)
+                return False
+            self.cache[username] = password_hash
+            return True
+
+    def set_password(self, username: str, password: str) -> bool:
+        """Replace a user's password, False if there is no such user"""
+        password_hash = self._run(generate_password_hash, password)
+        with self.lock:
+            with self.conn:
+                updated = self.conn.execute(
+                    "UPDATE Users SET PasswordHash = ? WHERE Username = ?",
+                    (password_hash, username)).rowcount
+            if updated:
+                self.cache[username] = password_hash
+            else:
+                self.cache.pop(username, None)
+            return bool(updated)
+
+    def delete(self, username: str) -> bool:
+        with self.lock:
+            with self.conn:
+                deleted = self.conn.execute("DELETE FROM Users WHERE Username = ?", (username,)).rowcount
+            self.cache.pop(username, None)
+            return bool(deleted)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.conn.close()